@@ -1,36 +1,166 @@
-from flask import Flask, render_template, request, jsonify, redirect, session
+from flask import Flask, Response, g, render_template, request, jsonify, redirect, session
+import atexit
 import json
+import hashlib
+import io
 import os
 from datetime import datetime
 import threading
-import pyautogui
-import speech_recognition as sr
 import time
-from googletrans import Translator, LANGUAGES
-import cv2
-import mediapipe as mp
+from lazy import LazyModule, LazyValue, prewarm
+from storage import DeferredWriter, IngestError, MedicalStore, ReadCache, RECORD_TYPES, parse_ndjson
+from events import EventBroker
+from commands import CommandMatcher
+from cursor import CursorOutput, PyAutoGuiBackend
+from translation import TranslationCache
+from speech import UtterancePipeline, VoiceMetrics, create_backend
+from vad import VoiceActivityDetector
+from sessions import SessionRegistry
+from users import META_KEY, USER_ROLES, UserDirectory
+from vitals import VITAL_FIELDS, VitalsIndex, parse_timestamp
+from auth import LoginBusy, LoginRateLimiter, PasswordHasher
+from metrics import MetricsRegistry, SamplingProfiler
+from tracking import (
+    AdaptiveFrameRate, CaptureThread, FaceMeshStage, HeadTracker, LatestFrameBuffer, TrackingMetrics,
+    open_frame_source
+)
+from tracking_service import TrackingService, create_face_mesh
+
+# The hands-free stack (camera, face model, mouse control, microphone, translator)
+# is imported when a patient first starts it, so doctor/nurse-only servers and
+# debug reloads never load it
+pyautogui = LazyModule('pyautogui')
+sr = LazyModule('speech_recognition')
+googletrans = LazyModule('googletrans')
+cv2 = LazyModule('cv2')
+mp = LazyModule('mediapipe')
+
+# Supported languages and their display names (as googletrans spells them)
+LANGUAGES = {
+    'en': 'english', 'es': 'spanish', 'ar': 'arabic', 'fr': 'french', 'de': 'german',
+    'it': 'italian', 'pt': 'portuguese', 'ru': 'russian', 'zh': 'chinese', 'ja': 'japanese'
+}
  
 app = Flask(__name__)
 app.secret_key = 'hospital_secret_key'
 
-# Global control variables
-head_tracking_active = False
-voice_control_active = False
+# Prometheus-style /metrics. With METRICS=0 every timer and counter is a no-op
+# and the request hooks aren't installed at all.
+METRICS_ENABLED = os.environ.get('METRICS', '1') == '1'
+metrics = MetricsRegistry('hospital', enabled=METRICS_ENABLED)
+http_request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'Flask request handling time', ['endpoint', 'method', 'status'])
+storage_seconds = metrics.histogram(
+    'storage_operation_duration_seconds', 'User file and medical database I/O', ['operation'])
+speech_recognition_seconds = metrics.histogram(
+    'speech_recognition_duration_seconds', 'Time spent in the speech backend per utterance', ['language'])
+voice_commands_total = metrics.counter('voice_commands_total', 'Voice commands executed', ['action'])
+# Off until switched on at /debug_profile?action=start
+profiler = SamplingProfiler()
+
+# Pushes language changes and new medical records to open dashboards
+event_broker = EventBroker()
+
+# Global control variables (hands-free on/off flags live on each UserContext)
 blink_detection_active = False
 
-# Initialize MediaPipe Face Mesh
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
+# MediaPipe Face Mesh. Every head-tracking run gets a graph of its own (they aren't
+# thread-safe and keep tracking state between frames); this one is the first,
+# built ahead of time when pre-warming. Graphs hold native resources, so when a
+# run ends its graph waits in a small pool for the next one or is closed
+face_mesh = LazyValue(lambda: create_face_mesh())
+face_mesh_claimed = False
+face_mesh_pool = []
+face_mesh_lock = threading.Lock()
+FACE_MESH_POOL_SIZE = int(os.environ.get('FACE_MESH_POOL_SIZE', '2'))
+
+def claim_face_mesh():
+    """A FaceMesh for one run: an idle one from the pool, the pre-warmed one, or a new one"""
+    global face_mesh_claimed
+    with face_mesh_lock:
+        if face_mesh_pool:
+            return face_mesh_pool.pop()
+        first = not face_mesh_claimed
+        face_mesh_claimed = True
+    return face_mesh.get() if first else create_face_mesh()
+
+def release_face_mesh(mesh):
+    """Hand back a graph whose run has ended: pooled for reuse, or closed if the pool is full"""
+    with face_mesh_lock:
+        if len(face_mesh_pool) < FACE_MESH_POOL_SIZE:
+            face_mesh_pool.append(mesh)
+            return
+    mesh.close()
+
+# Load the hands-free stack in the background at startup instead, so the first
+# patient login doesn't wait for it (bedside machines)
+HANDS_FREE_PREWARM = os.environ.get('HANDS_FREE_PREWARM', '0') == '1'
+if HANDS_FREE_PREWARM:
+    prewarm(cv2, mp, face_mesh, pyautogui, sr, googletrans)
+
+# Camera index, 'synthetic', or the path of a recorded video to replay
+FRAME_SOURCE = os.environ.get('FRAME_SOURCE', '0')
+# Run FaceMesh on a crop around the last known face, and optionally on a
+# smaller image, to save CPU on the bedside machines
+FACE_ROI_TRACKING = os.environ.get('FACE_ROI_TRACKING', '1') == '1'
+FACE_INPUT_SCALE = float(os.environ.get('FACE_INPUT_SCALE', '1.0'))
+# Draw landmarks in a preview window (debugging only, costs CPU per frame)
+TRACKING_PREVIEW = os.environ.get('TRACKING_PREVIEW', '0') == '1'
+# Iris landmark that drives the cursor
+CURSOR_LANDMARK = 475
+# Cursor smoothing: ignore moves smaller than the dead-zone (pixels) and
+# call the OS at most CURSOR_MAX_RATE times per second
+CURSOR_DEAD_ZONE = 3
+CURSOR_MAX_RATE = 60
+# Frames per second while the head moves (0 = as fast as the camera delivers),
+# after TRACKING_IDLE_AFTER seconds of a still head, and with nobody in view.
+# TRACKING_ADAPTIVE=0 keeps TRACKING_FPS all the time.
+TRACKING_FPS = float(os.environ.get('TRACKING_FPS', '30'))
+TRACKING_IDLE_FPS = float(os.environ.get('TRACKING_IDLE_FPS', '10'))
+TRACKING_NO_FACE_FPS = float(os.environ.get('TRACKING_NO_FACE_FPS', '2'))
+TRACKING_IDLE_AFTER = float(os.environ.get('TRACKING_IDLE_AFTER', '3.0'))
+TRACKING_ADAPTIVE = os.environ.get('TRACKING_ADAPTIVE', '1') == '1'
+# Cameras opened by head_tracking_loop in this process -> the run using it, one at a time.
+# After a reload, or a logout and a new login, the old run takes up to a second to let
+# go, so a new run waits up to CAMERA_HANDOVER_TIMEOUT seconds before giving up
+cameras_in_use = {}
+cameras_lock = threading.Lock()
+camera_released = threading.Condition(cameras_lock)
+CAMERA_HANDOVER_TIMEOUT = float(os.environ.get('CAMERA_HANDOVER_TIMEOUT', '3.0'))
+
+# Several bedside cameras on one server: with TRACKING_WORKERS > 0 each patient's
+# FaceMesh runs in a worker process of its own (tracking_service.py) instead of a
+# thread here. TRACKING_CAMERAS maps patient IDs to cameras, e.g. "P001=0,P002=1";
+# patients without an entry use FRAME_SOURCE.
+TRACKING_WORKERS = int(os.environ.get('TRACKING_WORKERS', '0'))
+TRACKING_CAMERAS = dict(
+    item.strip().split('=', 1) for item in os.environ.get('TRACKING_CAMERAS', '').split(',') if '=' in item
 )
+tracking_service = None
+if TRACKING_WORKERS > 0:
+    tracking_service = TrackingService(
+        max_workers=TRACKING_WORKERS,
+        roi_tracking=FACE_ROI_TRACKING,
+        downscale=FACE_INPUT_SCALE,
+        frame_rate_options={
+            'active_fps': TRACKING_FPS,
+            'idle_fps': TRACKING_IDLE_FPS,
+            'no_face_fps': TRACKING_NO_FACE_FPS,
+            'idle_after': TRACKING_IDLE_AFTER,
+            'adaptive': TRACKING_ADAPTIVE
+        },
+        cursor_options={'dead_zone': CURSOR_DEAD_ZONE, 'max_rate': CURSOR_MAX_RATE},
+        cursor_landmark=CURSOR_LANDMARK
+    )
+    atexit.register(tracking_service.shutdown)
+
+def camera_for(context):
+    return TRACKING_CAMERAS.get(context.user.get('patient_id', ''), FRAME_SOURCE)
 
 # User database file
 USER_DATA_FILE = "users_data.json"
  
-def load_user_data():
+def read_user_data_file():
     if os.path.exists(USER_DATA_FILE):
         with open(USER_DATA_FILE, 'r') as f:
             return json.load(f)
@@ -52,102 +182,263 @@ def load_user_data():
         }
     }
  
+# The cache holds a UserDirectory: the file contents plus a username index
+user_data_cache = ReadCache(lambda: UserDirectory(read_user_data_file()), [USER_DATA_FILE])
+
+def load_user_directory():
+    return user_data_cache.get()
+
+def load_user_data():
+    return load_user_directory().data
+ 
+def write_user_file(directory):
+    # Write a temp file and swap it in so a crash never leaves half a user database
+    temp_path = USER_DATA_FILE + '.tmp'
+    with storage_seconds.time('user_file_write'):
+        with open(temp_path, 'w') as f:
+            f.write(directory.dumps(indent=2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, USER_DATA_FILE)
+    user_data_cache.store(directory)
+
+# Preference changes (the language picked at login) are batched and written at
+# most once per USER_WRITE_DELAY seconds; new accounts and re-hashed passwords are written immediately
+USER_WRITE_DELAY = float(os.environ.get('USER_WRITE_DELAY', '2.0'))
+user_data_writer = DeferredWriter(write_user_file, delay=USER_WRITE_DELAY)
+atexit.register(user_data_writer.close)
+
+def save_user_directory(directory):
+    user_data_writer.write_now(directory)
+
+# Password hashing cost as a werkzeug method string, and how many threads may hash at once.
+# Plaintext passwords left in users_data.json are hashed on the user's next login.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000')
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '2'))
+password_hasher = PasswordHasher(PASSWORD_HASH_METHOD, workers=PASSWORD_WORKERS)
+login_limiter = LoginRateLimiter()
+
+def login_busy_response():
+    """503 for a login or signup the password pool could not take on or finish in time"""
+    response = jsonify({'success': False, 'message': 'Server busy, please try again'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
+
 def save_user_data(data):
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    save_user_directory(UserDirectory(data))
  
 # Medical data storage
 MEDICAL_DATA_FILE = "medical_data.json"
+MEDICAL_DB_FILE = "medical_data.db"
+DEFAULT_PATIENT_IDS = ["P001", "P002", "P003", "P004", "P005"]
+
+def init_medical_store():
+    store = MedicalStore(MEDICAL_DB_FILE)
+    if store.is_empty():
+        if os.path.exists(MEDICAL_DATA_FILE):
+            # One-shot migration of the old whole-file JSON storage
+            with open(MEDICAL_DATA_FILE, 'r') as f:
+                migrated = store.import_data(json.load(f))
+            print(f"📦 Migrated {migrated} medical records from {MEDICAL_DATA_FILE}")
+        else:
+            for patient_id in DEFAULT_PATIENT_IDS:
+                store.add_patient(patient_id)
+    return store
+
+medical_store = init_medical_store()
+def read_medical_snapshot():
+    with storage_seconds.time('medical_snapshot'):
+        return medical_store.snapshot()
+
+medical_data_cache = ReadCache(
+    read_medical_snapshot,
+    [MEDICAL_DB_FILE, MEDICAL_DB_FILE + '-wal']
+)
+# Parsed vital signs per patient, for the trend charts
+vitals_index = VitalsIndex(medical_store)
  
 def load_medical_data():
-    if os.path.exists(MEDICAL_DATA_FILE):
-        with open(MEDICAL_DATA_FILE, 'r') as f:
-            return json.load(f)
-    return {
-        "P001": {"prescriptions": [], "doctor_notes": [], "vital_signs": []},
-        "P002": {"prescriptions": [], "doctor_notes": [], "vital_signs": []},
-        "P003": {"prescriptions": [], "doctor_notes": [], "vital_signs": []},
-        "P004": {"prescriptions": [], "doctor_notes": [], "vital_signs": []},
-        "P005": {"prescriptions": [], "doctor_notes": [], "vital_signs": []}
-    }
+    return medical_data_cache.get()['data']
  
-def save_medical_data(data):
-    with open(MEDICAL_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+def add_medical_record(patient_id, record_type, record):
+    """Append a single record without rewriting the rest of the history"""
+    with storage_seconds.time('medical_append'):
+        record_id = medical_store.append_record(patient_id, record_type, record)
+    if record_id is None:
+        return False
+    medical_data_cache.invalidate()
+    event_broker.publish(record_type, {
+        'patient_id': patient_id,
+        'record': dict(record, id=record_id)
+    })
+    return True
  
-current_user = None
+# Logged-in users, one context per browser session (see sessions.py)
+session_registry = SessionRegistry()
+
+def current_context():
+    """UserContext of the browser making this request, or None"""
+    return session_registry.get(session.get('sid'))
+
+def get_current_user():
+    context = current_context()
+    return context.user if context else None
+
+# Voice command phrase tables, compiled once at startup
+command_matcher = CommandMatcher()
+
+# Translated commands survive restarts so the translator is rarely called
+TRANSLATION_CACHE_FILE = "translation_cache.json"
+translation_cache = TranslationCache(TRANSLATION_CACHE_FILE)
+
+# Speech recognition engine for this deployment: google, vosk, whisper or fake.
+# SPEECH_MODEL is the Vosk model directory or the Whisper model name.
+SPEECH_BACKEND = os.environ.get('SPEECH_BACKEND', 'google')
+SPEECH_MODEL = os.environ.get('SPEECH_MODEL', '')
+
+def make_speech_backend():
+    options = {}
+    if SPEECH_MODEL and SPEECH_BACKEND == 'vosk':
+        options['model_dir'] = SPEECH_MODEL
+    elif SPEECH_MODEL and SPEECH_BACKEND == 'whisper':
+        options['model'] = SPEECH_MODEL
+    return create_backend(SPEECH_BACKEND, **options)
+
+# Created once so offline models stay loaded between hands-free sessions
+speech_backend = make_speech_backend()
+
+# Recognition runs on a small pool so a slow network call doesn't block the
+# microphone; utterances older than VOICE_MAX_AGE seconds are dropped
+VOICE_WORKERS = 2
+VOICE_QUEUE_SIZE = 8
+VOICE_MAX_AGE = 5.0
+voice_metrics = VoiceMetrics()
+
+# Voice-activity detection drops coughs, beeps and background noise before they
+# cost a recognition call, and trims silence from the utterances it keeps
+VOICE_VAD = os.environ.get('VOICE_VAD', '1') == '1'
+voice_activity = VoiceActivityDetector() if VOICE_VAD else None
+
+def release_camera(camera, run):
+    with camera_released:
+        if cameras_in_use.get(camera) is run:
+            del cameras_in_use[camera]
+            camera_released.notify_all()
 
 # Head tracking function (runs continuously)
-def head_tracking_loop():
-    global head_tracking_active, blink_detection_active
-    
+def head_tracking_loop(context, source=None, backend=None):
+    global blink_detection_active
+
+    camera = camera_for(context)
+    run = object()
+    # An older run of this session (hands-free restarted) stops at its next frame
+    context.tracking_run = run
+    with camera_released:
+        camera_released.wait_for(lambda: camera not in cameras_in_use, CAMERA_HANDOVER_TIMEOUT)
+        acquired = camera not in cameras_in_use and context.tracking_run is run
+        if acquired:
+            cameras_in_use[camera] = run
+    if not acquired:
+        if context.tracking_run is run:
+            print(f"❌ Camera {camera} is already tracking another patient")
+            context.head_tracking_active = False
+        return
+
     print("👀 Head tracking STARTED")
     print("🖱️ Move your head to control mouse cursor")
     print("👁️ Blink to click")
     
-    # Eye blink detection variables
-    click_pause = False
-    click_time = 0
-    
-    cam = cv2.VideoCapture(0)
-    screen_w, screen_h = pyautogui.size()
-    pyautogui.FAILSAFE = False
+    # Capture runs on its own thread and only the newest frame is kept,
+    # so a slow inference step skips stale frames instead of queueing them
+    try:
+        source = source or open_frame_source(camera)
+    except Exception:
+        release_camera(camera, run)
+        context.head_tracking_active = False
+        raise
+    # Counters and the FaceMesh graph belong to this run, never shared with another patient's loop
+    tracking_metrics = context.tracking_metrics = TrackingMetrics()
+    mesh_graph = context.face_mesh = claim_face_mesh()
+    # Slows capture down while the patient is away or resting, back to full rate on movement
+    frame_rate = AdaptiveFrameRate(
+        active_fps=TRACKING_FPS,
+        idle_fps=TRACKING_IDLE_FPS,
+        no_face_fps=TRACKING_NO_FACE_FPS,
+        idle_after=TRACKING_IDLE_AFTER,
+        adaptive=TRACKING_ADAPTIVE,
+        metrics=tracking_metrics
+    )
+    frames = LatestFrameBuffer(tracking_metrics)
+    capture = CaptureThread(source, frames, tracking_metrics, frame_rate=frame_rate)
+    capture.start()
+    mesh = FaceMeshStage(
+        mesh_graph,
+        roi_tracking=FACE_ROI_TRACKING,
+        downscale=FACE_INPUT_SCALE,
+        metrics=tracking_metrics
+    )
+    cursor = CursorOutput(
+        backend or PyAutoGuiBackend(),
+        dead_zone=CURSOR_DEAD_ZONE,
+        max_rate=CURSOR_MAX_RATE,
+        metrics=tracking_metrics
+    )
+    tracker = HeadTracker(
+        mesh,
+        cursor,
+        metrics=tracking_metrics,
+        cursor_landmark=CURSOR_LANDMARK,
+        preview=TRACKING_PREVIEW,
+        frame_rate=frame_rate
+    )
     
     try:
-        while head_tracking_active:
-            ret, frame = cam.read()
-            if not ret:
-                print("🚫 Camera feed lost.")
-                break
-            
-            frame = cv2.flip(frame, 1)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            output = face_mesh.process(rgb_frame)
-            landmark_points = output.multi_face_landmarks
-            frame_h, frame_w, _ = frame.shape
-
-            if landmark_points:
-                landmarks = landmark_points[0].landmark
-
-                # Head tracking (move cursor) - using eye corners for better precision
-                for id, landmark in enumerate(landmarks[474:478]):
-                    x = int(landmark.x * frame_w)
-                    y = int(landmark.y * frame_h)
-                    cv2.circle(frame, (x, y), 3, (0, 255, 0))
-                    if id == 1:
-                        screen_x = screen_w * landmark.x
-                        screen_y = screen_h * landmark.y
-                        pyautogui.moveTo(screen_x, screen_y)
-
-                # Blink detection (click)
-                left = [landmarks[145], landmarks[159]]
-                for lm in left:
-                    x = int(lm.x * frame_w)
-                    y = int(lm.y * frame_h)
-                    cv2.circle(frame, (x, y), 3, (0, 255, 255))
-
-                if not click_pause and (left[0].y - left[1].y) < 0.004:
-                    pyautogui.click()
-                    click_pause = True
-                    click_time = time.time()
-                    print("👁️ Blink detected - Click!")
-
-                if click_pause and time.time() - click_time > 1.2:
-                    click_pause = False
+        while context.head_tracking_active and context.tracking_run is run:
+            item = frames.get(timeout=1.0)
+            if item is None:
+                if frames.closed:
+                    print("🚫 Camera feed lost.")
+                    break
+                continue
+            frame, captured_at = item
+
+            # Move cursor with the iris, click on a blink
+            moved, clicked = tracker.process(frame, captured_at)
+            if moved:
+                tracking_metrics.record_latency(time.perf_counter() - captured_at)
+            if clicked:
+                print("👁️ Blink detected - Click!")
                 
     except Exception as e:
         print(f"❌ Head tracking error: {e}")
     finally:
-        cam.release()
-        cv2.destroyAllWindows()
+        capture.stop()
+        capture.join(timeout=1.0)
+        source.release()
+        release_camera(camera, run)
+        if context.face_mesh is mesh_graph:
+            context.face_mesh = None
+        release_face_mesh(mesh_graph)
+        if TRACKING_PREVIEW:
+            cv2.destroyAllWindows()
         print("🔴 Head tracking stopped")
  
 class VoiceController:
-    def __init__(self):
+    def __init__(self, context):
+        self.context = context
         self.recognizer = sr.Recognizer()
-        self.translator = Translator()
+        self.translator = googletrans.Translator()
         self.microphone = None
         self.stop_listening = None
+        self.pipeline = UtterancePipeline(
+            self.interpret,
+            self.run_command,
+            workers=VOICE_WORKERS,
+            queue_size=VOICE_QUEUE_SIZE,
+            max_age=VOICE_MAX_AGE,
+            metrics=voice_metrics
+        )
        
         try:
             self.microphone = sr.Microphone()
@@ -171,35 +462,62 @@ class VoiceController:
             'zh': 'zh-CN',
             'ja': 'ja-JP'
         }
+        
+        # Load offline models now rather than on the first utterance
+        current_lang = context.language
+        try:
+            speech_backend.warm(self.language_codes.get(current_lang, 'en-US'))
+        except Exception as e:
+            print(f"❌ Could not load {speech_backend.name} speech model: {e}")
        
         print("✅ Voice Controller initialized")
  
     def voice_callback(self, recognizer, audio):
-        """Background voice recognition callback"""
+        """Background voice recognition callback - hands the audio to the worker pool"""
+        if voice_activity is not None:
+            try:
+                audio = voice_activity.filter(audio)
+            except Exception as e:
+                print(f"❌ Voice activity detection error: {e}")
+            if audio is None:
+                return
+        self.pipeline.submit(audio)
+
+    def interpret(self, audio):
+        """Recognize and translate one utterance; returns (command, match) or None"""
+        lang_name = 'English'
         try:
-            # Get current language
-            current_lang = current_user.get('language', 'en') if current_user else 'en'
+            # Get this patient's current language
+            current_lang = self.context.language
             speech_code = self.language_codes.get(current_lang, 'en-US')
             lang_name = LANGUAGES.get(current_lang, 'English')
             
             # Convert speech to text in the selected language
-            speech_text = recognizer.recognize_google(audio, language=speech_code)
+            with speech_recognition_seconds.time(current_lang):
+                speech_text = speech_backend.recognize(audio, speech_code)
             print(f"🎧 Heard in {lang_name}: '{speech_text}'")
             
-            # Always translate non-English to English for command execution
+            # Known phrases match directly in the patient's language
+            native_match = None
             if current_lang != 'en':
+                native_match = command_matcher.match(speech_text, current_lang)
+            
+            if native_match:
+                translation_cache.record_native_match()
+                return speech_text.lower(), native_match
+            # Otherwise translate non-English to English for command execution
+            elif current_lang != 'en':
                 try:
-                    translated = self.translator.translate(speech_text, src=current_lang, dest='en')
-                    english_command = translated.text
+                    english_command = translation_cache.translate(speech_text, current_lang, self.translate_to_english)
                     print(f"🔄 Translated to English: '{english_command}'")
-                    self.execute_command(english_command.lower())
+                    return english_command.lower(), None
                 except Exception as e:
                     print(f"❌ Translation failed: {e}")
                     # Fallback: try to execute the original command
-                    self.execute_command(speech_text.lower())
+                    return speech_text.lower(), None
             else:
                 # If already English, execute directly
-                self.execute_command(speech_text.lower())
+                return speech_text.lower(), None
             
         except sr.UnknownValueError:
             print(f"❌ Could not understand {lang_name} audio")
@@ -207,68 +525,68 @@ class VoiceController:
             print(f"❌ Speech recognition error: {e}")
         except Exception as e:
             print(f"❌ Voice callback error: {e}")
+        return None
+
+    def run_command(self, result):
+        """Executor side of the pipeline: runs commands in the order they were spoken"""
+        command, match = result
+        self.execute_command(command, match)
+
+    def translate_to_english(self, text, language):
+        return self.translator.translate(text, src=language, dest='en').text
 
-    def execute_command(self, command):
-        """Execute voice commands with intelligent pattern matching"""
+    def execute_command(self, command, match=None):
+        """Execute voice commands via the compiled phrase tables"""
         print(f"🎯 Executing: {command}")
         
         # Normalize command
         command = command.lower().strip()
-        words = command.split()
+        if match is None:
+            match = command_matcher.match(command)
+        action = match.action if match else None
+        voice_commands_total.inc(1, action or 'unmatched')
         
         # Scroll commands
-        if ('scroll' in command and 'down' in command) or command in ['down', 'scroll down']:
+        if action == 'scroll_down':
             pyautogui.scroll(-200)
             print("✅ Scroll down executed")
         
-        elif ('scroll' in command and 'up' in command) or command in ['up', 'scroll up']:
+        elif action == 'scroll_up':
             pyautogui.scroll(200)
             print("✅ Scroll up executed")
         
         # Click commands with context
-        elif any(word in command for word in ['double click', 'double press', 'two clicks']):
+        elif action == 'double_click':
             pyautogui.doubleClick()
             print("✅ Double click executed")
         
-        elif any(word in command for word in ['right click', 'right press', 'context menu']):
+        elif action == 'right_click':
             pyautogui.rightClick()
             print("✅ Right click executed")
         
-        elif any(word in command for word in ['click', 'press', 'select', 'tap']):
+        elif action == 'click':
             pyautogui.click()
             print("✅ Click executed")
         
         # Application commands
-        elif any(phrase in command for phrase in ['open chrome', 'launch chrome', 'start chrome', 'open browser']):
+        elif action == 'open_chrome':
             pyautogui.hotkey('win', 'r')
             time.sleep(0.3)
             pyautogui.write('chrome')
             pyautogui.press('enter')
             print("✅ Chrome opened")
         
-        elif any(phrase in command for phrase in ['open notepad', 'launch notepad', 'start notepad', 'open text editor']):
+        elif action == 'open_notepad':
             pyautogui.hotkey('win', 'r')
             time.sleep(0.3)
             pyautogui.write('notepad')
             pyautogui.press('enter')
             print("✅ Notepad opened")
         
-        # Text input commands (most flexible)
-        elif any(keyword in command for keyword in ['type', 'write', 'enter', 'input']):
-            # Handle different phrasing patterns
-            if 'type' in command:
-                text = command.split('type', 1)[1].strip()
-            elif 'write' in command:
-                text = command.split('write', 1)[1].strip()
-            elif 'enter' in command:
-                text = command.split('enter', 1)[1].strip()
-            elif 'input' in command:
-                text = command.split('input', 1)[1].strip()
-            else:
-                text = command
-            
+        # Text input commands - the matcher hands back whatever followed the keyword
+        elif action == 'type':
             # Clean the text
-            text = self.clean_text_for_typing(text)
+            text = self.clean_text_for_typing(match.text)
             if text:
                 pyautogui.write(text)
                 print(f"✅ Typed: '{text}'")
@@ -276,10 +594,9 @@ class VoiceController:
                 print("❌ No text found to type")
         
         # System control
-        elif any(word in command for word in ['stop', 'exit', 'quit', 'close system']):
-            global voice_control_active, head_tracking_active
-            voice_control_active = False
-            head_tracking_active = False
+        elif action == 'stop':
+            self.context.head_tracking_active = False
+            self.context.voice_control_active = False
             if self.stop_listening:
                 self.stop_listening(wait_for_stop=False)
             print("🛑 All systems stopped via voice command")
@@ -304,9 +621,9 @@ class VoiceController:
 
     def start_voice_control(self):
         """Start background voice listening"""
-        global voice_control_active
         if self.microphone:
-            voice_control_active = True
+            self.context.voice_control_active = True
+            self.pipeline.start()
             self.stop_listening = self.recognizer.listen_in_background(
                 self.microphone, 
                 self.voice_callback
@@ -319,49 +636,73 @@ class VoiceController:
 
     def stop_voice_control(self):
         """Stop background voice listening"""
-        global voice_control_active
-        voice_control_active = False
+        self.context.voice_control_active = False
         if self.stop_listening:
             self.stop_listening(wait_for_stop=False)
+            self.pipeline.stop()
             print("🔴 Voice control stopped")
 
 # Start both systems simultaneously
-def start_hands_free_system():
-    global head_tracking_active, voice_control_active
-    
+def start_hands_free_system(context):
     print("🚀 Starting Hands-Free System...")
     print("🔊 Voice control: ACTIVE")
     print("👀 Head tracking: ACTIVE")
     print("👁️ Blink to click: ENABLED")
     
     # Start voice control
-    vc = VoiceController()
-    voice_success = vc.start_voice_control()
+    vc = VoiceController(context)
+    context.voice_controller = vc
+    vc.start_voice_control()
     
     # Start head tracking
-    head_tracking_active = True
-    head_thread = threading.Thread(target=head_tracking_loop)
-    head_thread.daemon = True
-    head_thread.start()
+    context.head_tracking_active = True
+    if tracking_service is not None:
+        started, message = tracking_service.start(context.session_id, camera_for(context), label=context.username)
+        if not started:
+            # No worker (all busy, camera in use): end the session rather than look active
+            print(f"❌ {message}")
+            context.head_tracking_active = False
+    else:
+        head_thread = threading.Thread(target=head_tracking_loop, args=(context,))
+        head_thread.daemon = True
+        head_thread.start()
     
+    def tracking_running():
+        # The service drops a worker that keeps dying, which ends tracking for this session
+        return context.head_tracking_active and (
+            tracking_service is None or tracking_service.is_running(context.session_id))
+
     # Keep both systems running
     try:
-        while voice_control_active and head_tracking_active:
+        while context.voice_control_active and tracking_running():
             time.sleep(1)
     except KeyboardInterrupt:
         print("🛑 System stopped by user")
     finally:
-        head_tracking_active = False
+        context.head_tracking_active = False
+        if tracking_service is not None:
+            tracking_service.stop(context.session_id)
         vc.stop_voice_control()
         print("🔴 All systems stopped")
 
+def camera_tracking_session(context):
+    """Head tracking only (started from /api/tracking/start), until the session stops it"""
+    try:
+        while context.head_tracking_active and tracking_service.is_running(context.session_id):
+            time.sleep(1)
+    finally:
+        context.head_tracking_active = False
+        tracking_service.stop(context.session_id)
+
 # Control routes
 @app.route('/start_hands_free')
 def start_hands_free_route():
-    global head_tracking_active, voice_control_active
+    context = current_context()
+    if not context:
+        return jsonify({'success': False, 'message': 'Please log in first'})
     
-    if not head_tracking_active and not voice_control_active:
-        system_thread = threading.Thread(target=start_hands_free_system)
+    if not context.hands_free_active:
+        system_thread = threading.Thread(target=start_hands_free_system, args=(context,))
         system_thread.daemon = True
         system_thread.start()
         return jsonify({'success': True, 'message': 'Hands-free system started!'})
@@ -369,11 +710,49 @@ def start_hands_free_route():
 
 @app.route('/stop_hands_free')
 def stop_hands_free_route():
-    global head_tracking_active, voice_control_active
-    head_tracking_active = False
-    voice_control_active = False
+    context = current_context()
+    if context:
+        context.stop_hands_free()
     return jsonify({'success': True, 'message': 'Hands-free system stopped!'})
  
+# Tracking service control, per patient session
+@app.route('/api/tracking/start', methods=['POST'])
+def start_tracking_route():
+    context = current_context()
+    if not context or context.user_type != 'patients':
+        return jsonify({'success': False, 'message': 'Patients only'})
+    if tracking_service is None:
+        return jsonify({'success': False, 'message': 'Tracking service is off (TRACKING_WORKERS=0)'})
+    if context.head_tracking_active:
+        return jsonify({'success': False, 'message': 'Head tracking is already running'})
+
+    context.head_tracking_active = True
+    started, message = tracking_service.start(context.session_id, camera_for(context), label=context.username)
+    if not started:
+        context.head_tracking_active = False
+        return jsonify({'success': False, 'message': message})
+    threading.Thread(target=camera_tracking_session, args=(context,), daemon=True).start()
+    return jsonify({'success': True, 'message': message})
+
+@app.route('/api/tracking/stop', methods=['POST'])
+def stop_tracking_route():
+    context = current_context()
+    if not context:
+        return jsonify({'success': False, 'message': 'Please log in first'})
+    # Ends this session's hands-free system too, like /stop_hands_free
+    context.head_tracking_active = False
+    if tracking_service is not None:
+        tracking_service.stop(context.session_id)
+    return jsonify({'success': True, 'message': 'Head tracking stopped'})
+
+@app.route('/api/tracking/status')
+def tracking_status_route():
+    context = current_context()
+    if not context:
+        return jsonify({'success': False, 'message': 'Please log in first'})
+    worker = tracking_service.status(context.session_id) if tracking_service is not None else None
+    return jsonify({'success': True, 'running': worker is not None, 'worker': worker})
+
 @app.route('/')
 def welcome_page():
     return render_template('welcome.html')
@@ -397,99 +776,129 @@ def signup():
     if not all([username, password, name, user_type]):
         return jsonify({'success': False, 'message': 'All fields are required'})
    
-    user_data = load_user_data()
+    if user_type not in USER_ROLES:
+        return jsonify({'success': False, 'message': 'Invalid user type'})
    
-    # Check if username already exists
-    for user_category in user_data.values():
-        if username in user_category:
-            return jsonify({'success': False, 'message': 'Username already exists'})
+    directory = load_user_directory()
+    # Cheap check first so a taken username doesn't cost a hash; add() below still
+    # settles a race between two signups for the same name
+    if username in directory:
+        return jsonify({'success': False, 'message': 'Username already exists'})
    
-    # Generate patient ID for patients
-    patient_id = None
-    if user_type == 'patients':
-        patient_count = len(user_data['patients']) + 1
-        patient_id = f"P{patient_count:03d}"
+    try:
+        password_hash = password_hasher.hash(password)
+    except LoginBusy:
+        return login_busy_response()
    
     # Add new user
     new_user = {
-        'password': password,
+        'password': password_hash,
         'name': name,
         'language': 'en'
     }
    
-    if patient_id:
-        new_user['patient_id'] = patient_id
     if user_type == 'doctors':
         new_user['specialization'] = data.get('specialization', 'General')
     elif user_type == 'nurses':
         new_user['department'] = data.get('department', 'General')
    
-    user_data[user_type][username] = new_user
-    save_user_data(user_data)
+    # Checks the username and hands out the next patient ID in one atomic step
+    if not directory.add(username, user_type, new_user):
+        return jsonify({'success': False, 'message': 'Username already exists'})
+    save_user_directory(directory)
    
     return jsonify({'success': True, 'message': 'Account created successfully!'})
  
 @app.route('/api/login', methods=['POST'])
 def login():
-    global current_user
     username = request.form['username']
     password = request.form['password']
     selected_language = request.form.get('language', 'en')
    
-    user_data = load_user_data()
+    retry_after = login_limiter.retry_after(username)
+    if retry_after:
+        response = jsonify({'success': False, 'message': 'Too many failed attempts, please try again later'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
    
-    for user_type, users in user_data.items():
-        if username in users and users[username]['password'] == password:
-            # Update user's language preference in database
-            users[username]['language'] = selected_language
-            save_user_data(user_data)
-           
-            current_user = {
-                'username': username,
-                'name': users[username]['name'],
-                'type': user_type,
-                'patient_id': users[username].get('patient_id', ''),
-                'specialization': users[username].get('specialization', ''),
-                'department': users[username].get('department', ''),
-                'language': selected_language
-            }
-           
-            session['current_language'] = selected_language
-           
-            if user_type == 'patients':
-                # Start both systems simultaneously when patient logs in
-                system_thread = threading.Thread(target=start_hands_free_system)
-                system_thread.daemon = True
-                system_thread.start()
-                
-                lang_name = LANGUAGES.get(selected_language, 'English')
-                return jsonify({
-                    'success': True,
-                    'user_type': 'patient',
-                    'message': f'Hands-free system activated! Voice: {lang_name}, Head tracking: Active'
-                })
-            elif user_type == 'doctors':
-                return jsonify({
-                    'success': True,
-                    'user_type': 'doctor',
-                    'message': f'Welcome Dr. {users[username]["name"]}'
-                })
-            else:
-                return jsonify({
-                    'success': True,
-                    'user_type': 'nurse',
-                    'message': f'Welcome {users[username]["name"]}'
-                })
+    directory = load_user_directory()
+    user_type, account = directory.lookup(username)
+    try:
+        valid, new_hash = password_hasher.verify(account['password'] if account else None, password)
+    except LoginBusy:
+        return login_busy_response()
    
+    if valid:
+        login_limiter.record_success(username)
+        # Remember the language for next time; unchanged preferences cost no write
+        changed = account.get('language') != selected_language
+        account['language'] = selected_language
+        if new_hash:
+            # A re-hashed password is written straight away, not left to the batched write
+            account['password'] = new_hash
+            user_data_writer.write_now(directory)
+        elif changed:
+            user_data_writer.schedule(directory)
+       
+        # A new login in the same browser replaces the old context
+        previous = current_context()
+        if previous:
+            session_registry.remove(previous.session_id)
+        context = session_registry.create({
+            'username': username,
+            'name': account['name'],
+            'type': user_type,
+            'patient_id': account.get('patient_id', ''),
+            'specialization': account.get('specialization', ''),
+            'department': account.get('department', ''),
+            'language': selected_language
+        })
+       
+        session['sid'] = context.session_id
+        session['current_language'] = selected_language
+       
+        if user_type == 'patients':
+            # Start both systems simultaneously when patient logs in
+            system_thread = threading.Thread(target=start_hands_free_system, args=(context,))
+            system_thread.daemon = True
+            system_thread.start()
+            
+            lang_name = LANGUAGES.get(selected_language, 'English')
+            return jsonify({
+                'success': True,
+                'user_type': 'patient',
+                'message': f'Hands-free system activated! Voice: {lang_name}, Head tracking: Active'
+            })
+        elif user_type == 'doctors':
+            return jsonify({
+                'success': True,
+                'user_type': 'doctor',
+                'message': f'Welcome Dr. {account["name"]}'
+            })
+        else:
+            return jsonify({
+                'success': True,
+                'user_type': 'nurse',
+                'message': f'Welcome {account["name"]}'
+            })
+   
+    login_limiter.record_failure(username)
     return jsonify({'success': False, 'message': 'Invalid username or password'})
  
 @app.route('/change_language/<lang_code>')
 def change_language(lang_code):
-    if lang_code in ['en', 'es', 'ar', 'fr', 'de', 'it', 'pt', 'ru', 'zh', 'ja']:
+    if lang_code in LANGUAGES:
         session['current_language'] = lang_code
+        current_user = get_current_user()
         if current_user:
             current_user['language'] = lang_code
         lang_name = LANGUAGES.get(lang_code, 'Unknown')
+        event_broker.publish('language', {
+            'username': current_user['username'] if current_user else None,
+            'language': lang_code,
+            'name': lang_name
+        })
         return jsonify({'success': True, 'message': f'Language changed to {lang_name}'})
     return jsonify({'success': False, 'message': 'Invalid language code'})
  
@@ -501,6 +910,7 @@ def current_language():
  
 @app.route('/dashboard')
 def dashboard():
+    current_user = get_current_user()
     if not current_user:
         return redirect('/')
    
@@ -514,109 +924,481 @@ def dashboard():
 # Medical endpoints (your existing medical functions)
 @app.route('/api/save_prescription', methods=['POST'])
 def save_prescription():
+    current_user = get_current_user()
     if current_user and current_user['type'] == 'doctors':
         data = request.json
-        medical_data = load_medical_data()
-        
         patient_id = data['patient_id']
         medication = data['medication']
         dosage = data['dosage']
         
-        if patient_id in medical_data:
-            medical_data[patient_id]['prescriptions'].append({
+        if add_medical_record(patient_id, 'prescriptions', {
                 'medication': medication,
                 'dosage': dosage,
                 'prescribed_by': current_user['name'],
                 'date': datetime.now().strftime("%Y-%m-%d %H:%M")
-            })
-            save_medical_data(medical_data)
+            }):
             return jsonify({'success': True, 'message': 'Prescription saved!'})
     
     return jsonify({'success': False, 'message': 'Doctors only can prescribe'})
 
 @app.route('/api/save_diagnosis', methods=['POST'])
 def save_diagnosis():
+    current_user = get_current_user()
     if current_user and current_user['type'] == 'doctors':
         data = request.json
-        medical_data = load_medical_data()
-        
         patient_id = data['patient_id']
         diagnosis = data['diagnosis']
         treatment = data['treatment']
         
-        if patient_id in medical_data:
-            medical_data[patient_id]['doctor_notes'].append({
+        if add_medical_record(patient_id, 'doctor_notes', {
                 'type': 'diagnosis',
                 'diagnosis': diagnosis,
                 'treatment': treatment,
                 'doctor': current_user['name'],
                 'date': datetime.now().strftime("%Y-%m-%d %H:%M")
-            })
-            save_medical_data(medical_data)
+            }):
             return jsonify({'success': True, 'message': 'Diagnosis saved!'})
     
     return jsonify({'success': False, 'message': 'Doctors only can diagnose'})
 
 @app.route('/api/save_vitals', methods=['POST'])
 def save_vitals():
+    current_user = get_current_user()
     if current_user and current_user['type'] == 'nurses':
         data = request.json
-        medical_data = load_medical_data()
-        
         patient_id = data['patient_id']
         blood_pressure = data['blood_pressure']
         heart_rate = data['heart_rate']
         temperature = data['temperature']
         notes = data.get('notes', '')
         
-        if patient_id in medical_data:
-            medical_data[patient_id]['vital_signs'].append({
+        if add_medical_record(patient_id, 'vital_signs', {
                 'blood_pressure': blood_pressure,
                 'heart_rate': heart_rate,
                 'temperature': temperature,
                 'notes': notes,
                 'nurse': current_user['name'],
                 'date': datetime.now().strftime("%Y-%m-%d %H:%M")
-            })
-            save_medical_data(medical_data)
+            }):
             return jsonify({'success': True, 'message': 'Vital signs recorded!'})
     
     return jsonify({'success': False, 'message': 'Nurses only can record vitals'})
 
 @app.route('/api/save_nurse_note', methods=['POST'])
 def save_nurse_note():
+    current_user = get_current_user()
     if current_user and current_user['type'] == 'nurses':
         data = request.json
-        medical_data = load_medical_data()
-        
         patient_id = data['patient_id']
         note = data['note']
         
-        if patient_id in medical_data:
-            medical_data[patient_id]['doctor_notes'].append({
+        if add_medical_record(patient_id, 'doctor_notes', {
                 'type': 'nurse_observation',
                 'note': note,
                 'nurse': current_user['name'],
                 'date': datetime.now().strftime("%Y-%m-%d %H:%M")
-            })
-            save_medical_data(medical_data)
+            }):
             return jsonify({'success': True, 'message': 'Observation saved!'})
     
     return jsonify({'success': False, 'message': 'Nurses only'})
 
+# Paging for /api/patient_data
+RECORD_PAGE_SIZE = 200
+MAX_RECORD_PAGE_SIZE = 2000
+PATIENT_DATA_FILTERS = ['patient_id', 'type', 'from', 'to', 'limit', 'cursor', 'since']
+
+def make_change_cursor(version):
+    generation, last_id = version
+    return f"{generation}-{last_id}"
+
+def parse_change_cursor(token):
+    try:
+        generation, last_id = token.split('-')
+        return int(generation), int(last_id)
+    except ValueError:
+        return None
+
+def query_patient_records(version):
+    """Filtered, paged and incremental view of the medical records"""
+    after_id = 0
+    reset = False
+    token = request.args.get('since') or request.args.get('cursor')
+    if token:
+        parsed = parse_change_cursor(token)
+        if parsed is None:
+            return {'success': False, 'message': 'Invalid cursor'}
+        if parsed[0] == version[0]:
+            after_id = parsed[1]
+        else:
+            # Records were rewritten since this cursor was issued, start over
+            reset = True
+
+    kinds = [kind for kind in request.args.get('type', '').split(',') if kind]
+    if any(kind not in RECORD_TYPES for kind in kinds):
+        return {'success': False, 'message': 'Invalid record type'}
+    patient_ids = [pid for pid in request.args.get('patient_id', '').split(',') if pid]
+
+    try:
+        limit = int(request.args.get('limit', RECORD_PAGE_SIZE))
+    except ValueError:
+        return {'success': False, 'message': 'Invalid limit'}
+    limit = max(1, min(limit, MAX_RECORD_PAGE_SIZE))
+
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if date_to and len(date_to) == len('YYYY-MM-DD'):
+        # A bare day includes every record made on that day
+        date_to += ' 23:59'
+
+    result = medical_store.query_records(
+        patient_ids=patient_ids,
+        kinds=kinds,
+        date_from=date_from,
+        date_to=date_to,
+        after_id=after_id,
+        limit=limit
+    )
+
+    data = {}
+    for record_id, patient_id, kind, record in result['records']:
+        patient = data.setdefault(patient_id, {k: [] for k in (kinds or RECORD_TYPES)})
+        patient[kind].append(dict(record, id=record_id))
+
+    generation, last_id = result['version']
+    if result['has_more']:
+        last_id = result['records'][-1][0]
+    return {
+        'success': True,
+        'data': data,
+        'cursor': make_change_cursor((generation, last_id)),
+        'has_more': result['has_more'],
+        'reset': reset
+    }
+
+def patient_data_etag(version):
+    return hashlib.sha1(f"{version}|{request.query_string.decode()}".encode()).hexdigest()
+
 @app.route('/api/patient_data')
 def get_patient_data():
+    current_user = get_current_user()
     if current_user and current_user['type'] in ['doctors', 'nurses']:
-        medical_data = load_medical_data()
-        return jsonify({'success': True, 'data': medical_data})
+        # A cheap version check; the full snapshot is only loaded for the unfiltered dump
+        version = medical_store.version()
+
+        # Same data version + same query = same body, so let the browser reuse it
+        etag = patient_data_etag(version)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        elif any(key in request.args for key in PATIENT_DATA_FILTERS):
+            response = jsonify(query_patient_records(version))
+        else:
+            snapshot = medical_data_cache.get()
+            # A save may have landed in between, so describe what is actually sent
+            version = snapshot['version']
+            etag = patient_data_etag(version)
+            response = jsonify({
+                'success': True,
+                'data': snapshot['data'],
+                'cursor': make_change_cursor(version)
+            })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     
     return jsonify({'success': False, 'message': 'Unauthorized'})
 
+# Bulk import/export: an upload is spooled to a temporary file before its one
+# transaction, so this caps the disk and the insert time one request can take
+IMPORT_MAX_RECORDS = int(os.environ.get('IMPORT_MAX_RECORDS', 200000))
+
+def record_author_role(kind, record):
+    """(role the save_* routes require to create this record, what to call it)"""
+    if kind == 'doctor_notes':
+        if record.get('type') == 'nurse_observation':
+            return 'nurses', 'nurse observations'
+        return 'doctors', 'diagnosis notes'
+    if kind == 'prescriptions':
+        return 'doctors', 'prescriptions'
+    return 'nurses', 'vital signs'
+
+def authorized_entries(entries, current_user):
+    """Pass parsed import lines through, stopping at one the user couldn't have saved by hand"""
+    for line, patient_id, kind, record in entries:
+        if kind in RECORD_TYPES:
+            role, name = record_author_role(kind, record)
+            if role != current_user['type']:
+                raise IngestError(line, f"Only {role} can add {name}")
+            # Author fields come from the file, so keep track of who vouched for them
+            record['imported_by'] = current_user['name']
+        yield line, patient_id, kind, record
+
+@app.route('/api/records/import', methods=['POST'])
+def import_records():
+    """Add a batch of NDJSON records (one {"patient_id", "type", "record"} per line), all or nothing.
+
+    Each line follows the save_* rules: doctors add prescriptions and diagnoses,
+    nurses add vital signs and observations.
+    """
+    current_user = get_current_user()
+    if not current_user or current_user['type'] not in ['doctors', 'nurses']:
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+
+    create_patients = request.args.get('create_patients') == '1'
+    try:
+        # Read line by line so the body is never held in memory as a whole. The raw
+        # request stream reads one byte per call when asked for a line, so buffer it.
+        # ingest() reads the whole upload before it takes the write lock
+        with storage_seconds.time('bulk_import'):
+            counts = medical_store.ingest(
+                authorized_entries(parse_ndjson(io.BufferedReader(request.stream, 1 << 16)), current_user),
+                create_patients=create_patients,
+                max_records=IMPORT_MAX_RECORDS
+            )
+    except IngestError as e:
+        return jsonify({'success': False, 'message': f"{e}; nothing was imported", 'line': e.line})
+
+    imported = sum(counts.values())
+    if imported:
+        medical_data_cache.invalidate()
+        # One event per record would flood the dashboards, so have them reload instead
+        event_broker.resync()
+        print(f"📥 {current_user['username']} imported {imported} records")
+    return jsonify({
+        'success': True,
+        'imported': imported,
+        'counts': counts,
+        'cursor': make_change_cursor(medical_store.version())
+    })
+
+@app.route('/api/records/export')
+def export_records():
+    """All matching records as streamed NDJSON, in the format /api/records/import reads"""
+    current_user = get_current_user()
+    if not current_user or current_user['type'] not in ['doctors', 'nurses']:
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+
+    kinds = [kind for kind in request.args.get('type', '').split(',') if kind]
+    if any(kind not in RECORD_TYPES for kind in kinds):
+        return jsonify({'success': False, 'message': 'Invalid record type'})
+    patient_ids = [pid for pid in request.args.get('patient_id', '').split(',') if pid]
+    date_to = request.args.get('to')
+    if date_to and len(date_to) == len('YYYY-MM-DD'):
+        date_to += ' 23:59'
+
+    after_id = 0
+    version = medical_store.version()
+    if request.args.get('since'):
+        parsed = parse_change_cursor(request.args['since'])
+        if parsed is None:
+            return jsonify({'success': False, 'message': 'Invalid cursor'})
+        if parsed[0] == version[0]:
+            after_id = parsed[1]
+
+    lines = medical_store.export_ndjson(
+        patient_ids=patient_ids,
+        kinds=kinds,
+        date_from=request.args.get('from'),
+        date_to=date_to,
+        after_id=after_id,
+        until_id=version[1]
+    )
+    # The cursor covers exactly what this export contains, for a later ?since= export
+    return Response(lines, mimetype='application/x-ndjson', headers={
+        'X-Records-Cursor': make_change_cursor(version),
+        'Cache-Control': 'no-cache'
+    })
+
+# Trend charts: default window and the most points one response may carry
+VITALS_DEFAULT_DAYS = 7
+VITALS_DEFAULT_BUCKETS = 200
+VITALS_MAX_POINTS = 2000
+
+@app.route('/api/vitals/<patient_id>/trend')
+def vitals_trend(patient_id):
+    """Vital signs over a time range, as min/max/avg per bucket (or raw readings)"""
+    current_user = get_current_user()
+    if not current_user or current_user['type'] not in ['doctors', 'nurses']:
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    if not medical_store.has_patient(patient_id):
+        return jsonify({'success': False, 'message': 'Unknown patient'})
+
+    fields = [f for f in request.args.get('fields', ','.join(VITAL_FIELDS)).split(',') if f]
+    if not fields or any(f not in VITAL_FIELDS for f in fields):
+        return jsonify({'success': False, 'message': 'Invalid fields'})
+    try:
+        buckets = int(request.args.get('buckets', VITALS_DEFAULT_BUCKETS))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid buckets'})
+    buckets = max(1, min(buckets, VITALS_MAX_POINTS))
+
+    series = vitals_index.series(patient_id)
+    date_to = request.args.get('to')
+    date_from = request.args.get('from')
+    end = parse_timestamp(date_to) if date_to else None
+    start = parse_timestamp(date_from) if date_from else None
+    if (date_to and end is None) or (date_from and start is None):
+        return jsonify({'success': False, 'message': 'Dates must look like YYYY-MM-DD or YYYY-MM-DD HH:MM'})
+    if date_to and len(date_to) == len('YYYY-MM-DD'):
+        # A bare day includes every reading taken on that day
+        end += 24 * 3600 - 1
+    if end is None:
+        end = int(series.timestamps[-1]) if series.size else int(time.time())
+    if start is None:
+        start = end - VITALS_DEFAULT_DAYS * 24 * 3600
+    if start > end:
+        return jsonify({'success': False, 'message': "'from' is after 'to'"})
+
+    lo, hi = series.span(start, end)
+    response = {'success': True, 'patient_id': patient_id, 'readings': hi - lo}
+    if hi - lo <= buckets or (request.args.get('raw') == '1' and hi - lo <= VITALS_MAX_POINTS):
+        response['raw'] = series.readings(start, end, fields)
+    else:
+        response['trend'] = series.downsample(start, end, buckets, fields)
+    return jsonify(response)
+
+MEDICAL_EVENT_TOPICS = list(RECORD_TYPES)
+
+@app.route('/api/events')
+def event_stream():
+    """Server-Sent Events stream replacing the dashboard polling loops"""
+    current_user = get_current_user()
+    if not current_user:
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+
+    topics = [topic for topic in request.args.get('topics', 'language').split(',') if topic]
+    if current_user['type'] == 'patients':
+        # Patients only get their own language changes
+        topics = [topic for topic in topics if topic == 'language']
+        match = {'username': current_user['username']}
+    else:
+        match = {}
+        if request.args.get('patient_id'):
+            match['patient_id'] = request.args['patient_id']
+    if not topics or any(t not in MEDICAL_EVENT_TOPICS + ['language'] for t in topics):
+        return jsonify({'success': False, 'message': 'Invalid topics'})
+
+    # Browsers resend the last id they saw in this header when reconnecting
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscription = event_broker.subscribe(topics, match, last_event_id)
+    return Response(
+        event_broker.stream(subscription),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/debug_events')
+def debug_events():
+    return jsonify(event_broker.stats())
+
+def tracking_snapshots():
+    """TrackingMetrics.snapshot() of every head-tracking loop in this process"""
+    return [
+        dict(context.tracking_metrics.snapshot(), patient=context.username, camera=camera_for(context))
+        for context in session_registry.tracking()
+    ]
+
+@app.route('/debug_tracking')
+def debug_tracking():
+    return jsonify({'sessions': tracking_snapshots()})
+
+@app.route('/debug_tracking_workers')
+def debug_tracking_workers():
+    if tracking_service is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(tracking_service.stats(), enabled=True))
+
+@app.route('/debug_voice')
+def debug_voice():
+    return jsonify({
+        'pipeline': voice_metrics.snapshot(),
+        'speech_backend': speech_backend.stats(),
+        'voice_activity': voice_activity.stats() if voice_activity is not None else None,
+        'translation_cache': translation_cache.stats()
+    })
+
+@app.route('/debug_sessions')
+def debug_sessions():
+    return jsonify(session_registry.stats())
+
+@app.route('/debug_logins')
+def debug_logins():
+    return jsonify({
+        'passwords': password_hasher.stats(),
+        'rate_limit': login_limiter.stats()
+    })
+
 @app.route('/debug_users')
 def debug_users():
     user_data = load_user_data()
     return jsonify(user_data)
  
+@app.route('/debug_cache')
+def debug_cache():
+    return jsonify({
+        'users': user_data_cache.stats(),
+        'user_writes': user_data_writer.stats(),
+        'medical': medical_data_cache.stats(),
+        'vitals': vitals_index.stats()
+    })
+
+# The subsystems keep their own counters; /metrics reads them only when scraped
+metrics.collect_rows('tracking', tracking_snapshots, labels=('patient', 'camera'))
+if tracking_service is not None:
+    metrics.collect_snapshot('tracking_service', tracking_service.stats)
+    metrics.collect_rows('tracking_worker', tracking_service.health, labels=('patient', 'camera'))
+metrics.collect_snapshot('voice_pipeline', voice_metrics.snapshot)
+metrics.collect_snapshot('speech_backend', speech_backend.stats)
+if voice_activity is not None:
+    metrics.collect_snapshot('voice_activity', voice_activity.stats)
+metrics.collect_snapshot('translation_cache', translation_cache.stats)
+metrics.collect_snapshot('events', event_broker.stats)
+metrics.collect_snapshot('sessions', session_registry.stats)
+metrics.collect_snapshot('passwords', password_hasher.stats)
+metrics.collect_snapshot('login_rate_limit', login_limiter.stats)
+metrics.collect_snapshot('user_cache', user_data_cache.stats)
+metrics.collect_snapshot('user_writes', user_data_writer.stats)
+metrics.collect_snapshot('medical_cache', medical_data_cache.stats)
+metrics.collect_snapshot('vitals', vitals_index.stats)
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def record_request_time(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        http_request_seconds.observe(
+            time.perf_counter() - started,
+            request.endpoint or 'unmatched', request.method, str(response.status_code)
+        )
+    return response
+
+if METRICS_ENABLED:
+    app.before_request(start_request_timer)
+    app.after_request(record_request_time)
+
+@app.route('/metrics')
+def metrics_route():
+    if not METRICS_ENABLED:
+        return "Metrics are disabled (METRICS=0)", 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug_profile')
+def debug_profile():
+    """?action=start|stop; the report is collapsed stacks for flamegraph tools"""
+    action = request.args.get('action', 'report')
+    if action == 'start':
+        profiler.start()
+        return jsonify(profiler.stats())
+    if action == 'stop':
+        profiler.stop()
+    limit = request.args.get('limit', type=int)
+    return Response(profiler.collapsed(limit), mimetype='text/plain')
+ 
 @app.route('/reset_users')
 def reset_users():
     user_data = {
@@ -634,17 +1416,17 @@ def reset_users():
         "nurses": {
             "nurse1": {"password": "123", "name": "Nurse Brown", "department": "Emergency"},
             "nurse2": {"password": "123", "name": "Nurse Davis", "department": "ICU"}
-        }
+        },
+        # Keep the patient counter, so IDs of deleted accounts (and their medical rows) aren't reused
+        META_KEY: dict(load_user_data().get(META_KEY, {}))
     }
     save_user_data(user_data)
     return "Users reset successfully!"
  
 @app.route('/logout')
 def logout():
-    global current_user, voice_control_active, head_tracking_active
-    voice_control_active = False
-    head_tracking_active = False
-    current_user = None
+    # Stops this user's hands-free system; other sessions keep running
+    session_registry.remove(session.get('sid'))
     session.clear()
     return redirect('/')
  
@@ -0,0 +1,182 @@
+"""Password hashing and login throttling.
+
+Passwords are stored as salted werkzeug hashes ("pbkdf2:sha256:<iterations>$salt$hash")
+instead of plaintext. The method string sets the cost, so it can be tuned to
+the hardware. Accounts that still hold a plaintext password, or a hash made
+with an older method, are re-hashed the next time that user logs in
+successfully.
+
+Hashing is deliberately slow, so PasswordHasher runs it on a small thread
+pool. That caps how many CPU cores logins can take at shift change, and
+requests beyond ``max_pending`` are turned away instead of piling up.
+LoginRateLimiter stops password guessing against a single username before
+any hashing happens.
+"""
+import hmac
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+HASH_PREFIXES = ('pbkdf2:', 'scrypt:')
+# werkzeug's scrypt parameters when the method string leaves them out
+SCRYPT_DEFAULTS = ('32768', '8', '1')
+
+
+class LoginBusy(Exception):
+    """Too many password checks are already queued, or one took longer than the timeout"""
+
+
+def is_password_hash(stored):
+    return isinstance(stored, str) and stored.startswith(HASH_PREFIXES) and stored.count('$') == 2
+
+
+def normalize_method(method):
+    """The method string werkzeug stores for ``method``: 'scrypt' is saved as 'scrypt:32768:8:1'"""
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        args = list(SCRYPT_DEFAULTS)
+    elif name == 'pbkdf2':
+        args = (args or ['sha256'])[:2]
+        if len(args) == 1:
+            args.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    return ':'.join([name] + args)
+
+
+class PasswordHasher:
+    def __init__(self, method='pbkdf2:sha256:260000', workers=2, max_pending=32, timeout=10.0):
+        self.method = method
+        self.stored_method = normalize_method(method)
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.verifications = 0
+        self.migrations = 0
+        self.rejected_busy = 0
+        self.timed_out = 0
+        self.verify_seconds = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._dummy_hash = None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, stored):
+        return not is_password_hash(stored) or stored.split('$', 1)[0] != self.stored_method
+
+    def _check(self, stored, password):
+        started = time.perf_counter()
+        if stored is None:
+            # Unknown user: spend the same time as a real check so usernames can't be probed
+            if self._dummy_hash is None:
+                self._dummy_hash = generate_password_hash('unused', self.method)
+            check_password_hash(self._dummy_hash, password)
+            ok, new_hash = False, None
+        elif is_password_hash(stored):
+            ok = check_password_hash(stored, password)
+            new_hash = generate_password_hash(password, self.method) if ok and self.needs_rehash(stored) else None
+        else:
+            # Legacy plaintext entry: compare, then hash it for next time
+            ok = hmac.compare_digest(str(stored).encode(), password.encode())
+            new_hash = generate_password_hash(password, self.method) if ok else None
+        with self._lock:
+            self.verifications += 1
+            self.verify_seconds += time.perf_counter() - started
+            if new_hash:
+                self.migrations += 1
+        return ok, new_hash
+
+    def verify(self, stored, password):
+        """Check ``password`` against ``stored`` (None for an unknown user).
+
+        Returns (ok, new_hash); new_hash is set when the stored value should be
+        replaced (plaintext or outdated method). Raises LoginBusy when the pool is full.
+        """
+        return self._run(self._check, stored, password)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected_busy += 1
+            raise LoginBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the hash is done, even when the caller stops waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.timed_out += 1
+            raise LoginBusy()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method,
+                'verifications': self.verifications,
+                'migrated': self.migrations,
+                'rejected_busy': self.rejected_busy,
+                'timed_out': self.timed_out,
+                'avg_verify_ms': round(self.verify_seconds / self.verifications * 1000, 1)
+                if self.verifications else 0.0
+            }
+
+
+class LoginRateLimiter:
+    """Allows ``max_failures`` failed logins per username within ``window`` seconds"""
+
+    def __init__(self, max_failures=5, window=300, max_tracked=10000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_tracked = max_tracked
+        self.blocked = 0
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, username, now):
+        failures = self._failures.get(username)
+        if failures is None:
+            return None
+        while failures and now - failures[0] > self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[username]
+            return None
+        return failures
+
+    def retry_after(self, username):
+        """Seconds until ``username`` may try again, or 0 if a login attempt is allowed now"""
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(username, now)
+            if failures is None or len(failures) < self.max_failures:
+                return 0
+            self.blocked += 1
+            return max(1, int(self.window - (now - failures[0])) + 1)
+
+    def record_failure(self, username):
+        now = time.monotonic()
+        with self._lock:
+            if username not in self._failures and len(self._failures) >= self.max_tracked:
+                # Forget usernames whose failures have all expired before tracking more
+                for name in list(self._failures):
+                    self._recent(name, now)
+            self._failures.setdefault(username, deque(maxlen=self.max_failures)).append(now)
+
+    def record_success(self, username):
+        with self._lock:
+            self._failures.pop(username, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked_usernames': len(self._failures),
+                'blocked_attempts': self.blocked
+            }
@@ -0,0 +1,114 @@
+"""Micro-benchmark for voice command dispatch.
+
+Compares the compiled CommandMatcher with the old if/elif substring chain
+over a few thousand generated utterances and lists the cases where they
+disagree (mostly substring misfires such as "enter" inside "center").
+
+    python benchmarks/bench_commands.py --utterances 5000 --repeat 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands import COMMAND_PHRASES, SLOT, WHOLE_END, WHOLE_START, CommandMatcher
+
+# Utterances that should and shouldn't scroll, whatever the generator comes up with
+SPOT_CHECKS = [('down', 'scroll_down'), ('go up', 'scroll_up'), ('scroll down please', 'scroll_down'),
+               ('shut down', None), ('turn it down', None), ('sit me up', None), ('down world', None),
+               ("don't go down there", None), ('page up', 'scroll_up')]
+
+FILLER = ['please', 'now', 'the', 'page', 'okay', 'can', 'you', 'center', 'stopwatch',
+          'update', 'window', 'hello', 'world', 'entertainment', 'typewriter']
+
+
+def legacy_match(command):
+    """The substring chain execute_command used before the phrase tables"""
+    command = command.lower().strip()
+    if ('scroll' in command and 'down' in command) or command in ['down', 'scroll down']:
+        return 'scroll_down'
+    if ('scroll' in command and 'up' in command) or command in ['up', 'scroll up']:
+        return 'scroll_up'
+    if any(word in command for word in ['double click', 'double press', 'two clicks']):
+        return 'double_click'
+    if any(word in command for word in ['right click', 'right press', 'context menu']):
+        return 'right_click'
+    if any(word in command for word in ['click', 'press', 'select', 'tap']):
+        return 'click'
+    if any(p in command for p in ['open chrome', 'launch chrome', 'start chrome', 'open browser']):
+        return 'open_chrome'
+    if any(p in command for p in ['open notepad', 'launch notepad', 'start notepad', 'open text editor']):
+        return 'open_notepad'
+    if any(keyword in command for keyword in ['type', 'write', 'enter', 'input']):
+        return 'type'
+    if any(word in command for word in ['stop', 'exit', 'quit', 'close system']):
+        return 'stop'
+    return None
+
+
+def generate_utterances(count, seed=1):
+    rng = random.Random(seed)
+    phrases = [phrase.lstrip(WHOLE_START).rstrip(WHOLE_END) for _, group in COMMAND_PHRASES['en'] for phrase in group]
+    utterances = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(0, 2))]
+        if rng.random() < 0.85:
+            words += rng.choice(phrases).replace(SLOT, ' '.join(rng.sample(FILLER, 2))).split()
+        words += [rng.choice(FILLER) for _ in range(rng.randint(0, 2))]
+        utterances.append(' '.join(words))
+    return utterances
+
+
+def time_per_call(fn, utterances, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for utterance in utterances:
+            fn(utterance)
+    return (time.perf_counter() - started) / (repeat * len(utterances))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--utterances', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    utterances = generate_utterances(args.utterances)
+    started = time.perf_counter()
+    matcher = CommandMatcher()
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    compiled = time_per_call(matcher.match, utterances, args.repeat)
+    legacy = time_per_call(legacy_match, utterances, args.repeat)
+    print(f"🧩 Compiled phrase tables in {compile_ms:.2f} ms")
+    print(f"⚡ CommandMatcher: {compiled * 1e6:.2f} µs/utterance")
+    print(f"🐢 Substring chain: {legacy * 1e6:.2f} µs/utterance")
+
+    disagreements = []
+    for utterance in utterances:
+        match = matcher.match(utterance)
+        new_action = match.action if match else None
+        old_action = legacy_match(utterance)
+        if new_action != old_action:
+            disagreements.append((utterance, old_action, new_action))
+    print(f"🔀 {len(disagreements)} of {len(utterances)} utterances dispatch differently")
+    for utterance, old_action, new_action in disagreements[:10]:
+        print(f"   '{utterance}': {old_action} -> {new_action}")
+
+    wrong = []
+    for utterance, expected in SPOT_CHECKS:
+        match = matcher.match(utterance)
+        if (match.action if match else None) != expected:
+            wrong.append((utterance, expected, match.action if match else None))
+    print(f"🎯 {len(SPOT_CHECKS) - len(wrong)} of {len(SPOT_CHECKS)} spot checks dispatch as expected")
+    for utterance, expected, action in wrong:
+        print(f"   '{utterance}': expected {expected}, got {action}")
+    if wrong:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
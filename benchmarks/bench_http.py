@@ -0,0 +1,426 @@
+"""HTTP load and regression benchmark for the Flask API.
+
+Generates a synthetic hospital (patients, staff, a few records per patient
+and years of vital signs for some of them), then drives /api/login,
+/api/signup, the save_* routes, /api/patient_data and the vitals trend from
+--clients concurrent clients: first through the Flask test client, then
+over HTTP against a real threaded WSGI server.
+
+Reports requests per second and latency percentiles per route, the size of
+users_data.json and medical_data.db, and checks for data loss: every save
+and signup that answered success must be on disk afterwards, exactly once,
+and no two patients may share an ID.
+
+Each hospital size runs in a fresh interpreter with its own data directory,
+so the numbers show how the storage behaves as it grows:
+
+    python benchmarks/bench_http.py --patients 10,1000,100000 --clients 16 --seconds 10
+
+Camera, microphone, pyautogui, mediapipe and googletrans are never used;
+modules that aren't installed are replaced by the fakes in stubs.py.
+Passwords are hashed with a cheap --hash-method so the numbers measure the
+routes and storage rather than PBKDF2 (bench_login.py covers that).
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+STAFF_PASSWORD = 'pw'
+# (route label, weight) of the request mix each client draws from
+MIX = [
+    ('patient_data', 30),
+    ('vitals_trend', 15),
+    ('save_prescription', 15),
+    ('save_vitals', 15),
+    ('save_nurse_note', 10),
+    ('signup', 10),
+    ('login', 5)
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))] if values else 0.0
+
+
+def make_hospital(patients, staff, years, vitals_patients, readings_per_day, records_per_patient,
+                  hash_method, seed):
+    """Write users_data.json and medical_data.db into the current directory"""
+    from werkzeug.security import generate_password_hash
+    from storage import MedicalStore
+    from users import format_patient_id
+
+    rng = random.Random(seed)
+    # One hash for everyone: generating 100k salted hashes would dominate the setup
+    password = generate_password_hash(STAFF_PASSWORD, hash_method)
+    users = {'patients': {}, 'doctors': {}, 'nurses': {}}
+    for i in range(patients):
+        users['patients'][f"patient{i}"] = {
+            'password': password, 'name': f"Patient {i}", 'patient_id': format_patient_id(i + 1),
+            'language': 'en'
+        }
+    for i in range(staff):
+        users['doctors'][f"doctor{i}"] = {
+            'password': password, 'name': f"Dr. {i}", 'specialization': 'General', 'language': 'en'
+        }
+        users['nurses'][f"nurse{i}"] = {
+            'password': password, 'name': f"Nurse {i}", 'department': 'General', 'language': 'en'
+        }
+    with open('users_data.json', 'w') as f:
+        json.dump(users, f, indent=2)
+
+    store = MedicalStore('medical_data.db')
+    now = int(time.time())
+    start = now - int(years * 365 * 86400)
+    step = 86400 // max(1, readings_per_day)
+    chunk = {}
+    for i in range(patients):
+        patient_id = format_patient_id(i + 1)
+        patient = {'prescriptions': [], 'doctor_notes': [], 'vital_signs': []}
+        for j in range(records_per_patient):
+            date = time.strftime('%Y-%m-%d %H:%M', time.gmtime(rng.randint(start, now)))
+            patient['prescriptions'].append({
+                'medication': f"med{j}", 'dosage': '1', 'prescribed_by': 'Dr. 0', 'date': date
+            })
+        if i < vitals_patients:
+            for ts in range(start, now, step):
+                patient['vital_signs'].append({
+                    'blood_pressure': f"{rng.randint(100, 140)}/{rng.randint(60, 90)}",
+                    'heart_rate': str(rng.randint(55, 110)),
+                    'temperature': f"{rng.uniform(36.0, 38.5):.1f}",
+                    'notes': '', 'nurse': 'Nurse 0',
+                    'date': time.strftime('%Y-%m-%d %H:%M', time.gmtime(ts))
+                })
+        chunk[patient_id] = patient
+        if len(chunk) >= 1000:
+            store.import_data(chunk)
+            chunk = {}
+    store.import_data(chunk)
+    store.close()
+    return users
+
+
+class TestClientTransport:
+    name = 'test client'
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, body=None):
+        response = self.client.open(path, method=method, data=form, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpTransport:
+    """urllib with its own cookie jar, i.e. one browser"""
+    name = 'WSGI server'
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, method, path, form=None, body=None):
+        headers = {}
+        data = None
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        try:
+            return status, json.loads(payload)
+        except ValueError:
+            return status, None
+
+
+class Client(threading.Thread):
+    def __init__(self, index, transport, users, deadline, seed):
+        super().__init__(daemon=True)
+        self.index = index
+        self.transport = transport
+        self.users = users
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.latencies = {label: [] for label, _ in MIX}
+        self.failures = {}
+        self.saved = []
+        self.signups = []
+        self.errors = []
+        staff = len(users['doctors'])
+        self.doctor = f"doctor{index % staff}"
+        self.nurse = f"nurse{index % staff}"
+        self.patient_ids = [user['patient_id'] for user in users['patients'].values()]
+
+    def call(self, label, method, path, form=None, body=None):
+        started = time.perf_counter()
+        status, payload = self.transport.request(method, path, form=form, body=body)
+        elapsed = time.perf_counter() - started
+        ok = status == 200 and isinstance(payload, dict) and payload.get('success', True)
+        if ok:
+            self.latencies[label].append(elapsed)
+        else:
+            self.failures[label] = self.failures.get(label, 0) + 1
+        return ok, payload
+
+    def login(self, username):
+        return self.call('login', 'POST', '/api/login', form={
+            'username': username, 'password': STAFF_PASSWORD, 'language': 'en'
+        })[0]
+
+    def run(self):
+        labels = [label for label, _ in MIX]
+        weights = [weight for _, weight in MIX]
+        role = None
+        serial = 0
+        try:
+            while time.perf_counter() < self.deadline:
+                label = self.rng.choices(labels, weights)[0]
+                patient_id = self.rng.choice(self.patient_ids)
+                marker = f"c{self.index}-{serial}-{self.transport.name[0]}"
+                serial += 1
+                needs = 'nurses' if label in ('save_vitals', 'save_nurse_note') else 'doctors'
+                if label in ('login', 'signup'):
+                    needs = None
+                if needs and role != needs:
+                    if not self.login(self.doctor if needs == 'doctors' else self.nurse):
+                        self.errors.append(f"client {self.index}: staff login failed")
+                        return
+                    role = needs
+
+                if label == 'login':
+                    role = 'doctors' if self.login(self.doctor) else None
+                elif label == 'signup':
+                    username = f"new-{marker}"
+                    ok, _ = self.call('signup', 'POST', '/api/signup', body={
+                        'username': username, 'password': STAFF_PASSWORD, 'name': username,
+                        'user_type': 'patients'
+                    })
+                    if ok:
+                        self.signups.append(username)
+                elif label == 'patient_data':
+                    self.call(label, 'GET', f"/api/patient_data?patient_id={patient_id}&limit=50")
+                elif label == 'vitals_trend':
+                    self.call(label, 'GET', f"/api/vitals/{self.patient_ids[0]}/trend")
+                elif label == 'save_prescription':
+                    ok, _ = self.call(label, 'POST', '/api/save_prescription', body={
+                        'patient_id': patient_id, 'medication': marker, 'dosage': '1'
+                    })
+                    if ok:
+                        self.saved.append((patient_id, 'prescriptions', marker))
+                elif label == 'save_vitals':
+                    ok, _ = self.call(label, 'POST', '/api/save_vitals', body={
+                        'patient_id': patient_id, 'blood_pressure': '120/80', 'heart_rate': '70',
+                        'temperature': '36.8', 'notes': marker
+                    })
+                    if ok:
+                        self.saved.append((patient_id, 'vital_signs', marker))
+                elif label == 'save_nurse_note':
+                    ok, _ = self.call(label, 'POST', '/api/save_nurse_note', body={
+                        'patient_id': patient_id, 'note': marker
+                    })
+                    if ok:
+                        self.saved.append((patient_id, 'doctor_notes', marker))
+        except Exception as e:
+            self.errors.append(f"client {self.index}: {e!r}")
+
+
+def run_phase(make_transport, users, clients, seconds, seed):
+    deadline = time.perf_counter() + seconds
+    workers = [Client(i, make_transport(), users, deadline, seed * 1000 + i) for i in range(clients)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    routes = {}
+    for label, _ in MIX:
+        latencies = [value for worker in workers for value in worker.latencies[label]]
+        routes[label] = {
+            'ok': len(latencies),
+            'failed': sum(worker.failures.get(label, 0) for worker in workers),
+            'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000
+        }
+    return {
+        'seconds': elapsed,
+        'requests': sum(r['ok'] + r['failed'] for r in routes.values()),
+        'routes': routes,
+        'saved': [item for worker in workers for item in worker.saved],
+        'signups': [name for worker in workers for name in worker.signups],
+        'errors': [error for worker in workers for error in worker.errors]
+    }
+
+
+def check_data(app_module, saved, signups):
+    """Everything that answered success must be on disk exactly once"""
+    errors = []
+    app_module.user_data_writer.flush()
+    with open('users_data.json') as f:
+        users = json.load(f)
+    patients = users['patients']
+    missing = [name for name in signups if name not in patients]
+    if missing:
+        errors.append(f"{len(missing)} signups missing from users_data.json, e.g. {missing[:3]}")
+    patient_ids = [user.get('patient_id') for user in patients.values()]
+    if len(set(patient_ids)) != len(patient_ids):
+        errors.append(f"{len(patient_ids) - len(set(patient_ids))} duplicate patient IDs")
+
+    # A separate connection, so nothing is read from the app's caches
+    conn = sqlite3.connect('medical_data.db')
+    stored = {}
+    for patient_id, kind, data in conn.execute('SELECT patient_id, kind, data FROM records WHERE id > 0'):
+        record = json.loads(data)
+        marker = record.get('medication') or record.get('note') or record.get('notes')
+        if marker and marker.startswith('c'):
+            key = (patient_id, kind, marker)
+            stored[key] = stored.get(key, 0) + 1
+    conn.close()
+    lost = [item for item in saved if item not in stored]
+    duplicated = [key for key, count in stored.items() if count > 1]
+    if lost:
+        errors.append(f"{len(lost)} saved records missing, e.g. {lost[:3]}")
+    if duplicated:
+        errors.append(f"{len(duplicated)} records stored more than once")
+    return errors
+
+
+def file_sizes():
+    sizes = {}
+    for name in ['users_data.json', 'medical_data.db', 'medical_data.db-wal']:
+        sizes[name] = os.path.getsize(name) if os.path.exists(name) else 0
+    return sizes
+
+
+def child(args, patients):
+    import stubs
+    faked = stubs.install()
+    os.environ['PASSWORD_HASH_METHOD'] = args.hash_method
+    workdir = tempfile.mkdtemp(prefix=f"bench_http_{patients}_")
+    os.chdir(workdir)
+
+    started = time.perf_counter()
+    users = make_hospital(
+        patients, args.staff, args.years, min(patients, args.vitals_patients), args.readings_per_day,
+        args.records_per_patient, args.hash_method, args.seed
+    )
+    generated = time.perf_counter() - started
+    before = file_sizes()
+
+    import app as app_module
+    from werkzeug.serving import make_server
+
+    phases = {}
+    saved, signups, errors = [], [], []
+    if args.transport in ('test', 'both'):
+        phases['test client'] = run_phase(
+            lambda: TestClientTransport(app_module.app), users, args.clients, args.seconds, args.seed)
+    if args.transport in ('wsgi', 'both'):
+        server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            phases['WSGI server'] = run_phase(
+                lambda: HttpTransport(base_url), users, args.clients, args.seconds, args.seed + 1)
+        finally:
+            server.shutdown()
+    for phase in phases.values():
+        saved += phase.pop('saved')
+        signups += phase.pop('signups')
+        errors += phase.pop('errors')
+    errors += check_data(app_module, saved, signups)
+
+    print(json.dumps({
+        'patients': patients,
+        'workdir': workdir,
+        'faked': faked,
+        'generate_seconds': generated,
+        'sizes_before': before,
+        'sizes_after': file_sizes(),
+        'phases': phases,
+        'checked': {'records': len(saved), 'signups': len(signups)},
+        'errors': errors
+    }))
+
+
+def report(result):
+    mb = 1024 * 1024
+    before, after = result['sizes_before'], result['sizes_after']
+    print(f"\n🏥 {result['patients']} patients (generated in {result['generate_seconds']:.1f}s, data in {result['workdir']})")
+    print(f"💾 users_data.json {before['users_data.json'] / mb:.2f} → {after['users_data.json'] / mb:.2f} MB, "
+          f"medical_data.db {before['medical_data.db'] / mb:.2f} → "
+          f"{(after['medical_data.db'] + after['medical_data.db-wal']) / mb:.2f} MB")
+    for name, phase in result['phases'].items():
+        print(f"⚡ {name}: {phase['requests'] / phase['seconds']:.0f} req/s ({phase['requests']} requests)")
+        for label, route in phase['routes'].items():
+            print(f"   {label:18s} {route['ok']:6d} ok {route['failed']:4d} failed   "
+                  f"p50 {route['p50_ms']:7.1f} ms  p95 {route['p95_ms']:7.1f} ms  p99 {route['p99_ms']:7.1f} ms")
+    checked = result['checked']
+    if result['errors']:
+        print(f"❌ {len(result['errors'])} problems")
+        for error in result['errors'][:20]:
+            print(f"   {error}")
+    else:
+        print(f"✅ No data lost: {checked['records']} saved records and {checked['signups']} signups on disk")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--patients', default='10,1000,10000', help='comma-separated hospital sizes')
+    parser.add_argument('--staff', type=int, default=20, help='doctors and nurses each')
+    parser.add_argument('--years', type=float, default=2.0, help='years of vital signs')
+    parser.add_argument('--vitals-patients', type=int, default=20, help='patients with a vitals history')
+    parser.add_argument('--readings-per-day', type=int, default=4)
+    parser.add_argument('--records-per-patient', type=int, default=3)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10.0, help='per transport')
+    parser.add_argument('--transport', choices=['test', 'wsgi', 'both'], default='both')
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:1000')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        child(args, args.child)
+        return
+
+    failed = False
+    for patients in [int(size) for size in args.patients.split(',')]:
+        command = [sys.executable, os.path.abspath(__file__), '--child', str(patients)] + sys.argv[1:]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        report(result)
+        failed = failed or bool(result['errors'])
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
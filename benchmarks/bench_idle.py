@@ -0,0 +1,195 @@
+"""CPU cost of head tracking with and without the adaptive frame rate.
+
+Runs the live pipeline (capture thread, latest-frame buffer, HeadTracker) in
+real time against a scripted face that moves, then holds still while
+blinking, then leaves the camera, then comes back. FaceMesh is replaced by a
+stand-in that burns --inference-ms of CPU per frame, like the real model on
+a bedside machine. The same script runs once at a fixed frame rate and once
+with AdaptiveFrameRate, and the benchmark reports CPU use and achieved fps per
+phase. It also reports blink recall while the head was still, and how long
+the tracker took to see the face again after it came back.
+
+    python benchmarks/bench_idle.py --inference-ms 15 --fps 30
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from cursor import CursorOutput, RecordingBackend
+from tracking import (
+    EYE_LANDMARKS, AdaptiveFrameRate, CaptureThread, FaceMeshStage, HeadTracker, LatestFrameBuffer,
+    SyntheticSource, TrackingMetrics
+)
+
+LANDMARK_COUNT = 478
+# (phase, seconds) of the script; blinks happen during 'still'
+PHASES = [('moving', 4.0), ('still', 10.0), ('away', 6.0), ('back', 4.0)]
+BLINK_EVERY = 2.5
+BLINK_LENGTH = 0.25
+
+
+class ScriptedFace:
+    """FaceMesh stand-in driven by the wall clock instead of the image"""
+
+    def __init__(self, phases, inference_ms, frame_w, frame_h, seed=3):
+        self.inference = inference_ms / 1000
+        self.frame_w = frame_w
+        self.frame_h = frame_h
+        self.boundaries = []
+        offset = 0.0
+        for name, seconds in phases:
+            self.boundaries.append((offset, offset + seconds, name))
+            offset += seconds
+        self.blinks = []
+        self.back_seen = None
+        self.started = None
+        self._rng = np.random.default_rng(seed)
+
+    def phase(self, t):
+        for start, end, name in self.boundaries:
+            if start <= t < end:
+                return start, name
+        return self.boundaries[-1][0], self.boundaries[-1][2]
+
+    def start(self):
+        self.started = time.perf_counter()
+        start, end = next((s, e) for s, e, name in self.boundaries if name == 'still')
+        self.blinks = list(np.arange(start + 1.0, end - 0.5, BLINK_EVERY))
+
+    def process(self, image):
+        busy_until = time.perf_counter() + self.inference
+        while time.perf_counter() < busy_until:
+            pass
+        t = time.perf_counter() - self.started
+        start, name = self.phase(t)
+        if name == 'away':
+            return SimpleNamespace(multi_face_landmarks=None)
+        if name == 'back' and self.back_seen is None:
+            self.back_seen = t - start
+
+        still = name == 'still'
+        cx = 0.5 if still else 0.5 + 0.1 * np.sin(t * 2)
+        cy = 0.5 if still else 0.5 + 0.05 * np.cos(t * 1.5)
+        closed = still and any(b <= t < b + BLINK_LENGTH for b in self.blinks)
+        points = np.column_stack([
+            cx + self._rng.normal(0, 0.08, LANDMARK_COUNT),
+            cy + self._rng.normal(0, 0.1, LANDMARK_COUNT)
+        ])
+        eye_w = 0.06
+        gap = (0.06 if closed else 0.3) * eye_w * self.frame_w / self.frame_h
+        for eye, offset in zip(EYE_LANDMARKS, (-0.07, 0.07)):
+            ex = cx + offset
+            outer, upper1, upper2, inner, lower1, lower2 = eye
+            points[outer] = (ex - eye_w / 2, cy)
+            points[inner] = (ex + eye_w / 2, cy)
+            points[upper1] = (ex - eye_w / 6, cy - gap / 2)
+            points[upper2] = (ex + eye_w / 6, cy - gap / 2)
+            points[lower2] = (ex - eye_w / 6, cy + gap / 2)
+            points[lower1] = (ex + eye_w / 6, cy + gap / 2)
+        points[474:478] = (cx + 0.07, cy)
+        points[474:478] += self._rng.normal(0, 0.0005, (4, 2))
+        face = SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=0.0) for x, y in points.tolist()])
+        return SimpleNamespace(multi_face_landmarks=[face])
+
+
+def run(args, adaptive):
+    width, height = 640, 480
+    frame = np.full((height, width, 3), 96, dtype=np.uint8)
+    source = SyntheticSource(width, height, fps=args.fps, make_frame=lambda index: frame)
+    face = ScriptedFace(PHASES, args.inference_ms, width, height)
+    metrics = TrackingMetrics()
+    frame_rate = AdaptiveFrameRate(
+        active_fps=args.fps, idle_fps=args.idle_fps, no_face_fps=args.no_face_fps,
+        idle_after=args.idle_after, adaptive=adaptive, metrics=metrics
+    )
+    backend = RecordingBackend()
+    tracker = HeadTracker(
+        FaceMeshStage(face, roi_tracking=False, metrics=metrics),
+        CursorOutput(backend, metrics=metrics),
+        metrics=metrics,
+        frame_rate=frame_rate
+    )
+    frames = LatestFrameBuffer(metrics)
+    capture = CaptureThread(source, frames, metrics, frame_rate=frame_rate)
+
+    # Sample CPU time and processed frames at every phase boundary
+    samples = []
+    stop = threading.Event()
+
+    def sample_phases():
+        for start, end, name in face.boundaries:
+            stop.wait(max(0.0, face.started + end - time.perf_counter()))
+            samples.append((name, end - start, time.process_time(), metrics.frames_processed))
+
+    face.start()
+    samples.append(('start', 0.0, time.process_time(), 0))
+    sampler = threading.Thread(target=sample_phases, daemon=True)
+    sampler.start()
+    capture.start()
+    total = sum(seconds for _, seconds in PHASES)
+    while time.perf_counter() - face.started < total:
+        item = frames.get(timeout=0.2)
+        if item is not None:
+            tracker.process(*item)
+    capture.stop()
+    capture.join(timeout=1.0)
+    sampler.join()
+
+    phases = []
+    for previous, current in zip(samples, samples[1:]):
+        name, seconds, cpu, processed = current
+        phases.append({
+            'phase': name,
+            'cpu_percent': (cpu - previous[2]) / seconds * 100,
+            'fps': (processed - previous[3]) / seconds
+        })
+    clicks = [event[3] - face.started for event in backend.clicks]
+    caught = sum(1 for b in face.blinks if any(b <= c <= b + 0.8 for c in clicks))
+    return {
+        'phases': phases,
+        'cpu_seconds': samples[-1][2] - samples[0][2],
+        'blinks': (caught, len(face.blinks)),
+        'reacquire_ms': face.back_seen * 1000 if face.back_seen is not None else None,
+        'frame_rate': frame_rate.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--fps', type=float, default=30, help='camera and full tracking rate')
+    parser.add_argument('--idle-fps', type=float, default=10)
+    parser.add_argument('--no-face-fps', type=float, default=2)
+    parser.add_argument('--idle-after', type=float, default=3.0)
+    parser.add_argument('--inference-ms', type=float, default=15, help='CPU per FaceMesh call')
+    args = parser.parse_args()
+    random.seed(0)
+
+    results = {}
+    for adaptive in (False, True):
+        label = 'adaptive' if adaptive else 'fixed'
+        results[label] = result = run(args, adaptive)
+        print(f"{'🔋' if adaptive else '🔌'} {label}: {result['cpu_seconds']:.1f} CPU s over "
+              f"{sum(seconds for _, seconds in PHASES):.0f} s")
+        for phase in result['phases']:
+            print(f"   {phase['phase']:8s} {phase['cpu_percent']:5.1f}% CPU  {phase['fps']:5.1f} fps")
+        caught, total = result['blinks']
+        print(f"   👁️ blinks while still: {caught}/{total} clicked, "
+              f"face seen again {result['reacquire_ms']:.0f} ms after returning, "
+              f"{result['frame_rate']['mode_changes']} mode changes")
+    saved = 1 - results['adaptive']['cpu_seconds'] / results['fixed']['cpu_seconds']
+    print(f"📉 Adaptive frame rate used {saved * 100:.0f}% less CPU")
+    caught, total = results['adaptive']['blinks']
+    if caught < total:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
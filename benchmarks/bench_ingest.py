@@ -0,0 +1,303 @@
+"""Bulk NDJSON import and streaming export of medical records.
+
+Writes --records synthetic records (vital signs, prescriptions and notes for
+--patients patients, dated over the past year) to an NDJSON file, then times
+getting them into a fresh medical_data.db in four ways:
+
+- the old medical_data.json way, one whole-file rewrite per record, estimated
+  from the time to write the file at a sample of sizes (it grows quadratically)
+- MedicalStore.append_record once per record, timed on --baseline records
+- MedicalStore.ingest of the whole file in one transaction, as
+  `python storage.py import` does
+- POST /api/records/import in batches of --batch records through the Flask
+  test client, each batch split between a doctor and a nurse
+
+Finally it streams everything back out of GET /api/records/export and checks
+that every record came back exactly once. Each step runs in a fresh
+interpreter, so the peak memory reported for it is its own:
+
+    python benchmarks/bench_ingest.py --records 1000000 --patients 1000 --batch 200000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+# (record type, weight) of the generated records
+MIX = [('vital_signs', 70), ('doctor_notes', 20), ('prescriptions', 10)]
+
+
+def make_records(path, records, patients, seed):
+    """Write the NDJSON file one line at a time; returns the count per record type"""
+    from users import format_patient_id
+
+    rng = random.Random(seed)
+    kinds = [kind for kind, weight in MIX for _ in range(weight)]
+    counts = {kind: 0 for kind, _ in MIX}
+    start = time.time() - 365 * 24 * 3600
+    with open(path, 'w') as f:
+        for i in range(records):
+            kind = rng.choice(kinds)
+            date = time.strftime('%Y-%m-%d %H:%M', time.localtime(start + i * 365 * 24 * 3600 / records))
+            if kind == 'vital_signs':
+                record = {
+                    'blood_pressure': f"{rng.randint(100, 150)}/{rng.randint(60, 95)}",
+                    'heart_rate': str(rng.randint(55, 110)),
+                    'temperature': f"{rng.uniform(36.0, 39.0):.1f}",
+                    'notes': '',
+                    'nurse': 'Monitor',
+                    'date': date
+                }
+            elif kind == 'doctor_notes':
+                record = {'type': 'nurse_observation', 'note': f"Observation {i}", 'nurse': 'Import',
+                          'date': date}
+            else:
+                record = {'medication': f"Drug {rng.randint(1, 300)}", 'dosage': '10mg',
+                          'prescribed_by': 'Dr. Import', 'date': date}
+            patient_id = format_patient_id(rng.randint(1, patients))
+            f.write(json.dumps({'patient_id': patient_id, 'type': kind, 'record': record}) + '\n')
+            counts[kind] += 1
+    return counts
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def step_legacy(path, sizes):
+    """Seconds to rewrite medical_data.json once at each size"""
+    data = {}
+    results = {}
+    with open(path, 'rb') as f:
+        for count, line in enumerate(f, 1):
+            entry = json.loads(line)
+            patient = data.setdefault(entry['patient_id'], {'prescriptions': [], 'doctor_notes': [],
+                                                             'vital_signs': []})
+            patient[entry['type']].append(entry['record'])
+            if count in sizes:
+                started = time.perf_counter()
+                with open('medical_data.json', 'w') as out:
+                    json.dump(data, out, indent=2)
+                results[count] = time.perf_counter() - started
+            if count >= max(sizes):
+                break
+    return {'write_seconds': results}
+
+
+def step_append(path, records):
+    from storage import MedicalStore, parse_ndjson
+
+    store = MedicalStore('medical_data.db')
+    entries = []
+    with open(path, 'rb') as f:
+        for entry in parse_ndjson(f):
+            entries.append(entry)
+            if len(entries) >= records:
+                break
+    for _, patient_id, _, _ in entries:
+        store.add_patient(patient_id)
+    started = time.perf_counter()
+    for _, patient_id, kind, record in entries:
+        store.append_record(patient_id, kind, record)
+    return {'records': len(entries), 'seconds': time.perf_counter() - started}
+
+
+def step_ingest(path):
+    from storage import MedicalStore, parse_ndjson
+
+    store = MedicalStore('medical_data.db')
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        counts = store.ingest(parse_ndjson(f), create_patients=True)
+    return {'records': sum(counts.values()), 'seconds': time.perf_counter() - started,
+            'peak_rss_growth_mb': peak_rss_mb() - rss_before}
+
+
+def open_app(username='drsmith'):
+    """Import app.py over the database in the current directory and log a user in"""
+    import stubs
+    stubs.install()
+    import app as app_module
+
+    client = app_module.app.test_client()
+    client.post('/api/login', data={'username': username, 'password': '123', 'language': 'en'})
+    return app_module, client
+
+
+def step_http_import(path, batch):
+    app_module, doctor = open_app('drsmith')
+    _, nurse = open_app('nurse1')
+    clients = {'doctors': doctor, 'nurses': nurse}
+    app_module.IMPORT_MAX_RECORDS = batch
+    rss_before = peak_rss_mb()
+    imported = 0
+    batches = 0
+    seconds = 0.0
+    with open(path, 'rb') as f:
+        while True:
+            # Doctors import prescriptions and diagnoses, nurses the rest. Each batch is
+            # posted from a file so the client doesn't hold it in memory either
+            outs = {role: open(f'batch_{role}.ndjson', 'wb') for role in clients}
+            count = 0
+            for _, line in zip(range(batch), f):
+                entry = json.loads(line)
+                role, _ = app_module.record_author_role(entry['type'], entry['record'])
+                outs[role].write(line)
+                count += 1
+            for out in outs.values():
+                out.close()
+            if not count:
+                break
+            for role, client in clients.items():
+                size = os.path.getsize(f'batch_{role}.ndjson')
+                if not size:
+                    continue
+                with open(f'batch_{role}.ndjson', 'rb') as body:
+                    started = time.perf_counter()
+                    result = client.post('/api/records/import?create_patients=1', input_stream=body,
+                                         content_length=size, content_type='application/x-ndjson').get_json()
+                    seconds += time.perf_counter() - started
+                if not result['success']:
+                    raise RuntimeError(result['message'])
+                imported += result['imported']
+                batches += 1
+    return {'records': imported, 'batches': batches, 'seconds': seconds,
+            'peak_rss_growth_mb': peak_rss_mb() - rss_before}
+
+
+def step_export(path):
+    _, client = open_app()
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    response = client.get('/api/records/export', buffered=False)
+    exported = 0
+    size = 0
+    mismatched = 0
+    buffer = b''
+    first_byte = None
+    checking = 0.0
+    # The import file is the reference: every record once, in the same order
+    reference = open(path, 'rb')
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        chunk = chunk if isinstance(chunk, bytes) else chunk.encode()
+        size += len(chunk)
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        check_started = time.perf_counter()
+        for line in lines:
+            entry = json.loads(line)
+            expected = json.loads(reference.readline() or 'null')
+            if expected is None or any(entry[key] != expected[key] for key in ('patient_id', 'type', 'record')):
+                mismatched += 1
+            exported += 1
+        checking += time.perf_counter() - check_started
+    # Reading the lines back in is the client's cost, not the export's
+    seconds = time.perf_counter() - started - checking
+    response.close()
+    missing = sum(1 for _ in reference)
+    reference.close()
+    return {'records': exported, 'bytes': size, 'seconds': seconds, 'first_byte_ms': first_byte * 1000,
+            'mismatched': mismatched, 'missing': missing,
+            'peak_rss_growth_mb': peak_rss_mb() - rss_before}
+
+
+def child(args):
+    os.chdir(args.workdir)
+    if args.child == 'legacy':
+        result = step_legacy(args.file, {int(size) for size in args.sizes.split(',')})
+    elif args.child == 'append':
+        result = step_append(args.file, args.baseline)
+    elif args.child == 'ingest':
+        result = step_ingest(args.file)
+    elif args.child == 'http_import':
+        result = step_http_import(args.file, args.batch)
+    else:
+        result = step_export(args.file)
+    result['db_mb'] = os.path.getsize('medical_data.db') / 1e6 if os.path.exists('medical_data.db') else 0
+    print(json.dumps(result))
+
+
+def run(step, workdir, args, *extra):
+    os.makedirs(workdir, exist_ok=True)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', step, '--workdir', workdir,
+         '--file', args.file, '--baseline', str(args.baseline), '--batch', str(args.batch)] + list(extra),
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--patients', type=int, default=1000)
+    parser.add_argument('--baseline', type=int, default=2000, help='records saved one at a time')
+    parser.add_argument('--batch', type=int, default=200000, help='records per import request')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--child')
+    parser.add_argument('--workdir')
+    parser.add_argument('--file')
+    parser.add_argument('--sizes')
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    base = tempfile.mkdtemp(prefix='bench_ingest_')
+    args.file = os.path.join(base, 'records.ndjson')
+    started = time.perf_counter()
+    counts = make_records(args.file, args.records, args.patients, args.seed)
+    print(f"🏥 {args.records} records for {args.patients} patients "
+          f"({', '.join(f'{count} {kind}' for kind, count in counts.items())}), "
+          f"{os.path.getsize(args.file) / 1e6:.0f} MB of NDJSON in {time.perf_counter() - started:.1f}s")
+
+    sizes = sorted({max(1, args.records * i // 4) for i in (1, 2)} | {min(args.records, 1000)})
+    legacy = run('legacy', os.path.join(base, 'legacy'), args, '--sizes', ','.join(map(str, sizes)))
+    writes = {int(size): seconds for size, seconds in legacy['write_seconds'].items()}
+    # Write time grows linearly with the file, so the total for one rewrite per record is quadratic
+    (small, t_small), (large, t_large) = min(writes.items()), max(writes.items())
+    per_record = (t_large - t_small) / max(1, large - small)
+    total = per_record * args.records ** 2 / 2 + t_small * args.records
+    print(f"📄 medical_data.json rewrite per record: {t_large * 1000:.0f} ms at {large} records, "
+          f"~{total / 3600:.1f} h estimated for all {args.records}")
+
+    append = run('append', os.path.join(base, 'append'), args)
+    rate = append['records'] / append['seconds']
+    print(f"🐢 append_record one at a time: {rate:,.0f} records/s over {append['records']} records, "
+          f"~{args.records / rate / 60:.1f} min estimated for all")
+
+    ingest = run('ingest', os.path.join(base, 'ingest'), args)
+    print(f"🚀 MedicalStore.ingest in one transaction: {ingest['records'] / ingest['seconds']:,.0f} records/s "
+          f"({ingest['seconds']:.1f}s, +{ingest['peak_rss_growth_mb']:.0f} MB peak RSS, "
+          f"{ingest['db_mb']:.0f} MB database)")
+
+    http = run('http_import', os.path.join(base, 'http'), args)
+    print(f"🌐 POST /api/records/import: {http['records'] / http['seconds']:,.0f} records/s "
+          f"in {http['batches']} batches of up to {args.batch} "
+          f"({http['seconds']:.1f}s, +{http['peak_rss_growth_mb']:.0f} MB peak RSS)")
+
+    export = run('export', os.path.join(base, 'ingest'), args)
+    print(f"📤 GET /api/records/export: {export['records'] / export['seconds']:,.0f} records/s, "
+          f"{export['bytes'] / 1e6:.0f} MB, first byte after {export['first_byte_ms']:.0f} ms, "
+          f"+{export['peak_rss_growth_mb']:.0f} MB peak RSS")
+    print(f"🔍 {export['records']} records exported, {export['missing']} missing, "
+          f"{export['mismatched']} differ from the import file")
+    if export['missing'] or export['mismatched'] or http['records'] != args.records:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Login throughput at a given password-hashing cost.
+
+First measures one verification at a few PBKDF2 costs, to help pick
+PASSWORD_HASH_METHOD for the hardware. Then it drives /api/login from
+--clients threads for --seconds against a throwaway user database hashed
+with --method, and reports sustained logins per second, latency
+percentiles and how many requests the bounded hashing pool turned away.
+
+    python benchmarks/bench_login.py --method pbkdf2:sha256:260000 --clients 16 --workers 2
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from werkzeug.security import generate_password_hash
+
+import stubs
+from auth import PasswordHasher
+
+COSTS = ['pbkdf2:sha256:50000', 'pbkdf2:sha256:260000', 'pbkdf2:sha256:600000']
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--method', default='pbkdf2:sha256:260000')
+    parser.add_argument('--workers', type=int, default=2, help='password hashing threads')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--accounts', type=int, default=200)
+    args = parser.parse_args()
+
+    for method in COSTS:
+        hasher = PasswordHasher(method, workers=1)
+        stored = generate_password_hash('secret', method)
+        started = time.perf_counter()
+        for _ in range(5):
+            hasher.verify(stored, 'secret')
+        print(f"🔐 {method}: {(time.perf_counter() - started) / 5 * 1000:.1f} ms per verification")
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_login_'))
+    users = {'patients': {}, 'doctors': {}, 'nurses': {}}
+    for i in range(args.accounts):
+        users['nurses'][f"nurse{i}"] = {
+            'password': generate_password_hash('secret', args.method), 'name': f"Nurse {i}",
+            'department': 'ICU', 'language': 'en'
+        }
+    with open('users_data.json', 'w') as f:
+        json.dump(users, f)
+
+    os.environ['PASSWORD_HASH_METHOD'] = args.method
+    os.environ['PASSWORD_WORKERS'] = str(args.workers)
+    stubs.install()
+    import app as app_module
+
+    latencies = []
+    outcomes = {'ok': 0, 'busy': 0, 'failed': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def client(worker):
+        http = app_module.app.test_client()
+        i = worker
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = http.post('/api/login', data={
+                'username': f"nurse{i % args.accounts}", 'password': 'secret', 'language': 'en'
+            })
+            elapsed = time.perf_counter() - started
+            outcome = 'busy' if response.status_code == 503 else (
+                'ok' if response.get_json()['success'] else 'failed')
+            with lock:
+                outcomes[outcome] += 1
+                if outcome == 'ok':
+                    latencies.append(elapsed)
+            i += args.clients
+
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"👥 {args.clients} clients, {args.workers} hashing threads, {args.method}")
+    print(f"⚡ {outcomes['ok'] / elapsed:.1f} logins/s sustained "
+          f"(p50 {percentile(latencies, 0.5) * 1000:.0f} ms, p95 {percentile(latencies, 0.95) * 1000:.0f} ms)")
+    print(f"🚦 {outcomes['busy']} turned away busy, {outcomes['failed']} failed")
+    print(f"📋 {app_module.password_hasher.stats()}")
+    print(f"💾 User file writes: {app_module.user_data_writer.stats()['writes']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Cost of the metrics instrumentation per request.
+
+Runs the same request mix through the Flask test client with METRICS=0 and
+METRICS=1, each in a fresh interpreter, and reports the time per request and
+the overhead. Also times one /metrics scrape and a bare histogram observe().
+
+    python benchmarks/bench_metrics.py --requests 5000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def child(requests):
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    import stubs
+    stubs.install()
+    os.chdir(tempfile.mkdtemp(prefix='bench_metrics_'))
+    import app as app_module
+
+    http = app_module.app.test_client()
+    http.post('/api/login', data={'username': 'drsmith', 'password': '123', 'language': 'en'})
+    paths = ['/current_language', '/api/patient_data?patient_id=P001&limit=20', '/debug_sessions']
+    for path in paths:
+        http.get(path)
+
+    started = time.perf_counter()
+    for i in range(requests):
+        http.get(paths[i % len(paths)])
+    per_request = (time.perf_counter() - started) / requests
+
+    scrape = observe = None
+    if app_module.METRICS_ENABLED:
+        started = time.perf_counter()
+        body = http.get('/metrics').data
+        scrape = (time.perf_counter() - started, len(body))
+        histogram = app_module.storage_seconds
+        started = time.perf_counter()
+        for _ in range(100000):
+            histogram.observe(0.003, 'bench')
+        observe = (time.perf_counter() - started) / 100000
+    print(json.dumps({'per_request': per_request, 'scrape': scrape, 'observe': observe}))
+
+
+def run(enabled, requests):
+    env = dict(os.environ, METRICS='1' if enabled else '0')
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', '--requests', str(requests)],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--child', action='store_true')
+    args = parser.parse_args()
+    if args.child:
+        child(args.requests)
+        return
+
+    results = {}
+    for enabled in (False, True):
+        runs = [run(enabled, args.requests) for _ in range(args.runs)]
+        results[enabled] = min(runs, key=lambda r: r['per_request'])
+        print(f"{'📈' if enabled else '🔕'} METRICS={int(enabled)}: "
+              f"{results[enabled]['per_request'] * 1e6:.0f} µs per request")
+    off, on = results[False]['per_request'], results[True]['per_request']
+    print(f"⚖️ Overhead: {(on - off) * 1e6:+.1f} µs per request ({(on / off - 1) * 100:+.1f}%)")
+    seconds, size = results[True]['scrape']
+    print(f"📜 /metrics scrape: {seconds * 1000:.1f} ms, {size / 1024:.1f} KB")
+    print(f"⏱️ Histogram observe: {results[True]['observe'] * 1e9:.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
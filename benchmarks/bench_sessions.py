@@ -0,0 +1,288 @@
+"""Concurrent-session load test for the Flask app.
+
+Logs in N patients, doctors and nurses at once, each from its own client
+(its own cookie jar), and has every one of them change language, load their
+dashboard and save records in a loop. Afterwards it checks for cross-talk:
+every response, every stored record and every session context must belong
+to the user who made the request. Half the patients then log out, and the
+test checks that only their hands-free systems stopped.
+
+Every patient's hands-free system runs the real head-tracking loop on a
+synthetic camera of its own, with a checking FaceMesh stand-in: each session
+must get its own FaceMesh (only ever called from one thread) and its own
+tracking counters, and a camera already tracking a patient must refuse a
+second one, while a patient who logs straight back in gets their camera
+back. Graphs of patients who log out must be pooled or closed, and never
+used after close(). Voice control is replaced by a flag.
+
+Runs against a throwaway data directory. Camera, microphone and pyautogui
+are never touched.
+
+    python benchmarks/bench_sessions.py --sessions 60 --rounds 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import stubs
+from cursor import RecordingBackend
+from tracking import SyntheticSource
+
+LANGUAGES = ['en', 'es', 'ar', 'fr', 'de', 'it', 'pt', 'ru', 'zh', 'ja']
+USER_TYPES = ['patients', 'doctors', 'nurses']
+# What every synthetic bedside camera shows
+FRAME = np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+def make_users(count):
+    users = {user_type: {} for user_type in USER_TYPES}
+    for i in range(count):
+        user_type = USER_TYPES[i % len(USER_TYPES)]
+        username = f"{user_type[:-1]}{i}"
+        user = {'password': 'pw', 'name': f"User {i}", 'language': 'en'}
+        if user_type == 'patients':
+            user['patient_id'] = f"P{i:03d}"
+        elif user_type == 'doctors':
+            user['specialization'] = 'General'
+        else:
+            user['department'] = 'General'
+        users[user_type][username] = user
+    return users
+
+
+class CheckedFaceMesh:
+    """FaceMesh stand-in that remembers every thread that called it, and use after close()"""
+    instances = []
+
+    def __init__(self):
+        self.threads = set()
+        self.calls = 0
+        self.closed = False
+        self.used_after_close = False
+        CheckedFaceMesh.instances.append(self)
+
+    def process(self, rgb):
+        self.threads.add(threading.get_ident())
+        self.calls += 1
+        self.used_after_close |= self.closed
+        return SimpleNamespace(multi_face_landmarks=None)
+
+    def close(self):
+        self.closed = True
+
+
+def hands_free_with_tracking(app_module):
+    """Stand-in for start_hands_free_system: real head tracking, voice control as a flag"""
+
+    def run(context):
+        context.head_tracking_active = True
+        context.voice_control_active = True
+        source = SyntheticSource(64, 48, fps=30, make_frame=lambda index: FRAME)
+        app_module.head_tracking_loop(context, source=source, backend=RecordingBackend())
+        context.voice_control_active = False
+
+    return run
+
+
+
+class Session(threading.Thread):
+    def __init__(self, app_module, user_type, username, user, rounds, seed):
+        super().__init__(daemon=True)
+        self.app_module = app_module
+        self.client = app_module.app.test_client()
+        self.user_type = user_type
+        self.username = username
+        self.user = user
+        self.rounds = rounds
+        self.rng = random.Random(seed)
+        self.language = None
+        self.requests = 0
+        self.errors = []
+
+    def check(self, condition, message):
+        if not condition:
+            self.errors.append(f"{self.username}: {message}")
+
+    def run(self):
+        try:
+            self.language = self.rng.choice(LANGUAGES)
+            response = self.client.post('/api/login', data={
+                'username': self.username, 'password': 'pw', 'language': self.language
+            })
+            self.requests += 1
+            self.check(response.get_json()['success'], 'login failed')
+            for _ in range(self.rounds):
+                self.language = self.rng.choice(LANGUAGES)
+                self.client.get(f'/change_language/{self.language}')
+                current = self.client.get('/current_language').get_json()
+                self.check(current['language'] == self.language,
+                           f"language {current['language']} != {self.language}")
+                page = self.client.get('/dashboard').get_data(as_text=True)
+                self.check(f"{self.user['name']}" in page, 'dashboard shows someone else')
+                self.requests += 3
+                if self.user_type == 'doctors':
+                    self.client.post('/api/save_prescription', json={
+                        'patient_id': 'P001', 'medication': self.username, 'dosage': '1'
+                    })
+                    self.requests += 1
+                elif self.user_type == 'nurses':
+                    self.client.post('/api/save_nurse_note', json={
+                        'patient_id': 'P001', 'note': self.username
+                    })
+                    self.requests += 1
+        except Exception as e:
+            self.errors.append(f"{self.username}: {e!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sessions', type=int, default=60)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_sessions_')
+    os.chdir(workdir)
+    users = make_users(args.sessions)
+    with open('users_data.json', 'w') as f:
+        json.dump(users, f)
+
+    faked = stubs.install()
+    import app as app_module
+    # The dashboards live in templates/ in a deployment but next to app.py in this checkout
+    if not os.path.isdir(os.path.join(ROOT, 'templates')):
+        app_module.app.template_folder = ROOT
+    app_module.start_hands_free_system = hands_free_with_tracking(app_module)
+    app_module.create_face_mesh = CheckedFaceMesh
+    app_module.TRACKING_ADAPTIVE = False
+    app_module.TRACKING_CAMERAS.update(
+        (user['patient_id'], f"synthetic:{user['patient_id']}") for user in users['patients'].values()
+    )
+    print(f"🧪 Data in {workdir}, faked modules: {', '.join(faked) or 'none'}")
+
+    accounts = [(t, username, user) for t in USER_TYPES for username, user in users[t].items()]
+    sessions = [
+        Session(app_module, user_type, username, user, args.rounds, seed=i)
+        for i, (user_type, username, user) in enumerate(accounts)
+    ]
+    started = time.perf_counter()
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - started
+
+    errors = [error for session in sessions for error in session.errors]
+    registry = app_module.session_registry
+    for session in sessions:
+        contexts = registry.find(session.username)
+        if len(contexts) != 1:
+            errors.append(f"{session.username}: {len(contexts)} contexts")
+        elif contexts[0].language != session.language:
+            errors.append(f"{session.username}: context language {contexts[0].language} != {session.language}")
+
+    # Records must carry the author that saved them, never another session's
+    data = app_module.load_medical_data()['P001']
+    for record in data['prescriptions']:
+        if record['prescribed_by'] != users['doctors'][record['medication']]['name']:
+            errors.append(f"prescription by {record['medication']} attributed to {record['prescribed_by']}")
+    for record in data['doctor_notes']:
+        if record['nurse'] != users['nurses'][record['note']]['name']:
+            errors.append(f"note by {record['note']} attributed to {record['nurse']}")
+
+    # Every patient's tracking loop has its own FaceMesh and counters
+    time.sleep(0.5)
+    tracking = {context.username: context for context in registry.tracking()}
+    patient_names = [s.username for s in sessions if s.user_type == 'patients']
+    for username in patient_names:
+        context = tracking.get(username)
+        if context is None:
+            errors.append(f"{username}: head tracking not running")
+        elif context.tracking_metrics.frames_processed == 0:
+            errors.append(f"{username}: tracking processed no frames")
+    meshes = [context.face_mesh for context in tracking.values()]
+    if len({id(mesh) for mesh in meshes}) != len(meshes):
+        errors.append("patients share a FaceMesh")
+    if len({id(context.tracking_metrics) for context in tracking.values()}) != len(tracking):
+        errors.append("patients share tracking metrics")
+    for mesh in CheckedFaceMesh.instances:
+        if len(mesh.threads) > 1:
+            errors.append(f"one FaceMesh called from {len(mesh.threads)} threads")
+    # A camera that is already tracking someone refuses a second patient
+    if tracking:
+        first = next(iter(tracking.values()))
+        intruder = registry.create(dict(first.user, username='intruder'))
+        intruder.head_tracking_active = True
+        app_module.head_tracking_loop(intruder, source=SyntheticSource(64, 48, fps=30), backend=RecordingBackend())
+        if intruder.head_tracking_active or intruder.tracking_metrics is not None:
+            errors.append("a second patient got a camera that was already in use")
+        registry.remove(intruder.session_id)
+
+    # Logging some patients out must leave the other hands-free systems running
+    time.sleep(0.2)
+    patients = [s for s in sessions if s.user_type == 'patients']
+    leaving, staying = patients[::2], patients[1::2]
+    graphs = [context.face_mesh for session in leaving for context in registry.find(session.username)]
+    for session in leaving:
+        session.client.get('/logout')
+    time.sleep(0.2)
+    # Their graphs go back to the pool for the next patient, or are closed once it is full
+    deadline = time.time() + 3
+    while time.time() < deadline and not all(g in app_module.face_mesh_pool or g.closed for g in graphs):
+        time.sleep(0.05)
+    if not all(graph in app_module.face_mesh_pool or graph.closed for graph in graphs):
+        errors.append("a logged-out patient's FaceMesh was neither pooled nor closed")
+    if any(mesh.used_after_close for mesh in CheckedFaceMesh.instances):
+        errors.append("a FaceMesh was used after close()")
+    for session in leaving:
+        if registry.find(session.username):
+            errors.append(f"{session.username}: context left after logout")
+    for session in staying:
+        contexts = registry.find(session.username)
+        if not contexts or not contexts[0].hands_free_active:
+            errors.append(f"{session.username}: hands-free stopped by another user's logout")
+
+    # Logging straight back in gets the camera once the old loop lets go of it
+    if staying:
+        session = staying[0]
+        session.client.post('/api/login', data={'username': session.username, 'password': 'pw', 'language': 'en'})
+        deadline = time.time() + 5
+        context = None
+        while time.time() < deadline:
+            contexts = registry.find(session.username)
+            context = contexts[0] if contexts else None
+            if context is None or not context.head_tracking_active:
+                break
+            if context.tracking_metrics is not None and context.tracking_metrics.frames_processed:
+                break
+            time.sleep(0.05)
+        if context is None or not context.head_tracking_active or not context.tracking_metrics:
+            errors.append(f"{session.username}: lost head tracking after logging in again")
+
+    total = sum(session.requests for session in sessions)
+    print(f"👥 {len(sessions)} concurrent sessions, {total} requests in {elapsed:.2f}s "
+          f"({total / elapsed:.0f} req/s)")
+    print(f"📋 Registry: {registry.stats()}")
+    print(f"👀 {len(tracking)} head-tracking loops, {len(CheckedFaceMesh.instances)} FaceMesh graphs, "
+          f"{sum(mesh.calls for mesh in CheckedFaceMesh.instances)} frames through them")
+    if errors:
+        print(f"❌ {len(errors)} cross-talk errors")
+        for error in errors[:20]:
+            print(f"   {error}")
+        sys.exit(1)
+    print("✅ No cross-talk between sessions")
+
+
+if __name__ == '__main__':
+    main()
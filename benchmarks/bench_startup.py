@@ -0,0 +1,90 @@
+"""Startup time and memory of `import app`, lazy vs eager hands-free stack.
+
+Each mode runs in a fresh interpreter:
+- lazy:  import app as it is now (what a doctor/nurse-only server pays)
+- first: import app, then load the whole hands-free stack the way the first
+         patient login does (the cost that moved off startup)
+- eager: import cv2, mediapipe, pyautogui, speech_recognition and googletrans
+         and build FaceMesh before importing app, as app.py used to
+
+Modules that aren't installed are replaced by the fakes in stubs.py, so on
+such machines the eager numbers understate the real difference.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+HEAVY = ['cv2', 'mediapipe', 'pyautogui', 'speech_recognition', 'googletrans', 'numpy']
+
+
+def child(mode):
+    import importlib
+    import resource
+    import time
+
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    import stubs
+    faked = stubs.install()
+    os.chdir(tempfile.mkdtemp(prefix='bench_startup_'))
+
+    started = time.perf_counter()
+    if mode == 'eager':
+        for name in HEAVY:
+            importlib.import_module(name)
+        sys.modules['mediapipe'].solutions.face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True)
+    import app
+    if mode == 'first':
+        from lazy import load
+        for lazy in (app.cv2, app.mp, app.face_mesh, app.pyautogui, app.sr, app.googletrans):
+            load(lazy)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'seconds': elapsed,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'loaded': [name for name in HEAVY if name in sys.modules],
+        'faked': faked
+    }))
+
+
+def run(mode):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', choices=['lazy', 'first', 'eager'])
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    results = {}
+    for mode in ['lazy', 'first', 'eager']:
+        runs = [run(mode) for _ in range(args.runs)]
+        seconds = sorted(r['seconds'] for r in runs)[len(runs) // 2]
+        rss = sorted(r['max_rss_mb'] for r in runs)[len(runs) // 2]
+        results[mode] = (seconds, rss)
+        print(f"{'🪶' if mode == 'lazy' else '🏋️'} {mode:5s}: {seconds * 1000:7.0f} ms, {rss:6.1f} MB peak RSS, "
+              f"loaded: {', '.join(runs[0]['loaded']) or 'none'}")
+    if runs[0]['faked']:
+        print(f"⚠️ Faked (not installed): {', '.join(runs[0]['faked'])}")
+    lazy, eager = results['lazy'], results['eager']
+    print(f"📉 Startup {(1 - lazy[0] / eager[0]) * 100:.0f}% faster, {eager[1] - lazy[1]:.1f} MB less memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""Offline replay benchmark for the head-tracking and blink pipeline.
+
+Runs HeadTracker over either a recorded clip (real MediaPipe FaceMesh) or a
+synthetic face (no camera, no model), with pyautogui replaced by
+RecordingBackend. Frames go through CaptureThread and LatestFrameBuffer as
+they do in the app, paced like a camera, so the capture stage is the
+source's own read time and the handoff stage is how long a frame waited in
+the buffer. Reports throughput, per-stage latency percentiles, dropped
+frames, CPU time, peak memory and, when labels are available, blink
+precision/recall.
+
+    python benchmarks/bench_tracking.py --synthetic --frames 900
+    python benchmarks/bench_tracking.py --video clip.mp4 --labels clip.json
+
+A labels file is JSON: {"blinks": [frame index where each blink starts, ...]}.
+The --min-* options turn the run into a regression gate for CI (exit code 1).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from cursor import CursorOutput, RecordingBackend
+from tracking import (
+    EYE_LANDMARKS, CaptureThread, FaceMeshStage, HeadTracker, LatestFrameBuffer, StageTimer,
+    SyntheticSource, TrackingMetrics, VideoFileSource
+)
+
+LANDMARK_COUNT = 478
+# FaceMesh landmarks at the top, bottom, left and right edge of the face
+FACE_EDGES = {10: (0.5, 0.0), 152: (0.5, 1.0), 234: (0.0, 0.5), 454: (1.0, 0.5)}
+
+
+class IndexedFrame(np.ndarray):
+    """A frame that remembers its position in the source, so dropped frames don't shift labels"""
+
+
+class IndexedSource:
+    """Wraps a frame source: paces it like a camera, numbers its frames and times each read.
+
+    The pacing happens here rather than in the source so the read time is only
+    the source's own work (decoding or drawing), not the wait for the next frame.
+    """
+
+    def __init__(self, source, fps):
+        self.source = source
+        self.interval = 1.0 / fps if fps else 0.0
+        self.index = 0
+        self.read_seconds = []
+        self._next_frame_at = None
+
+    def read(self):
+        if self.interval:
+            if self._next_frame_at is not None:
+                time.sleep(max(0.0, self._next_frame_at - time.perf_counter()))
+            self._next_frame_at = time.perf_counter() + self.interval
+        started = time.perf_counter()
+        ret, frame = self.source.read()
+        self.read_seconds.append(time.perf_counter() - started)
+        if not ret:
+            return ret, frame
+        frame = frame.view(IndexedFrame)
+        frame.index = self.index
+        self.index += 1
+        return ret, frame
+
+    def release(self):
+        self.source.release()
+
+
+class SyntheticFaceMesh:
+    """Stands in for mp FaceMesh, finding a drawn face with known blinks.
+
+    render() draws the face as a white box drifting slowly around the frame.
+    process() finds that box in whatever image it is handed (the whole frame,
+    an ROI crop, downscaled or not) and returns scripted landmarks inside it,
+    so ROI tracking works as it does with the real model. The caller sets
+    ``index`` to the frame being processed; every so often both eyes close
+    for a few frames. ``blink_starts`` holds the ground-truth frame index of
+    each blink.
+    """
+
+    def __init__(self, frames, frame_w, frame_h, fps=30, blink_every=(60, 150),
+                 blink_frames=(3, 7), open_ear=0.3, closed_ear=0.06, face_size=(0.3, 0.4), seed=7):
+        rng = random.Random(seed)
+        self.frame_w = frame_w
+        self.frame_h = frame_h
+        self.open_ear = open_ear
+        self.closed_ear = closed_ear
+        self.face_size = face_size
+        self.index = 0
+        self.closed = np.zeros(frames, dtype=bool)
+        self.blink_starts = []
+        start = rng.randint(*blink_every)
+        while start < frames:
+            length = rng.randint(*blink_frames)
+            self.closed[start:start + length] = True
+            self.blink_starts.append(start)
+            start += length + rng.randint(*blink_every)
+        self._rng = np.random.default_rng(seed)
+
+    def _landmark(self, x, y):
+        return SimpleNamespace(x=float(x), y=float(y), z=0.0)
+
+    def render(self, index):
+        """BGR frame with the face box where the script puts it at ``index``"""
+        frame = np.full((self.frame_h, self.frame_w, 3), 96, dtype=np.uint8)
+        cx = 0.5 + 0.1 * np.sin(index / 90)
+        cy = 0.5 + 0.05 * np.cos(index / 70)
+        face_w, face_h = self.face_size
+        x0, x1 = int((cx - face_w / 2) * self.frame_w), int((cx + face_w / 2) * self.frame_w)
+        y0, y1 = int((cy - face_h / 2) * self.frame_h), int((cy + face_h / 2) * self.frame_h)
+        frame[y0:y1, x0:x1] = 255
+        return frame
+
+    def process(self, image):
+        index = self.index
+        face = image.min(axis=2) > 200
+        rows = np.flatnonzero(face.any(axis=1))
+        cols = np.flatnonzero(face.any(axis=0))
+        if not len(rows):
+            return SimpleNamespace(multi_face_landmarks=None)
+        image_h, image_w = face.shape
+        left, top = cols[0], rows[0]
+        box_w, box_h = cols[-1] + 1 - left, rows[-1] + 1 - top
+
+        # Landmarks in face coordinates (0-1 across the box), scattered over the face
+        points = np.clip(np.column_stack([
+            0.5 + self._rng.normal(0, 0.25, LANDMARK_COUNT),
+            0.5 + self._rng.normal(0, 0.25, LANDMARK_COUNT)
+        ]), 0.0, 1.0)
+        for landmark, point in FACE_EDGES.items():
+            points[landmark] = point
+
+        ear = self.closed_ear if index < len(self.closed) and self.closed[index] else self.open_ear
+        eye_w = 0.2
+        # EAR is measured in pixels, so convert the lid gap back to face coordinates
+        gap = ear * eye_w * box_w / box_h
+        for eye, ex in zip(EYE_LANDMARKS, (0.27, 0.73)):
+            outer, upper1, upper2, inner, lower1, lower2 = eye
+            points[outer] = (ex - eye_w / 2, 0.4)
+            points[inner] = (ex + eye_w / 2, 0.4)
+            points[upper1] = (ex - eye_w / 6, 0.4 - gap / 2)
+            points[upper2] = (ex + eye_w / 6, 0.4 - gap / 2)
+            points[lower2] = (ex - eye_w / 6, 0.4 + gap / 2)
+            points[lower1] = (ex + eye_w / 6, 0.4 + gap / 2)
+        points[474:478] = (0.73, 0.4)
+        points += self._rng.normal(0, 0.002, points.shape)
+
+        points = (points * (box_w, box_h) + (left, top)) / (image_w, image_h)
+        face = SimpleNamespace(landmark=[self._landmark(x, y) for x, y in points])
+        return SimpleNamespace(multi_face_landmarks=[face])
+
+
+def match_blinks(detected, labels, tolerance):
+    """Count detections that land within ``tolerance`` frames after a labeled blink start"""
+    unmatched = sorted(labels)
+    true_positives = 0
+    for frame in sorted(detected):
+        for label in unmatched:
+            if label <= frame <= label + tolerance:
+                unmatched.remove(label)
+                true_positives += 1
+                break
+    precision = true_positives / len(detected) if detected else 1.0
+    recall = true_positives / len(labels) if labels else 1.0
+    return true_positives, precision, recall
+
+
+def run(args):
+    if args.video:
+        import mediapipe as mp
+        face_mesh = mp.solutions.face_mesh.FaceMesh(
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+        source = VideoFileSource(args.video)
+        fps = 1.0 / source.frame_interval
+        # Played at the clip's own frame rate, as the app plays a video source
+        camera_fps = fps
+        labels = None
+        if args.labels:
+            with open(args.labels) as f:
+                labels = json.load(f)['blinks']
+    else:
+        fps = 30.0
+        face_mesh = SyntheticFaceMesh(args.frames, args.width, args.height, fps=fps)
+        source = SyntheticSource(args.width, args.height, fps=0, frames=args.frames,
+                                 make_frame=face_mesh.render)
+        camera_fps = args.camera_fps
+        labels = face_mesh.blink_starts
+
+    timer = StageTimer()
+    metrics = TrackingMetrics()
+    backend = RecordingBackend()
+    mesh = FaceMeshStage(face_mesh, roi_tracking=not args.no_roi, downscale=args.downscale,
+                         metrics=metrics, timer=timer)
+    cursor = CursorOutput(backend, metrics=metrics)
+    tracker = HeadTracker(mesh, cursor, metrics=metrics, timer=timer)
+    source = IndexedSource(source, camera_fps)
+    frames = LatestFrameBuffer(metrics)
+    capture = CaptureThread(source, frames, metrics)
+
+    detected = []
+    processed = 0
+    wall_started = time.perf_counter()
+    cpu_started = time.process_time()
+    capture.start()
+    while True:
+        item = frames.get(timeout=1.0)
+        if item is None:
+            if frames.closed:
+                break
+            continue
+        frame, captured_at = item
+        timer.add('handoff', time.perf_counter() - captured_at)
+        index = frame.index
+        if args.frames is not None and index >= args.frames:
+            break
+        if not args.video:
+            face_mesh.index = index
+        # Media time, so blink durations are right however fast we replay
+        moved, clicked = tracker.process(frame, index / fps)
+        if moved:
+            metrics.record_latency(time.perf_counter() - captured_at)
+        if clicked:
+            detected.append(index)
+        processed += 1
+    capture.stop()
+    capture.join(timeout=1.0)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    source.release()
+    # Read times were collected on the capture thread; StageTimer isn't shared with it
+    timer.samples['capture'] = list(source.read_seconds)
+
+    report = {
+        'mode': 'video' if args.video else 'synthetic',
+        'frames': processed,
+        'frames_dropped': metrics.frames_dropped,
+        'fps': round(processed / wall, 2) if wall else None,
+        'wall_s': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        'cpu_per_frame_ms': round(cpu / processed * 1000, 3) if processed else None,
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stages': timer.summary(),
+        'os_moves': len(backend.moves),
+        'clicks': len(backend.clicks),
+        'pipeline': metrics.snapshot()
+    }
+    if labels is not None:
+        true_positives, precision, recall = match_blinks(detected, labels, args.tolerance)
+        report['blinks'] = {
+            'labeled': len(labels),
+            'detected': len(detected),
+            'true_positives': true_positives,
+            'precision': round(precision, 4),
+            'recall': round(recall, 4)
+        }
+    return report
+
+
+def print_report(report):
+    print(f"🎬 {report['mode']}: {report['frames']} frames in {report['wall_s']} s "
+          f"({report['fps']} fps, {report['frames_dropped']} dropped), CPU {report['cpu_s']} s, "
+          f"max RSS {report['max_rss_mb']} MB")
+    print(f"{'stage':<12}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for stage in ['capture', 'handoff', 'color', 'inference', 'post', 'output']:
+        stats = report['stages'].get(stage)
+        if stats:
+            print(f"{stage:<12}{stats['mean_ms']:>9}{stats['p50_ms']:>9}"
+                  f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}")
+    pipeline = report['pipeline']
+    print(f"🔍 ROI inferences: {pipeline['roi_inferences']}, full frame: {pipeline['full_frame_inferences']}, "
+          f"track losses: {pipeline['track_losses']}")
+    print(f"🖱️ OS cursor moves: {report['os_moves']}, clicks: {report['clicks']}")
+    if 'blinks' in report:
+        blinks = report['blinks']
+        print(f"👁️ Blinks: {blinks['detected']} detected / {blinks['labeled']} labeled, "
+              f"precision {blinks['precision']}, recall {blinks['recall']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help='recorded clip to replay through MediaPipe')
+    source.add_argument('--synthetic', action='store_true', help='scripted landmark stream')
+    parser.add_argument('--labels', help='JSON file with labeled blink start frames')
+    parser.add_argument('--frames', type=int, help='stop after this many frames')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--camera-fps', type=float, default=30.0,
+                        help='synthetic camera frame rate; raise it to see where frames start being dropped')
+    parser.add_argument('--downscale', type=float, default=1.0)
+    parser.add_argument('--no-roi', action='store_true', help='always run full-frame inference')
+    parser.add_argument('--tolerance', type=int, default=15,
+                        help='frames after a labeled blink start a detection may land')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--min-fps', type=float)
+    parser.add_argument('--min-precision', type=float)
+    parser.add_argument('--min-recall', type=float)
+    args = parser.parse_args()
+    if args.synthetic and args.frames is None:
+        args.frames = 900
+    if args.camera_fps <= 0:
+        parser.error('--camera-fps must be positive')
+
+    report = run(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.min_fps is not None and report['fps'] < args.min_fps:
+        failures.append(f"fps {report['fps']} < {args.min_fps}")
+    blinks = report.get('blinks', {})
+    if args.min_precision is not None and blinks.get('precision', 0) < args.min_precision:
+        failures.append(f"precision {blinks.get('precision')} < {args.min_precision}")
+    if args.min_recall is not None and blinks.get('recall', 0) < args.min_recall:
+        failures.append(f"recall {blinks.get('recall')} < {args.min_recall}")
+    if failures:
+        print("❌ Regression: " + ", ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Several cameras at once: tracking threads in one process vs TrackingService workers.
+
+Each of --cameras synthetic 30 fps cameras is tracked for --seconds, first
+the way app.py does it for a single patient (a head_tracking_loop thread per
+camera, all sharing the GIL), then through TrackingService with one worker
+process per camera and shared-memory frame rings. FaceMesh is replaced by a
+stand-in that burns --inference-ms of CPU per frame, and the cursor by
+RecordingBackend. Reports the frame rate each camera achieved and the
+workers' health.
+
+    python benchmarks/bench_tracking_service.py --cameras 4 --inference-ms 20 --seconds 10
+
+On a machine with fewer cores than cameras the process workers can't beat the
+threads by much. The benchmark prints the core count next to the results.
+"""
+import argparse
+import functools
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from cursor import CursorOutput, RecordingBackend
+from tracking import (
+    AdaptiveFrameRate, CaptureThread, FaceMeshStage, HeadTracker, LatestFrameBuffer, SyntheticSource,
+    TrackingMetrics
+)
+from tracking_service import TrackingService
+
+LANDMARK_COUNT = 478
+
+
+class BusyFaceMesh:
+    """FaceMesh stand-in: a fixed face after ``inference_ms`` of CPU time in pure Python"""
+
+    def __init__(self, inference_ms):
+        self.inference = inference_ms / 1000
+        rng = np.random.default_rng(5)
+        points = np.column_stack([rng.uniform(0.4, 0.6, LANDMARK_COUNT), rng.uniform(0.35, 0.65, LANDMARK_COUNT)])
+        face = SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=0.0) for x, y in points.tolist()])
+        self.result = SimpleNamespace(multi_face_landmarks=[face])
+
+    def process(self, image):
+        # CPU time, not wall time, so a preempted worker still does the full amount of work.
+        # Holds the GIL throughout, like the real model's Python-side work.
+        busy_until = time.thread_time() + self.inference
+        while time.thread_time() < busy_until:
+            pass
+        return self.result
+
+
+def synthetic_camera(spec):
+    frame = np.full((480, 640, 3), 96, dtype=np.uint8)
+    return SyntheticSource(640, 480, fps=30, make_frame=lambda index: frame)
+
+
+def run_threads(cameras, inference_ms, seconds):
+    """One head_tracking_loop-style thread per camera, all in this process"""
+    stopped = threading.Event()
+    all_metrics = []
+
+    def loop(camera):
+        metrics = TrackingMetrics()
+        all_metrics.append(metrics)
+        frame_rate = AdaptiveFrameRate(adaptive=False, metrics=metrics)
+        frames = LatestFrameBuffer(metrics)
+        capture = CaptureThread(synthetic_camera(camera), frames, metrics, frame_rate=frame_rate)
+        tracker = HeadTracker(
+            FaceMeshStage(BusyFaceMesh(inference_ms), roi_tracking=False, metrics=metrics),
+            CursorOutput(RecordingBackend(), metrics=metrics),
+            metrics=metrics, frame_rate=frame_rate
+        )
+        capture.start()
+        while not stopped.is_set():
+            item = frames.get(timeout=0.5)
+            if item is not None:
+                tracker.process(*item)
+        capture.stop()
+        capture.join(timeout=1.0)
+
+    threads = [threading.Thread(target=loop, args=(camera,), daemon=True) for camera in range(cameras)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    fps = [metrics.frames_processed / seconds for metrics in all_metrics]
+    stopped.set()
+    for thread in threads:
+        thread.join()
+    return fps
+
+
+def run_service(cameras, inference_ms, seconds):
+    service = TrackingService(
+        max_workers=cameras,
+        mesh_factory=functools.partial(BusyFaceMesh, inference_ms),
+        source_factory=synthetic_camera,
+        backend_factory=RecordingBackend,
+        roi_tracking=False,
+        frame_rate_options={'adaptive': False}
+    )
+    for camera in range(cameras):
+        ok, message = service.start(f"session-{camera}", camera, label=f"bed{camera}")
+        if not ok:
+            raise RuntimeError(message)
+    # Let the workers import and build their models before measuring
+    time.sleep(2.0)
+    before = {worker['patient']: worker['tracking']['frames_processed'] for worker in service.stats()['workers']}
+    time.sleep(seconds)
+    stats = service.stats()
+    fps = [(worker['tracking']['frames_processed'] - before[worker['patient']]) / seconds
+           for worker in stats['workers']]
+    accepted, _ = service.start('one-too-many', 'extra')
+    service.shutdown()
+    return fps, stats, accepted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--cameras', type=int, default=4)
+    parser.add_argument('--inference-ms', type=float, default=20)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"🖥️ {os.cpu_count()} CPU cores, {args.cameras} cameras at 30 fps, "
+          f"{args.inference_ms:.0f} ms per FaceMesh call")
+    fps = run_threads(args.cameras, args.inference_ms, args.seconds)
+    print(f"🧵 threads:   {' '.join(f'{value:5.1f}' for value in fps)} fps per camera, {sum(fps):.1f} total")
+    fps, stats, accepted = run_service(args.cameras, args.inference_ms, args.seconds)
+    print(f"⚙️ processes: {' '.join(f'{value:5.1f}' for value in fps)} fps per camera, {sum(fps):.1f} total")
+    for worker in stats['workers']:
+        print(f"   {worker['patient']}: pid {worker['pid']} alive={worker['alive']} "
+              f"restarts={worker['restarts']} heartbeat {worker['heartbeat_age_s']}s ago, "
+              f"inference {worker['inference_ms_avg']} ms, {worker['frames_skipped']} frames skipped")
+    print(f"🚦 Start beyond max_workers refused: {not accepted}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Account lookup and patient-ID allocation benchmark.
+
+Builds a user database of --accounts accounts and measures:
+- indexing time for UserDirectory
+- login lookups through the index vs the old scan over every role
+- concurrent signups from --threads threads; every patient ID must be unique
+- how often the old len(patients) + 1 allocator reuses an ID once accounts
+  have been deleted
+
+    python benchmarks/bench_users.py --accounts 100000 --threads 16
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from users import USER_ROLES, UserDirectory, format_patient_id
+
+
+def make_data(count):
+    data = {role: {} for role in USER_ROLES}
+    for i in range(count):
+        role = USER_ROLES[i % len(USER_ROLES)]
+        record = {'password': 'pw', 'name': f"User {i}", 'language': 'en'}
+        if role == 'patients':
+            record['patient_id'] = format_patient_id(len(data['patients']) + 1)
+        data[role][f"user{i}"] = record
+    return data
+
+
+def legacy_lookup(data, username):
+    """The scan login() and signup() used before the index"""
+    for role, users in data.items():
+        if username in users:
+            return role, users[username]
+    return None, None
+
+
+def time_per_call(fn, names):
+    started = time.perf_counter()
+    for name in names:
+        fn(name)
+    return (time.perf_counter() - started) / len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--accounts', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--signups', type=int, default=1000, help='signups per thread')
+    args = parser.parse_args()
+
+    data = make_data(args.accounts)
+    started = time.perf_counter()
+    directory = UserDirectory(data)
+    print(f"🗂️ Indexed {len(directory)} accounts in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    rng = random.Random(1)
+    names = [f"user{rng.randrange(args.accounts * 2)}" for _ in range(args.lookups)]
+    indexed = time_per_call(directory.lookup, names)
+    legacy = time_per_call(lambda name: legacy_lookup(data, name), names)
+    print(f"⚡ Index lookup: {indexed * 1e9:.0f} ns")
+    print(f"🐢 Role scan:    {legacy * 1e9:.0f} ns")
+
+    started = time.perf_counter()
+    size = len(directory.dumps())
+    print(f"💾 Serializing the file: {(time.perf_counter() - started) * 1000:.0f} ms ({size / 1e6:.1f} MB)")
+
+    # Concurrent signups: the same usernames are raced from several threads too
+    before = {record['patient_id'] for record in data['patients'].values()}
+    added = [0] * args.threads
+
+    def sign_up(worker):
+        for i in range(args.signups):
+            username = f"new{i}" if i % 10 == 0 else f"new{worker}_{i}"
+            if directory.add(username, 'patients', {'password': 'pw', 'name': username}):
+                added[worker] += 1
+
+    threads = [threading.Thread(target=sign_up, args=(w,)) for w in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    new_ids = [record['patient_id'] for record in data['patients'].values()
+               if record['patient_id'] not in before]
+    duplicates = len(new_ids) - len(set(new_ids))
+    print(f"👥 {sum(added)} concurrent signups in {elapsed * 1000:.0f} ms, "
+          f"{duplicates} duplicate patient IDs, {len(set(new_ids) & before)} reused IDs")
+
+    # What the old allocator did once some patients had been removed
+    patients = dict(data['patients'])
+    for username in rng.sample(sorted(patients), len(patients) // 100):
+        del patients[username]
+    taken = {record['patient_id'] for record in patients.values()}
+    collisions = sum(1 for n in range(100) if format_patient_id(len(patients) + 1 + n) in taken)
+    print(f"♻️ Old len(patients) + 1 allocator: {collisions} of the next 100 IDs already taken after 1% deletions")
+
+    if duplicates:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
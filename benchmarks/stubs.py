@@ -0,0 +1,93 @@
+"""Stand-ins for the hardware-bound modules app.py imports.
+
+Benchmarks that drive the Flask app run on machines without a camera,
+microphone, display or network translator. install() registers small fakes
+for pyautogui, mediapipe and googletrans when the real ones can't be imported,
+so `import app` works anywhere. It must be called before importing app.
+The fakes sit at the end of the import system, so nothing is imported until
+app actually uses it.
+"""
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import sys
+import types
+
+
+class FakeFaceMesh:
+    def __init__(self, **options):
+        self.options = options
+
+    def process(self, rgb):
+        return types.SimpleNamespace(multi_face_landmarks=None)
+
+    def close(self):
+        pass
+
+
+class FakeTranslator:
+    def translate(self, text, src='auto', dest='en'):
+        return types.SimpleNamespace(text=text, src=src, dest=dest)
+
+
+def _fake_pyautogui():
+    module = types.ModuleType('pyautogui')
+    module.FAILSAFE = False
+    module.calls = []
+    for name in ['moveTo', 'click', 'doubleClick', 'rightClick', 'scroll', 'write', 'press', 'hotkey']:
+        setattr(module, name, lambda *args, _name=name, **kwargs: module.calls.append((_name, args)))
+    module.size = lambda: (1920, 1080)
+    return module
+
+
+def _fake_mediapipe():
+    module = types.ModuleType('mediapipe')
+    face_mesh = types.SimpleNamespace(FaceMesh=FakeFaceMesh)
+    module.solutions = types.SimpleNamespace(face_mesh=face_mesh)
+    return module
+
+
+def _fake_googletrans():
+    module = types.ModuleType('googletrans')
+    module.Translator = FakeTranslator
+    module.LANGUAGES = {
+        'en': 'english', 'es': 'spanish', 'ar': 'arabic', 'fr': 'french', 'de': 'german',
+        'it': 'italian', 'pt': 'portuguese', 'ru': 'russian', 'zh': 'chinese', 'ja': 'japanese'
+    }
+    return module
+
+
+FAKES = {
+    'pyautogui': _fake_pyautogui,
+    'mediapipe': _fake_mediapipe,
+    'googletrans': _fake_googletrans
+}
+
+
+class _FallbackFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Serves a fake only when no real finder could locate the module"""
+
+    def find_spec(self, name, path, target=None):
+        if name in FAKES:
+            return importlib.machinery.ModuleSpec(name, self)
+        return None
+
+    def create_module(self, spec):
+        return FAKES[spec.name]()
+
+    def exec_module(self, module):
+        pass
+
+
+def install(force=False):
+    """Fake the modules that aren't installed (all of them with ``force``); returns the faked names"""
+    faked = []
+    for name, make in FAKES.items():
+        if force:
+            sys.modules[name] = make()
+            faked.append(name)
+        elif importlib.util.find_spec(name) is None:
+            faked.append(name)
+    if not any(isinstance(finder, _FallbackFinder) for finder in sys.meta_path):
+        sys.meta_path.append(_FallbackFinder())
+    return faked
@@ -0,0 +1,218 @@
+"""Voice command matching.
+
+Commands are declared once as phrase tables and compiled into a token trie
+per language. Matching walks the utterance a word at a time and returns the
+leftmost (then longest) phrase, so "enter" no longer fires inside "center"
+and dispatch cost does not grow with the number of phrases.
+
+Bare directions like "down" or "go up" only count when they are the whole
+utterance, so "shut down", "turn it down" or "sit me up" don't scroll.
+
+Every supported language has its own table, so common commands match in the
+patient's language without a round-trip to the translator. Chinese and
+Japanese don't separate words with spaces and are matched per character.
+"""
+import re
+from collections import namedtuple
+
+# Placeholder for free text at the end of a phrase, e.g. "type <text>"
+SLOT = '<text>'
+# A phrase written as "^down$" only matches an utterance that is exactly that phrase
+WHOLE_START, WHOLE_END = '^', '$'
+
+# action, phrases - when utterances contain several phrases the leftmost one wins,
+# and a longer phrase beats a shorter one starting at the same word
+COMMAND_PHRASES = {
+    'en': [
+        ('scroll_down', ['scroll down', 'scroll the page down', 'page down', '^go down$', '^down$']),
+        ('scroll_up', ['scroll up', 'scroll the page up', 'page up', '^go up$', '^up$']),
+        ('double_click', ['double click', 'double press', 'two clicks']),
+        ('right_click', ['right click', 'right press', 'context menu']),
+        ('click', ['click', 'press', 'select', 'tap']),
+        ('open_chrome', ['open chrome', 'launch chrome', 'start chrome', 'open browser']),
+        ('open_notepad', ['open notepad', 'launch notepad', 'start notepad', 'open text editor']),
+        ('type', ['type <text>', 'write <text>', 'enter <text>', 'input <text>']),
+        ('stop', ['stop', 'exit', 'quit', 'close system'])
+    ],
+    'es': [
+        ('scroll_down', ['desplazar abajo', 'desplázate hacia abajo', '^hacia abajo$', '^bajar$', '^abajo$']),
+        ('scroll_up', ['desplazar arriba', 'desplázate hacia arriba', '^hacia arriba$', '^subir$', '^arriba$']),
+        ('double_click', ['doble clic', 'doble click']),
+        ('right_click', ['clic derecho', 'click derecho', 'menú contextual']),
+        ('click', ['clic', 'click', 'pulsar', 'presionar', 'seleccionar']),
+        ('open_chrome', ['abrir chrome', 'abre chrome', 'abrir navegador', 'abre el navegador']),
+        ('open_notepad', ['abrir bloc de notas', 'abre el bloc de notas']),
+        ('type', ['escribir <text>', 'escribe <text>']),
+        ('stop', ['detener', 'detente', 'parar', 'salir'])
+    ],
+    'fr': [
+        ('scroll_down', ['défiler vers le bas', '^descendre$', '^vers le bas$', '^en bas$']),
+        ('scroll_up', ['défiler vers le haut', '^monter$', '^vers le haut$', '^en haut$']),
+        ('double_click', ['double clic', 'double-clic']),
+        ('right_click', ['clic droit', 'menu contextuel']),
+        ('click', ['clic', 'cliquer', 'cliquez', 'sélectionner']),
+        ('open_chrome', ['ouvrir chrome', 'ouvre chrome', 'ouvrir le navigateur']),
+        ('open_notepad', ['ouvrir le bloc-notes', 'ouvre le bloc-notes', 'ouvrir bloc-notes']),
+        ('type', ['écrire <text>', 'écris <text>', 'taper <text>', 'tape <text>']),
+        ('stop', ['arrêter', 'arrête', 'stop', 'quitter'])
+    ],
+    'de': [
+        ('scroll_down', ['nach unten scrollen', 'runter scrollen', '^nach unten$', '^runter$']),
+        ('scroll_up', ['nach oben scrollen', 'hoch scrollen', '^nach oben$', '^hoch$']),
+        ('double_click', ['doppelklick', 'doppelklicken']),
+        ('right_click', ['rechtsklick', 'kontextmenü']),
+        ('click', ['klick', 'klicken', 'drücken', 'auswählen']),
+        ('open_chrome', ['chrome öffnen', 'öffne chrome', 'browser öffnen', 'öffne den browser']),
+        ('open_notepad', ['editor öffnen', 'öffne den editor', 'notepad öffnen']),
+        ('type', ['schreibe <text>', 'schreiben <text>', 'tippe <text>']),
+        ('stop', ['stopp', 'stop', 'beenden', 'aufhören'])
+    ],
+    'it': [
+        ('scroll_down', ['scorri giù', 'scorri in basso', '^vai giù$', '^giù$']),
+        ('scroll_up', ['scorri su', 'scorri in alto', '^vai su$']),
+        ('double_click', ['doppio clic', 'doppio click']),
+        ('right_click', ['clic destro', 'tasto destro', 'menu contestuale']),
+        ('click', ['clic', 'click', 'clicca', 'seleziona']),
+        ('open_chrome', ['apri chrome', 'apri il browser']),
+        ('open_notepad', ['apri blocco note', 'apri il blocco note']),
+        ('type', ['scrivi <text>', 'digita <text>']),
+        ('stop', ['fermati', 'ferma', 'stop', 'esci'])
+    ],
+    'pt': [
+        ('scroll_down', ['rolar para baixo', 'role para baixo', '^para baixo$', '^descer$']),
+        ('scroll_up', ['rolar para cima', 'role para cima', '^para cima$', '^subir$']),
+        ('double_click', ['clique duplo', 'duplo clique']),
+        ('right_click', ['clique direito', 'botão direito', 'menu de contexto']),
+        ('click', ['clique', 'clicar', 'selecionar', 'tocar']),
+        ('open_chrome', ['abrir chrome', 'abra o chrome', 'abrir navegador', 'abra o navegador']),
+        ('open_notepad', ['abrir bloco de notas', 'abra o bloco de notas']),
+        ('type', ['escrever <text>', 'escreva <text>', 'digitar <text>', 'digite <text>']),
+        ('stop', ['parar', 'pare', 'sair'])
+    ],
+    'ru': [
+        ('scroll_down', ['прокрутить вниз', 'прокрути вниз', '^вниз$']),
+        ('scroll_up', ['прокрутить вверх', 'прокрути вверх', '^вверх$']),
+        ('double_click', ['двойной клик', 'двойной щелчок']),
+        ('right_click', ['правый клик', 'правый щелчок', 'контекстное меню']),
+        ('click', ['клик', 'кликни', 'щелчок', 'нажми', 'выбрать']),
+        ('open_chrome', ['открой хром', 'открыть хром', 'открой chrome', 'открой браузер']),
+        ('open_notepad', ['открой блокнот', 'открыть блокнот']),
+        ('type', ['напиши <text>', 'написать <text>', 'напечатай <text>', 'введи <text>']),
+        ('stop', ['стоп', 'остановить', 'остановись', 'выход'])
+    ],
+    'ar': [
+        ('scroll_down', ['مرر للأسفل', '^انزل$', '^لأسفل$']),
+        ('scroll_up', ['مرر للأعلى', '^اصعد$', '^لأعلى$']),
+        ('double_click', ['نقر مزدوج', 'نقرتين']),
+        ('right_click', ['نقر يمين', 'الزر الأيمن']),
+        ('click', ['انقر', 'اضغط', 'نقر', 'اختر']),
+        ('open_chrome', ['افتح كروم', 'افتح المتصفح']),
+        ('open_notepad', ['افتح المفكرة', 'افتح نوت باد']),
+        ('type', ['اكتب <text>']),
+        ('stop', ['توقف', 'قف', 'إيقاف', 'خروج'])
+    ],
+    'zh': [
+        ('scroll_down', ['向下滚动', '往下滚', '^向下$', '^往下$', '^下滑$']),
+        ('scroll_up', ['向上滚动', '往上滚', '^向上$', '^往上$', '^上滑$']),
+        ('double_click', ['双击']),
+        ('right_click', ['右键', '右击']),
+        ('click', ['单击', '点击', '点一下', '选择']),
+        ('open_chrome', ['打开谷歌浏览器', '打开浏览器', '打开chrome']),
+        ('open_notepad', ['打开记事本']),
+        ('type', ['输入 <text>', '打字 <text>']),
+        ('stop', ['停止', '退出', '关闭系统'])
+    ],
+    'ja': [
+        ('scroll_down', ['下にスクロール', '^下へ$', '^下に$']),
+        ('scroll_up', ['上にスクロール', '^上へ$', '^上に$']),
+        ('double_click', ['ダブルクリック']),
+        ('right_click', ['右クリック']),
+        ('click', ['クリック', '選択', '押して']),
+        ('open_chrome', ['クロームを開いて', 'chromeを開いて', 'ブラウザを開いて']),
+        ('open_notepad', ['メモ帳を開いて']),
+        ('type', ['入力 <text>', 'タイプ <text>']),
+        ('stop', ['停止', '止めて', '終了'])
+    ]
+}
+
+# Languages written without spaces between words; their tries are per character
+CHARACTER_LANGUAGES = {'zh', 'ja'}
+
+Match = namedtuple('Match', ['action', 'text', 'phrase'])
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+
+
+def tokenize(text, by_character=False):
+    """Lowercase words with punctuation stripped, plus the raw words for slot text"""
+    lowered = text.lower()
+    if by_character:
+        characters = [c for c in _PUNCTUATION.sub('', lowered) if not c.isspace()]
+        return characters, characters
+    raw = lowered.split()
+    if not _PUNCTUATION.search(lowered):
+        # Speech recognizers rarely emit punctuation, so this is the usual path
+        return raw, raw
+    return [_PUNCTUATION.sub('', word) for word in raw], raw
+
+
+class CommandMatcher:
+    """Compiled phrase tables: one token trie per language"""
+
+    def __init__(self, phrase_tables=COMMAND_PHRASES):
+        self.tries = {}
+        for language, commands in phrase_tables.items():
+            self.tries[language] = self._compile(commands, language in CHARACTER_LANGUAGES)
+
+    @staticmethod
+    def _compile(commands, by_character):
+        root = {}
+        for action, phrases in commands:
+            for phrase in phrases:
+                whole = phrase.startswith(WHOLE_START) and phrase.endswith(WHOLE_END)
+                phrase_words = phrase[len(WHOLE_START):-len(WHOLE_END)] if whole else phrase
+                has_slot = phrase_words.endswith(SLOT)
+                if has_slot:
+                    phrase_words = phrase_words[:-len(SLOT)]
+                # Phrases go through the same normalization as utterances
+                words, _ = tokenize(phrase_words, by_character)
+                node = root
+                for word in words:
+                    node = node.setdefault(word, {})
+                # A phrase listed twice keeps the first action declared for it
+                node.setdefault(None, (action, has_slot, whole, phrase))
+        return root
+
+    @staticmethod
+    def _fits(terminal, start, end, tokens):
+        """True if a phrase ends here and, if it must be the whole utterance, it is"""
+        if terminal is None:
+            return False
+        return not terminal[2] or (start == 0 and end == len(tokens) - 1)
+
+    def match(self, text, language='en'):
+        """Return the leftmost-longest command in ``text``, or None"""
+        trie = self.tries.get(language)
+        if trie is None:
+            return None
+        by_character = language in CHARACTER_LANGUAGES
+        tokens, raw = tokenize(text, by_character)
+        for start, token in enumerate(tokens):
+            node = trie.get(token)
+            if node is None:
+                continue
+            terminal = node.get(None)
+            best = (start, terminal) if self._fits(terminal, start, start, tokens) else None
+            for end in range(start + 1, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                terminal = node.get(None)
+                if self._fits(terminal, start, end, tokens):
+                    best = (end, terminal)
+            if best is not None:
+                end, (action, has_slot, _, phrase) = best
+                joiner = '' if by_character else ' '
+                slot_text = joiner.join(raw[end + 1:]) if has_slot else ''
+                return Match(action, slot_text, phrase)
+        return None
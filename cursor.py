@@ -0,0 +1,168 @@
+"""Output stage between head tracking and the operating system's mouse.
+
+Raw iris positions jitter from frame to frame, and every pyautogui call is
+a synchronous OS round-trip. CursorOutput smooths positions with a One-Euro
+filter, ignores movement inside a small dead-zone, and caps how often the
+OS is called, keeping only the latest position in between. The backend is
+pluggable so tests and benchmarks can record moves instead of moving the
+real cursor.
+"""
+import math
+import time
+
+
+class LowPassFilter:
+    def __init__(self):
+        self.value = None
+
+    def __call__(self, value, alpha):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value = alpha * value + (1.0 - alpha) * self.value
+        return self.value
+
+
+class OneEuroFilter:
+    """One-Euro filter: heavy smoothing when still, little lag when moving fast.
+
+    ``min_cutoff`` (Hz) sets how much jitter is removed at rest and ``beta``
+    how quickly the cutoff rises with speed.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.005, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = LowPassFilter()
+        self._dx = LowPassFilter()
+        self._last_time = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, value, now):
+        if self._last_time is None:
+            self._dx(0.0, 1.0)
+            self._x(value, 1.0)
+        else:
+            dt = max(now - self._last_time, 1e-6)
+            speed = self._dx((value - self._x.value) / dt, self._alpha(self.d_cutoff, dt))
+            cutoff = self.min_cutoff + self.beta * abs(speed)
+            self._x(value, self._alpha(cutoff, dt))
+        self._last_time = now
+        return self._x.value
+
+
+class PyAutoGuiBackend:
+    def __init__(self):
+        import pyautogui
+        pyautogui.FAILSAFE = False
+        self._gui = pyautogui
+
+    def size(self):
+        return self._gui.size()
+
+    def move_to(self, x, y):
+        self._gui.moveTo(x, y)
+
+    def click(self):
+        self._gui.click()
+
+
+class RecordingBackend:
+    """Stand-in for pyautogui that only records what would have happened"""
+
+    def __init__(self, width=1920, height=1080):
+        self.width = width
+        self.height = height
+        self.events = []
+
+    def size(self):
+        return self.width, self.height
+
+    def move_to(self, x, y):
+        self.events.append(('move', x, y, time.perf_counter()))
+
+    def click(self):
+        self.events.append(('click', None, None, time.perf_counter()))
+
+    @property
+    def moves(self):
+        return [event for event in self.events if event[0] == 'move']
+
+    @property
+    def clicks(self):
+        return [event for event in self.events if event[0] == 'click']
+
+
+class CursorOutput:
+    """Smooths, dead-zones and rate-limits cursor moves before they reach the OS.
+
+    ``dead_zone`` is a radius in screen pixels around the last position sent
+    to the OS; smaller movements are dropped. ``max_rate`` caps OS calls per
+    second; moves arriving faster are coalesced and only the latest is sent.
+    """
+
+    def __init__(self, backend, dead_zone=3, max_rate=60, min_cutoff=1.0, beta=0.005,
+                 metrics=None):
+        self.backend = backend
+        self.dead_zone = dead_zone
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.metrics = metrics
+        self._filter_x = OneEuroFilter(min_cutoff, beta)
+        self._filter_y = OneEuroFilter(min_cutoff, beta)
+        self._sent = None
+        self._sent_at = float('-inf')
+        self._pending = None
+
+    def size(self):
+        return self.backend.size()
+
+    def move(self, x, y, now=None):
+        """Feed a raw screen position; returns True if the OS cursor was actually moved"""
+        now = time.perf_counter() if now is None else now
+        x = self._filter_x(x, now)
+        y = self._filter_y(y, now)
+
+        if self._sent is not None and math.hypot(x - self._sent[0], y - self._sent[1]) < self.dead_zone:
+            self._pending = None
+            self._count('moves_suppressed')
+            return False
+        if now - self._sent_at < self.min_interval:
+            self._pending = (x, y)
+            self._count('moves_coalesced')
+            return False
+        self._send(x, y, now)
+        return True
+
+    def flush(self, now=None):
+        """Send a coalesced move that is still waiting, e.g. before a click"""
+        if self._pending is not None:
+            self._send(*self._pending, time.perf_counter() if now is None else now)
+
+    def click(self):
+        self.flush()
+        self.backend.click()
+
+    def reset(self):
+        """Forget the filter state, e.g. after the face was lost"""
+        self._filter_x.reset()
+        self._filter_y.reset()
+        self._pending = None
+
+    def _send(self, x, y, now):
+        self.backend.move_to(round(x), round(y))
+        self._sent = (x, y)
+        self._sent_at = now
+        self._pending = None
+        self._count('cursor_updates')
+
+    def _count(self, name):
+        if self.metrics:
+            setattr(self.metrics, name, getattr(self.metrics, name) + 1)
@@ -0,0 +1,126 @@
+"""Server-Sent Events broker that pushes updates to the dashboards.
+
+Every connected dashboard gets a Subscription with its own bounded queue.
+Publishing never blocks: a client that falls too far behind has its queue
+cleared and is told to resync over the REST API instead. Recent events are
+kept in a ring buffer so a reconnecting EventSource can resume from its
+Last-Event-ID without missing anything.
+"""
+import json
+import queue
+import threading
+from collections import deque
+
+# Sentinel telling a client it missed events and should reload from the REST API
+RESYNC = object()
+
+
+class Subscription:
+    def __init__(self, topics=None, match=None, queue_size=100):
+        self.topics = set(topics) if topics else None
+        self.match = match or {}
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def wants(self, event):
+        if self.topics is not None and event['type'] not in self.topics:
+            return False
+        data = event['data']
+        return all(data[key] == value for key, value in self.match.items() if key in data)
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Slow client: throw away its backlog and ask it to resync
+            self.dropped += 1
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(RESYNC)
+
+
+class EventBroker:
+    def __init__(self, history_size=500, queue_size=100, heartbeat_interval=15, retry_ms=3000):
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_ms = retry_ms
+        self.published = 0
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._history = deque(maxlen=history_size)
+        self._subscriptions = set()
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = {'id': self._next_id, 'type': event_type, 'data': data}
+            self._next_id += 1
+            self._history.append(event)
+            self.published += 1
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.wants(event):
+                subscription.offer(event)
+        return event['id']
+
+    def resync(self):
+        """Tell every client to reload from the REST API, e.g. after a bulk import"""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(RESYNC)
+
+    def subscribe(self, topics=None, match=None, last_event_id=None):
+        """Register a client, replaying anything it missed since last_event_id"""
+        subscription = Subscription(topics, match, self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                missed = [event for event in self._history if event['id'] > last_event_id]
+                oldest = self._history[0]['id'] if self._history else self._next_id
+                if last_event_id + 1 < oldest:
+                    # Part of the gap already fell out of the ring buffer
+                    subscription.offer(RESYNC)
+                for event in missed:
+                    if subscription.wants(event):
+                        subscription.offer(event)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def stream(self, subscription):
+        """Yield SSE-formatted text for one client until it disconnects"""
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while True:
+                try:
+                    item = subscription.queue.get(timeout=self.heartbeat_interval)
+                except queue.Empty:
+                    # Comment line keeps proxies from timing out and detects dead clients
+                    yield ": heartbeat\n\n"
+                    continue
+                if item is RESYNC:
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    yield format_event(item)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        return {
+            'clients': len(subscriptions),
+            'published': self.published,
+            'last_event_id': self._next_id - 1,
+            'queued': sum(s.queue.qsize() for s in subscriptions),
+            'dropped': sum(s.dropped for s in subscriptions)
+        }
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
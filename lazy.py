@@ -0,0 +1,88 @@
+"""Deferred imports and initialization for the hands-free stack.
+
+cv2, mediapipe, numpy, pyautogui, speech_recognition and googletrans together
+add seconds of startup and a few hundred MB of memory. Doctors and nurses
+never use them, and neither does a Flask debug reload. LazyModule stands in
+for a module and imports it on first attribute access. LazyValue does the same
+for an expensive object such as the FaceMesh model. load() forces either
+kind, and prewarm() loads a set of them on a background thread so the first
+patient login doesn't wait.
+"""
+import importlib
+import threading
+import time
+
+
+class LazyModule:
+    """Module proxy: ``cv2 = LazyModule('cv2')`` then use ``cv2`` as usual.
+
+    Every name of its own starts with ``_lazy_`` so none of them can hide an
+    attribute of the real module (numpy.load, for one).
+    """
+
+    def __init__(self, name):
+        self._lazy_name = name
+        self._lazy_module = None
+        self._lazy_lock = threading.Lock()
+
+    def _lazy_load(self):
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    module = importlib.import_module(self._lazy_name)
+                    # Copy the module's names onto the proxy so later lookups skip __getattr__
+                    self.__dict__.update(
+                        (key, value) for key, value in vars(module).items() if not key.startswith('_lazy_')
+                    )
+                    self._lazy_module = module
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        if attr.startswith('_lazy_'):
+            raise AttributeError(attr)
+        return getattr(self._lazy_load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._lazy_module is not None else 'not loaded'
+        return f"<lazy module '{self._lazy_name}' ({state})>"
+
+
+class LazyValue:
+    """Builds ``factory()`` once, on the first get()"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.load_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    started = time.perf_counter()
+                    self._value = self.factory()
+                    self.load_seconds = time.perf_counter() - started
+        return self._value
+
+
+def load(lazy):
+    """Import a LazyModule or build a LazyValue now"""
+    if isinstance(lazy, LazyModule):
+        return lazy._lazy_load()
+    return lazy.get()
+
+
+def prewarm(*lazies):
+    """Load LazyModule/LazyValue objects on a daemon thread; returns the thread"""
+
+    def run():
+        for lazy in lazies:
+            try:
+                load(lazy)
+            except Exception as e:
+                print(f"❌ Pre-warm failed for {lazy!r}: {e}")
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
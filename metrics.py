@@ -0,0 +1,275 @@
+"""Prometheus-style metrics and an on-demand sampling profiler.
+
+MetricsRegistry holds counters and histograms that hot paths update directly,
+plus snapshot collectors: functions such as TrackingMetrics.snapshot that are
+only called when /metrics is scraped, so the subsystems that already keep
+their own numbers cost nothing extra. Row collectors do the same for lists of
+dicts (one per camera worker, say), exporting each row as a labelled series.
+render() produces the Prometheus text
+exposition format.
+
+A registry created with enabled=False hands out no-op metrics and ignores
+collectors, so instrumented code costs one empty method call.
+
+SamplingProfiler records the stacks of every thread a few hundred times a
+second while it is switched on and reports them in the "collapsed" format
+that flamegraph tools read.
+"""
+import bisect
+import math
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return 1 if value else 0
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return value
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ('le',)
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == math.inf else repr(bound)
+                    lines.append(f"{self.name}_bucket{_label_text(names, label_values + (le,))} {cumulative}")
+                labels = _label_text(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _NoopMetric:
+    """Stands in for every metric of a disabled registry"""
+
+    def inc(self, *args):
+        pass
+
+    def observe(self, *args):
+        pass
+
+    @contextmanager
+    def time(self, *args):
+        yield
+
+
+_NOOP = _NoopMetric()
+
+
+class MetricsRegistry:
+    def __init__(self, namespace='', enabled=True):
+        self.namespace = namespace
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = []
+        self._row_collectors = []
+
+    def _name(self, name):
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name, help_text, labels=()):
+        if not self.enabled:
+            return _NOOP
+        metric = Counter(self._name(name), help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        if not self.enabled:
+            return _NOOP
+        metric = Histogram(self._name(name), help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collect_snapshot(self, prefix, snapshot, help_text=''):
+        """Export the numbers in ``snapshot()`` (a possibly nested dict) as gauges at scrape time"""
+        if self.enabled:
+            self._collectors.append((self._name(prefix), snapshot, help_text))
+
+    def collect_rows(self, prefix, rows, labels, help_text=''):
+        """Export the numbers of each dict in ``rows()`` as gauges labelled by its ``labels`` keys"""
+        if self.enabled:
+            self._row_collectors.append((self._name(prefix), rows, tuple(labels), help_text))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, snapshot, help_text in self._collectors:
+            try:
+                values = snapshot()
+            except Exception as e:
+                lines.append(f"# {prefix} unavailable: {e}")
+                continue
+            for name, value in _flatten(prefix, values):
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        for prefix, rows, labels, help_text in self._row_collectors:
+            try:
+                items = rows()
+            except Exception as e:
+                lines.append(f"# {prefix} unavailable: {e}")
+                continue
+            # Every sample of a metric has to follow its one TYPE line
+            series = {}
+            for row in items:
+                label_values = tuple(row.get(label) for label in labels)
+                values = {key: value for key, value in row.items() if key not in labels}
+                for name, value in _flatten(prefix, values):
+                    series.setdefault(name, []).append((label_values, value))
+            for name, samples in series.items():
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for label_values, value in samples:
+                    lines.append(f"{name}{_label_text(labels, label_values)} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _flatten(prefix, value):
+    """(metric name, number) pairs for every numeric leaf of a nested dict"""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            name = f"{prefix}_{key}".replace('.', '_').replace('-', '_')
+            yield from _flatten(name, child)
+    elif isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value)):
+        yield prefix, value
+
+
+class SamplingProfiler:
+    """Samples every thread's stack every ``interval`` seconds while running"""
+
+    def __init__(self, interval=0.005, max_depth=40):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.started_at = None
+        self._stacks = _Tally()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = _Tally()
+            self.samples = 0
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='sampling-profiler')
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                with self._lock:
+                    self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self, limit=None):
+        """'frame;frame;frame count' lines, busiest stacks first"""
+        # Copy under the lock; ranking the live tally would race with the sampler adding stacks
+        with self._lock:
+            stacks = dict(self._stacks)
+        ranked = _Tally(stacks).most_common(limit)
+        return '\n'.join(f"{stack} {count}" for stack, count in ranked) + '\n'
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'samples': self.samples,
+            'interval_ms': self.interval * 1000,
+            'started_at': self.started_at,
+            'distinct_stacks': len(self._stacks)
+        }
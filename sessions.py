@@ -0,0 +1,151 @@
+"""Per-session user state.
+
+app.py used to keep one module-level current_user, so the second person to
+log in took over the first one's dashboard and voice language. Each login now
+gets a UserContext, stored in a SessionRegistry under a random id that is kept
+in the Flask session cookie. A context also owns that user's hands-free
+controllers, so stopping one patient's system leaves everyone else's running.
+
+Browsers that close without logging out never come back for their context,
+so a background thread sweeps out idle ones every ``sweep_interval`` seconds.
+"""
+import secrets
+import threading
+import time
+
+
+class UserContext:
+    """The logged-in user of one browser session and the controllers they started"""
+
+    def __init__(self, session_id, user):
+        self.session_id = session_id
+        self.user = user
+        self.head_tracking_active = False
+        self.voice_control_active = False
+        self.voice_controller = None
+        # The FaceMesh graph of this session's current tracking run (not thread-safe, and it
+        # carries tracking state from frame to frame; the run hands it back when it ends)
+        # and that run's counters
+        self.face_mesh = None
+        self.tracking_metrics = None
+        # Token of the newest head-tracking run; an older run that sees another one here stops
+        self.tracking_run = None
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+
+    @property
+    def username(self):
+        return self.user['username']
+
+    @property
+    def user_type(self):
+        return self.user['type']
+
+    @property
+    def language(self):
+        return self.user.get('language', 'en')
+
+    @property
+    def hands_free_active(self):
+        return self.head_tracking_active or self.voice_control_active
+
+    def stop_hands_free(self):
+        self.head_tracking_active = False
+        self.voice_control_active = False
+        if self.voice_controller is not None:
+            self.voice_controller.stop_voice_control()
+
+
+class SessionRegistry:
+    """Thread-safe map of session id -> UserContext with idle expiry"""
+
+    def __init__(self, idle_timeout=12 * 3600, sweep_interval=300):
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._contexts = {}
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self.logins = 0
+        self.expired = 0
+
+    def create(self, user):
+        """Register a new context for ``user`` and return it"""
+        context = UserContext(secrets.token_urlsafe(16), user)
+        with self._lock:
+            self._contexts[context.session_id] = context
+            self.logins += 1
+            if self._sweeper is None and self.sweep_interval:
+                self._sweeper = threading.Thread(target=self._sweep, daemon=True, name='session-sweeper')
+                self._sweeper.start()
+        return context
+
+    def get(self, session_id):
+        if not session_id:
+            return None
+        now = time.time()
+        with self._lock:
+            context = self._contexts.get(session_id)
+            if context is None:
+                return None
+            if now - context.last_seen > self.idle_timeout and not context.hands_free_active:
+                del self._contexts[session_id]
+                self.expired += 1
+            else:
+                context.last_seen = now
+                return context
+        context.stop_hands_free()
+        return None
+
+    def remove(self, session_id):
+        """Forget a context and stop anything it was running; returns it (or None)"""
+        with self._lock:
+            context = self._contexts.pop(session_id, None)
+        if context is not None:
+            context.stop_hands_free()
+        return context
+
+    def find(self, username):
+        """All live contexts of one user (they may be logged in from several browsers)"""
+        with self._lock:
+            return [c for c in self._contexts.values() if c.username == username]
+
+    def tracking(self):
+        """Contexts whose head tracking runs in this process"""
+        with self._lock:
+            return [c for c in self._contexts.values()
+                    if c.head_tracking_active and c.tracking_metrics is not None]
+
+    def expire_idle(self):
+        """Drop contexts idle for longer than ``idle_timeout``; returns how many"""
+        now = time.time()
+        with self._lock:
+            idle = [sid for sid, c in self._contexts.items()
+                    if now - c.last_seen > self.idle_timeout and not c.hands_free_active]
+            expired = [self._contexts.pop(sid) for sid in idle]
+            self.expired += len(expired)
+        # A voice listener can outlive its flag, so stop whatever the context still holds
+        for context in expired:
+            context.stop_hands_free()
+        return len(expired)
+
+    def _sweep(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.expire_idle()
+            except Exception as e:
+                print(f"❌ Session sweep failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            contexts = list(self._contexts.values())
+            by_type = {}
+            for context in contexts:
+                by_type[context.user_type] = by_type.get(context.user_type, 0) + 1
+            return {
+                'active_sessions': len(contexts),
+                'by_type': by_type,
+                'hands_free_sessions': sum(1 for c in contexts if c.hands_free_active),
+                'logins': self.logins,
+                'expired': self.expired
+            }
@@ -0,0 +1,388 @@
+"""Speech recognition backends.
+
+VoiceController no longer calls recognize_google() directly. It hands audio
+to a SpeechBackend chosen per deployment:
+
+- ``google``  - the cloud recognizer we always used
+- ``vosk``    - offline Kaldi models, one directory per language under model_dir
+- ``whisper`` - offline faster-whisper model (multilingual, loaded once)
+- ``fake``    - deterministic scripted answers for tests and benchmarks
+
+Offline models are loaded once and kept in memory, so only the first
+utterance in a language pays the load time. Every backend records its own
+latency and error counts.
+
+UtterancePipeline moves recognition off the microphone listener thread.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from lazy import LazyModule
+
+# Imported on first use; only servers with patients on hands-free need it
+sr = LazyModule('speech_recognition')
+
+
+class SpeechBackend:
+    name = 'base'
+
+    def __init__(self):
+        self.calls = 0
+        self.no_speech = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    def recognize(self, audio, language_code):
+        """Return the text in ``audio``; raises sr.UnknownValueError / sr.RequestError"""
+        started = time.perf_counter()
+        try:
+            return self._recognize(audio, language_code)
+        except sr.UnknownValueError:
+            with self._lock:
+                self.no_speech += 1
+            raise
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.calls += 1
+                self._latencies.append(time.perf_counter() - started)
+
+    def _recognize(self, audio, language_code):
+        raise NotImplementedError
+
+    def warm(self, language_code):
+        """Load whatever the backend needs for a language ahead of the first utterance"""
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'backend': self.name,
+                'calls': self.calls,
+                'no_speech': self.no_speech,
+                'errors': self.errors
+            }
+        if latencies:
+            stats['avg_ms'] = round(sum(latencies) / len(latencies) * 1000, 1)
+            stats['p95_ms'] = round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1)
+        return stats
+
+
+class GoogleBackend(SpeechBackend):
+    name = 'google'
+
+    def __init__(self, recognizer=None, timeout=10):
+        super().__init__()
+        self.timeout = timeout
+        self._recognizer = recognizer
+
+    @property
+    def recognizer(self):
+        if self._recognizer is None:
+            self._recognizer = sr.Recognizer()
+        # Without a timeout a hung request would hold a worker forever
+        self._recognizer.operation_timeout = self.timeout
+        return self._recognizer
+
+    def _recognize(self, audio, language_code):
+        return self.recognizer.recognize_google(audio, language=language_code)
+
+
+class VoskBackend(SpeechBackend):
+    """Offline recognition with one Vosk model per language (model_dir/<language>)"""
+
+    name = 'vosk'
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_dir='models/vosk'):
+        super().__init__()
+        import vosk
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model_dir = model_dir
+        self._models = {}
+        self._models_lock = threading.Lock()
+
+    def _model(self, language_code):
+        language = language_code.split('-')[0]
+        with self._models_lock:
+            if language not in self._models:
+                path = os.path.join(self.model_dir, language)
+                if not os.path.isdir(path):
+                    raise sr.RequestError(f"No Vosk model for '{language}' in {self.model_dir}")
+                print(f"📦 Loading Vosk model for {language}")
+                self._models[language] = self._vosk.Model(path)
+            return self._models[language]
+
+    def warm(self, language_code):
+        self._model(language_code)
+
+    def _recognize(self, audio, language_code):
+        recognizer = self._vosk.KaldiRecognizer(self._model(language_code), self.SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get('text', '')
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class WhisperBackend(SpeechBackend):
+    """Offline recognition with a single multilingual faster-whisper model"""
+
+    name = 'whisper'
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model='base', device='cpu', compute_type='int8'):
+        super().__init__()
+        self.model_name = model
+        self.device = device
+        self.compute_type = compute_type
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def _load(self):
+        with self._model_lock:
+            if self._model is None:
+                from faster_whisper import WhisperModel
+                print(f"📦 Loading Whisper model '{self.model_name}'")
+                self._model = WhisperModel(self.model_name, device=self.device,
+                                           compute_type=self.compute_type)
+            return self._model
+
+    def warm(self, language_code):
+        self._load()
+
+    def _recognize(self, audio, language_code):
+        import numpy as np
+        raw = audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self._load().transcribe(samples, language=language_code.split('-')[0],
+                                              beam_size=1)
+        text = ' '.join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class FakeBackend(SpeechBackend):
+    """Scripted recognizer: returns ``responses`` in order (None means no speech).
+
+    ``latency`` seconds are slept per call so pipelines can be benchmarked
+    with a predictable recognizer. When the script runs out it starts over.
+    """
+
+    name = 'fake'
+
+    def __init__(self, responses=None, latency=0.0):
+        super().__init__()
+        self.responses = list(responses or [])
+        self.latency = latency
+        self._index = 0
+
+    def _recognize(self, audio, language_code):
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.responses:
+            raise sr.UnknownValueError()
+        with self._lock:
+            response = self.responses[self._index % len(self.responses)]
+            self._index += 1
+        if response is None:
+            raise sr.UnknownValueError()
+        return response
+
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'vosk': VoskBackend,
+    'whisper': WhisperBackend,
+    'fake': FakeBackend
+}
+
+
+def create_backend(name, **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown speech backend '{name}', choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+
+class VoiceMetrics:
+    """Queue and end-to-end (end of speech -> command executed) numbers for the voice pipeline"""
+
+    def __init__(self, window=200):
+        self.submitted = 0
+        self.executed = 0
+        self.dropped_full = 0
+        self.dropped_stale = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.executed += 1
+            self._latencies.append(seconds)
+
+    def set_queue_depth(self, depth):
+        self.queue_depth = depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            snapshot = {
+                'submitted': self.submitted,
+                'executed': self.executed,
+                'dropped_full': self.dropped_full,
+                'dropped_stale': self.dropped_stale,
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth
+            }
+        if latencies:
+            snapshot['speech_to_action_ms'] = {
+                'avg': round(sum(latencies) / len(latencies) * 1000, 1),
+                'p95': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1)
+            }
+        return snapshot
+
+
+class UtterancePipeline:
+    """Runs recognition on a small thread pool and executes commands in the order spoken.
+
+    ``interpret(audio)`` runs on one of ``workers`` threads and returns
+    something to execute (or None). ``execute(result)`` runs on a single
+    executor thread, strictly in the order the utterances arrived. The
+    queue is bounded: when it is full the oldest waiting utterance is
+    dropped, and anything older than ``max_age`` seconds by the time it
+    could run is skipped, since a late "scroll down" only does harm.
+    """
+
+    def __init__(self, interpret, execute, workers=2, queue_size=8, max_age=5.0, metrics=None):
+        self.interpret = interpret
+        self.execute = execute
+        self.workers = workers
+        self.max_age = max_age
+        self.metrics = metrics or VoiceMetrics()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._cond = threading.Condition()
+        self._heard_at = {}
+        self._results = {}
+        self._next_seq = 0
+        self._next_to_run = 0
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        self._running = True
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._run_in_order, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        # Throw away waiting utterances so every worker can receive its stop marker
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in range(self.workers):
+            self._queue.put(None)
+
+    def submit(self, audio):
+        """Queue one utterance; called from the microphone listener thread"""
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            heard_at = time.perf_counter()
+            self._heard_at[seq] = heard_at
+        self.metrics.count('submitted')
+        item = (seq, audio, heard_at)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Make room by dropping the oldest utterance still waiting
+            try:
+                oldest = self._queue.get_nowait()
+                self._resolve(oldest[0], None)
+                self.metrics.count('dropped_full')
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._resolve(seq, None)
+                self.metrics.count('dropped_full')
+        self.metrics.set_queue_depth(self._queue.qsize())
+
+    def _work(self):
+        while self._running:
+            item = self._queue.get()
+            if item is None:
+                break
+            self.metrics.set_queue_depth(self._queue.qsize())
+            seq, audio, heard_at = item
+            if time.perf_counter() - heard_at > self.max_age:
+                self.metrics.count('dropped_stale')
+                self._resolve(seq, None)
+                continue
+            try:
+                result = self.interpret(audio)
+            except Exception as e:
+                print(f"❌ Voice recognition error: {e}")
+                result = None
+            self._resolve(seq, result)
+
+    def _resolve(self, seq, result):
+        with self._cond:
+            # Results for utterances the executor already gave up on are discarded
+            if seq >= self._next_to_run:
+                self._results[seq] = result
+                self._cond.notify_all()
+
+    def _run_in_order(self):
+        while True:
+            with self._cond:
+                while self._running and self._next_to_run not in self._results:
+                    pending = self._next_to_run < self._next_seq
+                    if pending and time.perf_counter() - self._heard_at[self._next_to_run] > self.max_age:
+                        # Recognition for this one is taking too long; don't hold up the rest
+                        self.metrics.count('dropped_stale')
+                        self._heard_at.pop(self._next_to_run)
+                        self._next_to_run += 1
+                        continue
+                    self._cond.wait(timeout=0.25)
+                if not self._running:
+                    return
+                seq = self._next_to_run
+                self._next_to_run += 1
+                result = self._results.pop(seq)
+                heard_at = self._heard_at.pop(seq)
+
+            if result is None:
+                continue
+            if time.perf_counter() - heard_at > self.max_age:
+                self.metrics.count('dropped_stale')
+                continue
+            try:
+                self.execute(result)
+            except Exception as e:
+                print(f"❌ Voice command error: {e}")
+            self.metrics.record_latency(time.perf_counter() - heard_at)
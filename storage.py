@@ -0,0 +1,681 @@
+"""SQLite storage for patient medical records.
+
+Records live in a single ``records`` table (one row per prescription, note or
+vital sign) instead of one big JSON document, so saving a record is a single
+INSERT rather than a rewrite of the whole hospital history. The database runs
+in WAL mode and every thread gets its own connection, which keeps concurrent
+Flask requests from overwriting each other.
+"""
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from vitals import parse_vital_signs
+
+RECORD_TYPES = ('prescriptions', 'doctor_notes', 'vital_signs')
+# Bulk ingest inserts this many records per executemany; export reads this many per query
+INGEST_CHUNK_SIZE = 5000
+EXPORT_PAGE_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    patient_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id TEXT NOT NULL REFERENCES patients(patient_id),
+    kind TEXT NOT NULL,
+    date TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_by_patient ON records (patient_id, kind, id);
+CREATE TABLE IF NOT EXISTS vitals (
+    record_id INTEGER PRIMARY KEY REFERENCES records(id) ON DELETE CASCADE,
+    patient_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    systolic REAL,
+    diastolic REAL,
+    heart_rate REAL,
+    temperature REAL
+);
+CREATE INDEX IF NOT EXISTS vitals_by_patient ON vitals (patient_id, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class IngestError(ValueError):
+    """A bulk ingest line that can't be applied; nothing from its batch is saved"""
+
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+class MedicalStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            # Databases created before the vitals table get it filled from their records
+            if conn.execute('SELECT 1 FROM vitals LIMIT 1').fetchone() is None:
+                rows = conn.execute(
+                    "SELECT id, patient_id, data FROM records WHERE kind = 'vital_signs'"
+                ).fetchall()
+                for record_id, patient_id, raw in rows:
+                    self._insert_vitals(conn, record_id, patient_id, json.loads(raw))
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run a block inside BEGIN IMMEDIATE so writers queue instead of racing"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    @contextmanager
+    def _read(self):
+        """Run several SELECTs against one consistent snapshot of the database"""
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        finally:
+            conn.execute('COMMIT')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def is_empty(self):
+        row = self._connect().execute('SELECT 1 FROM patients LIMIT 1').fetchone()
+        return row is None
+
+    def has_patient(self, patient_id):
+        row = self._connect().execute(
+            'SELECT 1 FROM patients WHERE patient_id = ?', (patient_id,)
+        ).fetchone()
+        return row is not None
+
+    def add_patient(self, patient_id):
+        with self._transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO patients (patient_id) VALUES (?)', (patient_id,))
+
+    def append_record(self, patient_id, kind, record):
+        """Insert one record for a patient; returns its id, or None if the patient is unknown"""
+        if kind not in RECORD_TYPES:
+            raise ValueError(f"Unknown record type: {kind}")
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'INSERT INTO records (patient_id, kind, date, data) '
+                'SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM patients WHERE patient_id = ?)',
+                (patient_id, kind, record.get('date', ''), json.dumps(record), patient_id)
+            )
+            if cursor.rowcount == 0:
+                return None
+            if kind == 'vital_signs':
+                self._insert_vitals(conn, cursor.lastrowid, patient_id, record)
+            return cursor.lastrowid
+
+    @staticmethod
+    def _insert_vitals(conn, record_id, patient_id, record):
+        """Typed copy of a vital_signs record for trend queries (skipped if its date is unreadable)"""
+        parsed = parse_vital_signs(record)
+        if parsed is None:
+            return
+        # SQLite stores NaN as NULL
+        conn.execute(
+            'INSERT OR REPLACE INTO vitals (record_id, patient_id, ts, systolic, diastolic, '
+            'heart_rate, temperature) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (record_id, patient_id) + parsed
+        )
+
+    def vitals_rows(self, patient_id, after_record_id=0):
+        """(record_id, ts, systolic, diastolic, heart_rate, temperature) rows in time order"""
+        rows = self._connect().execute(
+            'SELECT record_id, ts, systolic, diastolic, heart_rate, temperature FROM vitals '
+            'WHERE patient_id = ? AND record_id > ? ORDER BY ts, record_id',
+            (patient_id, after_record_id)
+        ).fetchall()
+        nan = float('nan')
+        return [row[:2] + tuple(nan if v is None else v for v in row[2:]) for row in rows]
+
+    def version(self):
+        """Return (generation, last record id); changes whenever the data does"""
+        return self._version(self._connect())
+
+    def _version(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        generation = row[0] if row else 0
+        last_id = conn.execute('SELECT MAX(id) FROM records').fetchone()[0] or 0
+        return generation, last_id
+
+    def snapshot(self):
+        """Return the full data together with the version it was read at"""
+        with self._read() as conn:
+            return {'version': self._version(conn), 'data': self._load_all(conn)}
+
+    def _load_all(self, conn):
+        """Rebuild the legacy {patient_id: {record_type: [records]}} structure"""
+        data = {}
+        for (patient_id,) in conn.execute('SELECT patient_id FROM patients ORDER BY rowid'):
+            data[patient_id] = {kind: [] for kind in RECORD_TYPES}
+        for patient_id, kind, raw in conn.execute(
+                'SELECT patient_id, kind, data FROM records ORDER BY id'):
+            data[patient_id].setdefault(kind, []).append(json.loads(raw))
+        return data
+
+    def query_records(self, patient_ids=None, kinds=None, date_from=None, date_to=None,
+                      after_id=0, limit=100):
+        """Return up to ``limit`` matching records with an id greater than ``after_id``.
+
+        Records come back in insertion order as (id, patient_id, kind, record)
+        tuples, along with the version they were read at and whether more
+        matching records remain.
+        """
+        clauses, params = self._record_filter(patient_ids, kinds, date_from, date_to)
+        clauses.insert(0, 'id > ?')
+        params.insert(0, after_id)
+        sql = (
+            'SELECT id, patient_id, kind, data FROM records WHERE '
+            + ' AND '.join(clauses)
+            + ' ORDER BY id LIMIT ?'
+        )
+        with self._read() as conn:
+            version = self._version(conn)
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+        has_more = len(rows) > limit
+        records = [
+            (record_id, patient_id, kind, json.loads(raw))
+            for record_id, patient_id, kind, raw in rows[:limit]
+        ]
+        return {'version': version, 'records': records, 'has_more': has_more}
+
+    def iter_records(self, patient_ids=None, kinds=None, date_from=None, date_to=None,
+                     after_id=0, until_id=None, page_size=EXPORT_PAGE_SIZE):
+        """Yield matching (id, patient_id, kind, raw JSON) rows one page at a time.
+
+        Only one page is in memory and no read transaction is held between
+        pages. Stops at ``until_id`` (by default the last record when iteration
+        starts), so records added meanwhile are left for the next export.
+        """
+        clauses, params = self._record_filter(patient_ids, kinds, date_from, date_to)
+        sql = (
+            'SELECT id, patient_id, kind, data FROM records WHERE '
+            + ' AND '.join(['id > ?', 'id <= ?'] + clauses)
+            + ' ORDER BY id LIMIT ?'
+        )
+        conn = self._connect()
+        if until_id is None:
+            until_id = self._version(conn)[1]
+        while True:
+            rows = conn.execute(sql, [after_id, until_id] + params + [page_size]).fetchall()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after_id = rows[-1][0]
+
+    def export_ndjson(self, page_size=EXPORT_PAGE_SIZE, **filters):
+        """Yield the matching records as NDJSON, in the format ingest() reads.
+
+        Each chunk holds the lines of up to ``page_size`` records, so a streamed
+        response isn't paying the WSGI overhead once per record.
+        """
+        lines = []
+        for record_id, patient_id, kind, raw in self.iter_records(page_size=page_size, **filters):
+            # The stored data is already JSON, so it goes out without a decode/encode round trip
+            lines.append(f'{{"id": {record_id}, "patient_id": {json.dumps(patient_id)}, '
+                         f'"type": "{kind}", "record": {raw}}}\n')
+            if len(lines) >= page_size:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    @staticmethod
+    def _record_filter(patient_ids, kinds, date_from, date_to):
+        """WHERE clauses and parameters shared by the record queries"""
+        clauses = []
+        params = []
+        if patient_ids:
+            clauses.append(f"patient_id IN ({', '.join('?' * len(patient_ids))})")
+            params.extend(patient_ids)
+        if kinds:
+            clauses.append(f"kind IN ({', '.join('?' * len(kinds))})")
+            params.extend(kinds)
+        if date_from:
+            clauses.append('date >= ?')
+            params.append(date_from)
+        if date_to:
+            clauses.append('date <= ?')
+            params.append(date_to)
+        return clauses, params
+
+    def replace_all(self, data):
+        """Replace every patient and record with the contents of a legacy dict"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM vitals')
+            conn.execute('DELETE FROM records')
+            conn.execute('DELETE FROM patients')
+            # Bump the generation so change cursors from before the rewrite are rejected
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+            self._insert_dict(conn, data)
+
+    def import_data(self, data):
+        """Add the patients and records of a legacy dict; returns the number of records"""
+        with self._transaction() as conn:
+            return self._insert_dict(conn, data)
+
+    def ingest(self, entries, create_patients=False, max_records=None):
+        """Add a batch of records in one transaction; returns the count per record type.
+
+        ``entries`` yields (line, patient_id, kind, record) tuples, as
+        parse_ndjson does. Either the whole batch is saved or, on the first bad
+        entry, none of it and an IngestError names the line. Unknown patients
+        are an error unless ``create_patients`` is set.
+
+        ``entries`` may be a slow upload, so it is read, checked and spooled to
+        a temporary file first. The write lock is only taken for the inserts,
+        and saves from other requests never wait on the client.
+        """
+        counts = dict.fromkeys(RECORD_TYPES, 0)
+        with self._read() as conn:
+            known = {patient_id for (patient_id,) in conn.execute('SELECT patient_id FROM patients')}
+        # First line naming each patient, to report a patient that disappears before the inserts
+        referenced = {}
+        with tempfile.TemporaryFile() as spool:
+            rows = []
+            total = 0
+            chunks = 0
+            for line, patient_id, kind, record in entries:
+                if kind not in RECORD_TYPES:
+                    raise IngestError(line, f"Unknown record type: {kind}")
+                if patient_id not in known and not create_patients:
+                    raise IngestError(line, f"Unknown patient: {patient_id}")
+                referenced.setdefault(patient_id, line)
+                total += 1
+                if max_records is not None and total > max_records:
+                    raise IngestError(line, f"Batch has more than {max_records} records, split it up")
+                date = record.get('date', '')
+                if not isinstance(date, str):
+                    raise IngestError(line, "'date' must be a string like 'YYYY-MM-DD HH:MM'")
+                parsed = parse_vital_signs(record) if kind == 'vital_signs' else None
+                rows.append((patient_id, kind, date, json.dumps(record), parsed))
+                counts[kind] += 1
+                if len(rows) >= INGEST_CHUNK_SIZE:
+                    pickle.dump(rows, spool, pickle.HIGHEST_PROTOCOL)
+                    chunks += 1
+                    rows = []
+            if rows:
+                pickle.dump(rows, spool, pickle.HIGHEST_PROTOCOL)
+                chunks += 1
+            spool.seek(0)
+
+            with self._transaction() as conn:
+                known = {patient_id for (patient_id,) in conn.execute('SELECT patient_id FROM patients')}
+                missing = [patient_id for patient_id in referenced if patient_id not in known]
+                if missing and not create_patients:
+                    raise IngestError(referenced[missing[0]], f"Unknown patient: {missing[0]}")
+                conn.executemany('INSERT INTO patients (patient_id) VALUES (?)',
+                                 [(patient_id,) for patient_id in missing])
+                # We hold the write lock, so the next AUTOINCREMENT ids are ours to hand out.
+                # Knowing them up front lets the vitals rows go in with executemany too.
+                row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'records'").fetchone()
+                next_id = (row[0] if row else 0) + 1
+                for _ in range(chunks):
+                    records = []
+                    vitals = []
+                    for patient_id, kind, date, data, parsed in pickle.load(spool):
+                        records.append((next_id, patient_id, kind, date, data))
+                        if parsed is not None:
+                            vitals.append((next_id, patient_id) + parsed)
+                        next_id += 1
+                    self._insert_rows(conn, records, vitals)
+        return counts
+
+    @staticmethod
+    def _insert_rows(conn, records, vitals):
+        """Write out and clear the rows buffered by ingest()"""
+        conn.executemany('INSERT INTO records (id, patient_id, kind, date, data) VALUES (?, ?, ?, ?, ?)', records)
+        conn.executemany(
+            'INSERT INTO vitals (record_id, patient_id, ts, systolic, diastolic, '
+            'heart_rate, temperature) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            vitals
+        )
+        records.clear()
+        vitals.clear()
+
+    def _insert_dict(self, conn, data):
+        count = 0
+        for patient_id, patient in data.items():
+            conn.execute('INSERT OR IGNORE INTO patients (patient_id) VALUES (?)', (patient_id,))
+            for kind in RECORD_TYPES:
+                rows = [
+                    (patient_id, kind, record.get('date', ''), json.dumps(record))
+                    for record in patient.get(kind, [])
+                ]
+                if kind == 'vital_signs':
+                    # Needs each record id for the typed vitals row
+                    for row, record in zip(rows, patient.get(kind, [])):
+                        cursor = conn.execute(
+                            'INSERT INTO records (patient_id, kind, date, data) VALUES (?, ?, ?, ?)', row
+                        )
+                        self._insert_vitals(conn, cursor.lastrowid, patient_id, record)
+                else:
+                    conn.executemany(
+                        'INSERT INTO records (patient_id, kind, date, data) VALUES (?, ?, ?, ?)',
+                        rows
+                    )
+                count += len(rows)
+        return count
+
+
+
+class ReadCache:
+    """Keeps a parsed copy of file-backed data in memory until it changes.
+
+    The files are stat()ed at most once per ``recheck_interval`` seconds to
+    notice external edits (mtime/size); writes made by this process call
+    ``store()`` or ``invalidate()`` so they are seen immediately. The cached
+    object is shared between requests, so treat it as read-only unless you
+    save it back.
+    """
+
+    def __init__(self, loader, paths, recheck_interval=1.0):
+        self.loader = loader
+        self.paths = list(paths)
+        self.recheck_interval = recheck_interval
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._value = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def _file_signature(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._value is not None:
+                if now - self._checked_at < self.recheck_interval:
+                    self.hits += 1
+                    return self._value
+                self._checked_at = now
+                if self._file_signature() == self._signature:
+                    self.hits += 1
+                    return self._value
+                self.invalidations += 1
+            self.misses += 1
+            # Take the signature before loading so a write racing the load
+            # is picked up on the next check instead of being missed
+            self._signature = self._file_signature()
+            self._checked_at = now
+            self._value = self.loader()
+            return self._value
+
+    def store(self, value):
+        """Replace the cached value after this process has written it to disk"""
+        with self._lock:
+            self._value = value
+            self._signature = self._file_signature()
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            if self._value is not None:
+                self.invalidations += 1
+            self._value = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class DeferredWriter:
+    """Write-behind buffer for a file that is saved as a whole.
+
+    ``schedule(value)`` marks the data dirty; a background thread calls
+    ``write(value)`` once ``delay`` seconds after the first unsaved change,
+    so a burst of updates costs a single write. ``write_now()`` is for
+    changes that must be on disk before the caller answers (it also covers
+    anything pending), and ``close()`` flushes on shutdown. A failed
+    background write stays pending and is retried after another ``delay``.
+    """
+
+    def __init__(self, write, delay=2.0):
+        self.write = write
+        self.delay = delay
+        self.scheduled = 0
+        self.deferred_writes = 0
+        self.immediate_writes = 0
+        self.failures = 0
+        self.last_write_ms = None
+        self._pending = None
+        self._due = None
+        self._closed = False
+        self._thread = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+
+    def schedule(self, value):
+        with self._cond:
+            self.scheduled += 1
+            self._pending = value
+            if self._due is None:
+                self._due = time.monotonic() + self.delay
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def write_now(self, value):
+        with self._cond:
+            self._pending = None
+            self._due = None
+        self._write(value)
+        self.immediate_writes += 1
+
+    def flush(self):
+        """Write pending changes now; returns True if there were any"""
+        with self._cond:
+            value = self._pending
+            self._pending = None
+            self._due = None
+        if value is None:
+            return False
+        self._write(value)
+        self.deferred_writes += 1
+        return True
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def _write(self, value):
+        with self._write_lock:
+            started = time.perf_counter()
+            self.write(value)
+            self.last_write_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and (self._due is None or time.monotonic() < self._due):
+                    self._cond.wait(None if self._due is None else self._due - time.monotonic())
+                if self._closed:
+                    return
+                value = self._pending
+                self._pending = None
+                self._due = None
+            try:
+                self._write(value)
+                self.deferred_writes += 1
+            except Exception as e:
+                print(f"❌ Deferred write failed, will retry: {e}")
+                with self._cond:
+                    self.failures += 1
+                    if self._pending is None:
+                        self._pending = value
+                    if self._due is None:
+                        self._due = time.monotonic() + self.delay
+
+    def stats(self):
+        with self._cond:
+            pending = self._pending is not None
+        writes = self.deferred_writes + self.immediate_writes
+        return {
+            'scheduled': self.scheduled,
+            'deferred_writes': self.deferred_writes,
+            'immediate_writes': self.immediate_writes,
+            'updates_coalesced': max(0, self.scheduled - self.deferred_writes - pending),
+            'writes': writes,
+            'failures': self.failures,
+            'pending': pending,
+            'last_write_ms': self.last_write_ms
+        }
+
+def parse_ndjson(lines):
+    """(line, patient_id, kind, record) for each line of an NDJSON record stream.
+
+    Every line is {"patient_id": ..., "type": ..., "record": {...}}, the format
+    export_ndjson writes (its "id" is ignored). Blank lines are skipped.
+    """
+    for line, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            if isinstance(text, bytes):
+                # json.loads would sniff the encoding of every line
+                text = text.decode('utf-8')
+            entry = json.loads(text)
+        except ValueError:
+            raise IngestError(line, 'Not valid JSON') from None
+        if not isinstance(entry, dict):
+            raise IngestError(line, 'Expected a JSON object')
+        patient_id = entry.get('patient_id')
+        record = entry.get('record')
+        if not isinstance(patient_id, str) or not patient_id:
+            raise IngestError(line, "Missing 'patient_id'")
+        if not isinstance(record, dict):
+            raise IngestError(line, "'record' must be an object")
+        yield line, patient_id, entry.get('type'), record
+
+
+def migrate_medical_json(json_path, db_path):
+    """One-shot import of an existing medical_data.json file into a SQLite store"""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    store = MedicalStore(db_path)
+    try:
+        if not store.is_empty():
+            raise RuntimeError(f"{db_path} already contains medical records")
+        return store.import_data(data)
+    finally:
+        store.close()
+
+
+USAGE = """Usage:
+  python storage.py migrate [medical_data.json] [medical_data.db]
+  python storage.py import records.ndjson [medical_data.db] [--create-patients]
+  python storage.py export [medical_data.db] > records.ndjson"""
+
+
+def import_ndjson_file(path, db_path, create_patients=False):
+    store = MedicalStore(db_path)
+    try:
+        with open(path, 'rb') as f:
+            return store.ingest(parse_ndjson(f), create_patients=create_patients)
+    finally:
+        store.close()
+
+
+def export_ndjson_file(db_path, out):
+    store = MedicalStore(db_path)
+    try:
+        count = 0
+        for chunk in store.export_ndjson():
+            out.write(chunk)
+            # json.dumps escapes newlines, so there is exactly one per record
+            count += chunk.count('\n')
+        return count
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    command = args[0] if args else None
+    if command == 'import' and len(args) > 1:
+        db_path = args[2] if len(args) > 2 else 'medical_data.db'
+        try:
+            counts = import_ndjson_file(args[1], db_path, '--create-patients' in sys.argv)
+        except IngestError as e:
+            print(f"❌ {e}; nothing was imported")
+            sys.exit(1)
+        print(f"✅ Imported {sum(counts.values())} records into {db_path}: "
+              + ', '.join(f"{count} {kind}" for kind, count in counts.items()))
+        sys.exit(0)
+    if command == 'export':
+        db_path = args[1] if len(args) > 1 else 'medical_data.db'
+        exported = export_ndjson_file(db_path, sys.stdout)
+        print(f"✅ Exported {exported} records from {db_path}", file=sys.stderr)
+        sys.exit(0)
+    if command != 'migrate':
+        print(USAGE)
+        sys.exit(1)
+    json_path = args[1] if len(args) > 1 else 'medical_data.json'
+    db_path = args[2] if len(args) > 2 else 'medical_data.db'
+    if not os.path.exists(json_path):
+        print(f"❌ {json_path} not found")
+        sys.exit(1)
+    migrated = migrate_medical_json(json_path, db_path)
+    print(f"✅ Migrated {migrated} records from {json_path} to {db_path}")
@@ -0,0 +1,26 @@
+import threading
+
+import pytest
+
+from auth import LoginBusy, PasswordHasher
+
+
+def test_slow_hash_is_busy_and_keeps_its_slot():
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_pending=1, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(LoginBusy):
+        hasher._run(release.wait, 5)
+    assert hasher.stats()['timed_out'] == 1
+    # The first hash still runs, so its slot is not free for another login yet
+    with pytest.raises(LoginBusy):
+        hasher.verify(None, 'secret')
+    release.set()
+    hasher._executor.submit(lambda: None).result(5)
+    assert hasher.verify(None, 'secret') == (False, None)
+
+
+def test_plaintext_password_is_migrated():
+    hasher = PasswordHasher('pbkdf2:sha256:1000')
+    ok, new_hash = hasher.verify('123', '123')
+    assert ok and new_hash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(new_hash, '123') == (True, None)
@@ -0,0 +1,74 @@
+import numpy as np
+
+from tracking import EYE_LANDMARKS, BlinkDetector, eye_aspect_ratios
+
+FRAME = 1 / 30
+
+
+def warmed_up(**options):
+    detector = BlinkDetector(**options)
+    for i in range(detector.warmup_frames):
+        detector.update(0.3, i * FRAME)
+    return detector, detector.warmup_frames * FRAME
+
+
+def close_eyes(detector, now, seconds, ear=0.1):
+    """Closed readings for ``seconds``, then one open reading; returns (blinked, time)"""
+    frames = max(1, round(seconds / FRAME))
+    for i in range(frames):
+        assert not detector.update(ear, now + i * FRAME)
+    now += frames * FRAME
+    return detector.update(0.3, now), now + FRAME
+
+
+def test_warmup_learns_the_open_eye_baseline():
+    detector, _ = warmed_up()
+    assert abs(detector.baseline - 0.3) < 1e-9
+    assert abs(detector.threshold - 0.21) < 1e-9
+
+
+def test_short_closure_is_a_blink():
+    detector, now = warmed_up()
+    blinked, _ = close_eyes(detector, now, 0.15)
+    assert blinked
+
+
+def test_dip_above_the_threshold_is_not_a_blink():
+    detector, now = warmed_up()
+    blinked, _ = close_eyes(detector, now, 0.15, ear=0.22)
+    assert not blinked
+    assert detector.state == BlinkDetector.OPEN
+
+
+def test_eyes_stay_closed_until_above_the_reopen_ratio():
+    detector, now = warmed_up()
+    detector.update(0.1, now)
+    # Between close_ratio and reopen_ratio of the baseline: still closed
+    assert not detector.update(0.24, now + FRAME)
+    assert detector.state == BlinkDetector.CLOSED
+    assert detector.update(0.27, now + 5 * FRAME)
+
+
+def test_long_closure_is_ignored():
+    detector, now = warmed_up()
+    blinked, _ = close_eyes(detector, now, 1.0)
+    assert not blinked
+
+
+def test_second_blink_inside_the_refractory_period_is_ignored():
+    detector, now = warmed_up(refractory=0.4)
+    blinked, now = close_eyes(detector, now, 0.1)
+    assert blinked
+    blinked, now = close_eyes(detector, now, 0.1)
+    assert not blinked
+    blinked, _ = close_eyes(detector, now + 0.4, 0.1)
+    assert blinked
+
+
+def test_eye_aspect_ratio_of_an_open_eye():
+    landmarks = np.zeros((478, 2))
+    for eye in EYE_LANDMARKS:
+        # Corners 0.4 apart, lids 0.1 apart
+        landmarks[eye] = [(0.0, 0.5), (0.1, 0.45), (0.3, 0.45), (0.4, 0.5), (0.3, 0.55), (0.1, 0.55)]
+    ratios = eye_aspect_ratios(landmarks, 100, 100)
+    assert np.allclose(ratios, 0.25)
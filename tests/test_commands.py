@@ -0,0 +1,64 @@
+import pytest
+
+from commands import CommandMatcher
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return CommandMatcher()
+
+
+def action(matcher, text, language='en'):
+    match = matcher.match(text, language)
+    return match.action if match else None
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('down', 'scroll_down'),
+    ('Go up!', 'scroll_up'),
+    ('scroll down please', 'scroll_down'),
+    ('shut down', None),
+    ('turn it down', None),
+    ('sit me up', None),
+    ('down world', None),
+])
+def test_bare_directions_scroll_only_as_the_whole_utterance(matcher, text, expected):
+    assert action(matcher, text) == expected
+
+
+@pytest.mark.parametrize('text, language, expected', [
+    ('desplazar abajo', 'es', 'scroll_down'),
+    ('abajo', 'es', 'scroll_down'),
+    ('mira abajo', 'es', None),
+    ('clic droit', 'fr', 'right_click'),
+    ('öffne chrome', 'de', 'open_chrome'),
+    ('прокрути вверх', 'ru', 'scroll_up'),
+    ('افتح المتصفح', 'ar', 'open_chrome'),
+    ('请向下滚动', 'zh', 'scroll_down'),
+    ('向下', 'zh', 'scroll_down'),
+    ('メモ帳を開いてください', 'ja', 'open_notepad'),
+    ('click', 'xx', None),
+])
+def test_each_language_matches_its_own_phrases(matcher, text, language, expected):
+    assert action(matcher, text, language) == expected
+
+
+def test_longest_phrase_wins_at_the_same_word(matcher):
+    assert action(matcher, 'double click') == 'double_click'
+    assert action(matcher, 'right click here') == 'right_click'
+
+
+def test_leftmost_phrase_wins(matcher):
+    assert action(matcher, 'click then stop') == 'click'
+    assert action(matcher, 'stop then click') == 'stop'
+
+
+def test_words_only_match_whole_tokens(matcher):
+    assert action(matcher, 'center the window') is None
+    assert action(matcher, 'typewriter') is None
+
+
+def test_slot_keeps_the_rest_of_the_utterance(matcher):
+    match = matcher.match('please type Hello World')
+    assert (match.action, match.text, match.phrase) == ('type', 'hello world', 'type <text>')
+    assert matcher.match('输入 你好', 'zh').text == '你好'
@@ -0,0 +1,71 @@
+import queue
+
+from events import RESYNC, EventBroker
+
+
+def drain(subscription):
+    items = []
+    while True:
+        try:
+            items.append(subscription.queue.get_nowait())
+        except queue.Empty:
+            return items
+
+
+def ids(items):
+    return [item if item is RESYNC else item['id'] for item in items]
+
+
+def test_reconnect_replays_events_after_last_event_id():
+    broker = EventBroker()
+    for n in range(5):
+        broker.publish('vital_signs', {'patient_id': 'P001', 'n': n})
+    subscription = broker.subscribe(last_event_id=3)
+    assert ids(drain(subscription)) == [4, 5]
+
+
+def test_replay_only_sends_what_the_client_subscribed_to():
+    broker = EventBroker()
+    broker.publish('vital_signs', {'patient_id': 'P001'})
+    broker.publish('prescriptions', {'patient_id': 'P001'})
+    broker.publish('vital_signs', {'patient_id': 'P002'})
+    subscription = broker.subscribe(topics=['vital_signs'], match={'patient_id': 'P002'}, last_event_id=0)
+    assert ids(drain(subscription)) == [3]
+
+
+def test_gap_older_than_the_history_asks_for_a_resync():
+    broker = EventBroker(history_size=3)
+    for n in range(6):
+        broker.publish('vital_signs', {'n': n})
+    subscription = broker.subscribe(last_event_id=1)
+    assert ids(drain(subscription)) == [RESYNC, 4, 5, 6]
+
+
+def test_caught_up_client_gets_no_resync():
+    broker = EventBroker(history_size=3)
+    for n in range(6):
+        broker.publish('vital_signs', {'n': n})
+    assert drain(broker.subscribe(last_event_id=6)) == []
+    assert ids(drain(broker.subscribe(last_event_id=3))) == [4, 5, 6]
+
+
+def test_slow_client_is_cleared_and_told_to_resync():
+    broker = EventBroker(queue_size=3)
+    subscription = broker.subscribe()
+    for n in range(5):
+        broker.publish('vital_signs', {'n': n})
+    assert ids(drain(subscription)) == [RESYNC, 5]
+    assert broker.stats()['dropped'] == 1
+
+
+def test_stream_formats_events_and_resyncs():
+    broker = EventBroker()
+    subscription = broker.subscribe()
+    broker.publish('prescriptions', {'patient_id': 'P001'})
+    broker.resync()
+    stream = broker.stream(subscription)
+    assert next(stream) == 'retry: 3000\n\n'
+    assert next(stream) == 'id: 1\nevent: prescriptions\ndata: {"patient_id": "P001"}\n\n'
+    assert next(stream) == 'event: resync\ndata: {}\n\n'
+    stream.close()
+    assert broker.stats()['clients'] == 0
@@ -0,0 +1,45 @@
+import time
+
+from sessions import SessionRegistry
+
+
+class FakeVoiceController:
+    def __init__(self):
+        self.stopped = False
+
+    def stop_voice_control(self):
+        self.stopped = True
+
+
+def patient(username='john'):
+    return {'username': username, 'type': 'patients', 'patient_id': 'P001'}
+
+
+def test_sweeper_drops_abandoned_sessions():
+    registry = SessionRegistry(idle_timeout=0.05, sweep_interval=0.05)
+    context = registry.create(patient())
+    controller = context.voice_controller = FakeVoiceController()
+    deadline = time.time() + 5
+    while registry.stats()['active_sessions'] and time.time() < deadline:
+        time.sleep(0.02)
+    stats = registry.stats()
+    assert stats['active_sessions'] == 0 and stats['expired'] == 1
+    assert controller.stopped
+
+
+def test_hands_free_sessions_are_kept():
+    registry = SessionRegistry(idle_timeout=0.01, sweep_interval=0)
+    context = registry.create(patient())
+    context.head_tracking_active = True
+    time.sleep(0.02)
+    assert registry.expire_idle() == 0
+    assert registry.get(context.session_id) is context
+
+
+def test_expired_context_is_not_returned():
+    registry = SessionRegistry(idle_timeout=0.01, sweep_interval=0)
+    context = registry.create(patient())
+    controller = context.voice_controller = FakeVoiceController()
+    time.sleep(0.02)
+    assert registry.get(context.session_id) is None
+    assert controller.stopped
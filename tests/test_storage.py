@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from storage import DeferredWriter, IngestError, MedicalStore
+
+
+def vitals(date='2024-05-01 08:00'):
+    return {'blood_pressure': '120/80', 'heart_rate': '72', 'temperature': '36.8', 'date': date}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MedicalStore(str(tmp_path / 'medical_data.db'))
+    store.add_patient('P001')
+    yield store
+    store.close()
+
+
+def test_stalled_upload_does_not_block_saves(store):
+    uploading = threading.Event()
+    resume = threading.Event()
+
+    def slow_upload():
+        yield 1, 'P001', 'vital_signs', vitals()
+        uploading.set()
+        # A client that stops sending halfway through its body
+        resume.wait(10)
+        yield 2, 'P001', 'vital_signs', vitals('2024-05-01 09:00')
+
+    result = {}
+    importer = threading.Thread(target=lambda: result.update(store.ingest(slow_upload())))
+    importer.start()
+    try:
+        assert uploading.wait(5)
+        started = time.perf_counter()
+        store.append_record('P001', 'prescriptions', {'medication': 'Drug', 'date': '2024-05-01 08:30'})
+        assert time.perf_counter() - started < 1.0
+    finally:
+        resume.set()
+        importer.join(10)
+    assert result['vital_signs'] == 2
+    assert len(store.vitals_rows('P001')) == 2
+
+
+def test_ingest_is_all_or_nothing(store):
+    entries = [(1, 'P001', 'vital_signs', vitals()), (2, 'P999', 'vital_signs', vitals())]
+    with pytest.raises(IngestError) as error:
+        store.ingest(iter(entries))
+    assert error.value.line == 2
+    assert store.vitals_rows('P001') == []
+
+
+def test_ingest_creates_patients_when_asked(store):
+    counts = store.ingest(iter([(1, 'P002', 'prescriptions', {'medication': 'Drug', 'date': ''})]),
+                          create_patients=True)
+    assert counts['prescriptions'] == 1
+    assert store.has_patient('P002')
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_burst_of_changes_is_one_write():
+    written = []
+    writer = DeferredWriter(written.append, delay=0.05)
+    for value in range(10):
+        writer.schedule(value)
+    assert written == []
+    assert wait_until(lambda: written)
+    time.sleep(0.1)
+    assert written == [9]
+    assert writer.stats()['updates_coalesced'] == 9
+
+
+def test_write_now_replaces_pending_changes():
+    written = []
+    writer = DeferredWriter(written.append, delay=0.05)
+    writer.schedule('preference')
+    writer.write_now('account')
+    time.sleep(0.15)
+    assert written == ['account']
+
+
+def test_failed_write_is_retried():
+    written = []
+
+    def flaky(value):
+        if not written:
+            written.append(None)
+            raise OSError('disk full')
+        written.append(value)
+
+    writer = DeferredWriter(flaky, delay=0.05)
+    writer.schedule('data')
+    assert wait_until(lambda: len(written) == 2)
+    assert written[1] == 'data' and writer.stats()['failures'] == 1
+
+
+def test_close_writes_pending_changes():
+    written = []
+    writer = DeferredWriter(written.append, delay=60)
+    writer.schedule('data')
+    writer.close()
+    assert written == ['data']
+    assert not writer.flush()
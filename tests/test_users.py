@@ -0,0 +1,58 @@
+import json
+import threading
+
+import pytest
+
+from users import META_KEY, UserDirectory
+
+
+def directory(**patients):
+    return UserDirectory({'patients': patients, 'doctors': {'drsmith': {'name': 'Dr. Smith'}}})
+
+
+def test_lookup_finds_every_role():
+    users = directory(john={'patient_id': 'P001'})
+    assert users.lookup('drsmith') == ('doctors', {'name': 'Dr. Smith'})
+    assert users.lookup('nobody') == (None, None)
+    assert 'john' in users and len(users) == 2
+
+
+def test_duplicate_username_is_refused_across_roles():
+    users = directory(john={'patient_id': 'P001'})
+    assert not users.add('drsmith', 'patients', {'name': 'Another Smith'})
+    assert not users.add('john', 'nurses', {'name': 'John'})
+    assert users.lookup('drsmith')[0] == 'doctors'
+
+
+def test_unknown_role_is_an_error():
+    with pytest.raises(ValueError):
+        directory().add('x', 'admins', {})
+
+
+def test_patient_ids_continue_past_the_highest_in_the_file():
+    users = directory(john={'patient_id': 'P001'}, sarah={'patient_id': 'P007'})
+    users.add('ali', 'patients', {})
+    assert users.lookup('ali')[1]['patient_id'] == 'P008'
+
+
+def test_patient_ids_are_not_reused_after_a_deletion():
+    users = directory()
+    users.add('john', 'patients', {})
+    users.add('sarah', 'patients', {})
+    data = json.loads(users.dumps())
+    del data['patients']['sarah']
+    reloaded = UserDirectory(data)
+    reloaded.add('ali', 'patients', {})
+    assert reloaded.lookup('ali')[1]['patient_id'] == 'P003'
+    assert data[META_KEY]['next_patient_number'] == 4
+
+
+def test_concurrent_signups_get_distinct_ids():
+    users = directory()
+    threads = [threading.Thread(target=users.add, args=(f"patient{i}", 'patients', {})) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ids = [users.lookup(f"patient{i}")[1]['patient_id'] for i in range(50)]
+    assert sorted(ids) == [f"P{n:03d}" for n in range(1, 51)]
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from vad import VoiceActivityDetector
+
+RATE = 16000
+
+
+def seconds(duration):
+    return np.arange(int(RATE * duration)) / RATE
+
+
+def voice(duration=0.8):
+    """Harmonics of a gliding pitch shaped by two moving formants"""
+    time = seconds(duration)
+    pitch = np.linspace(110, 180, len(time)) + 10 * np.sin(2 * np.pi * 3 * time)
+    phase = 2 * np.pi * np.cumsum(pitch) / RATE
+    first = np.linspace(700, 300, len(time))
+    second = np.linspace(1100, 2200, len(time))
+    signal = np.zeros(len(time))
+    for harmonic in range(1, 30):
+        frequency = harmonic * pitch
+        gain = (np.exp(-((frequency - first) / 150) ** 2)
+                + 0.6 * np.exp(-((frequency - second) / 200) ** 2) + 0.05)
+        signal += gain * np.sin(harmonic * phase)
+    return 6000 * signal / np.abs(signal).max()
+
+
+def beep(duration=0.8):
+    return 8000 * np.sin(2 * np.pi * 1000 * seconds(duration))
+
+
+def square_alarm(duration=0.8):
+    return 6000 * np.sign(np.sin(2 * np.pi * 1000 * seconds(duration)))
+
+
+def fan(duration=0.8):
+    return 3000 * np.random.default_rng(2).standard_normal(int(RATE * duration))
+
+
+def hum(duration=0.8):
+    return 8000 * np.sin(2 * np.pi * 50 * seconds(duration))
+
+
+def silence(duration=0.8):
+    return np.zeros(int(RATE * duration))
+
+
+def in_room(sound, quiet=0.3):
+    """``sound`` between stretches of quiet room noise, as the listener records it"""
+    silence = np.zeros(int(RATE * quiet))
+    signal = np.concatenate([silence, sound, silence])
+    signal += 60 * np.random.default_rng(1).standard_normal(len(signal))
+    return sr.AudioData(signal.clip(-32768, 32767).astype('<i2').tobytes(), RATE, 2)
+
+
+@pytest.fixture
+def vad():
+    detector = VoiceActivityDetector()
+    # Learn the room's noise floor first, as the listener's first chunks do
+    detector.filter(in_room(silence(0)))
+    return detector
+
+
+def test_speech_is_passed_on_and_trimmed(vad):
+    audio = in_room(voice(), quiet=1.0)
+    trimmed = vad.filter(audio)
+    assert trimmed is not None
+    assert len(trimmed.frame_data) < len(audio.frame_data)
+    assert vad.stats()['trimmed_seconds'] > 1.0
+
+
+@pytest.mark.parametrize('sound', [beep, fan, hum, silence])
+def test_non_speech_is_rejected(vad, sound):
+    assert vad.filter(in_room(sound())) is None
+
+
+def test_steady_alarm_is_rejected_as_a_tone(vad):
+    assert vad.filter(in_room(square_alarm())) is None
+    assert vad.stats()['steady_tones_rejected'] == 1
+
+
+def test_beeping_does_not_raise_the_noise_floor(vad):
+    floor = vad.noise_energy
+    for _ in range(5):
+        vad.filter(in_room(beep()))
+    assert vad.noise_energy < floor * 2
+    assert vad.filter(in_room(voice())) is not None
@@ -0,0 +1,636 @@
+"""Head-tracking pipeline pieces: frame sources, capture thread and metrics.
+
+Capture runs on its own thread and writes into a LatestFrameBuffer that only
+ever holds the newest frame, so the slower FaceMesh stage always works on the
+most recent image instead of a queue of stale ones. AdaptiveFrameRate slows
+capture down while nobody is in front of the camera or the head is still.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+
+from lazy import LazyModule
+
+# Imported on first use, so servers that never track heads don't pay for them
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+
+class CameraSource:
+    def __init__(self, index=0):
+        self.cam = cv2.VideoCapture(index)
+        # Ask the driver to hold a single frame instead of queueing a backlog
+        self.cam.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def read(self):
+        return self.cam.read()
+
+    def release(self):
+        self.cam.release()
+
+
+class VideoFileSource:
+    """Plays back a recorded clip, optionally paced at the clip's own frame rate"""
+
+    def __init__(self, path, realtime=False, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.cam = cv2.VideoCapture(path)
+        fps = self.cam.get(cv2.CAP_PROP_FPS)
+        self.frame_interval = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        self._next_frame_at = None
+
+    def read(self):
+        if self.realtime:
+            _wait_until(self._next_frame_at)
+            self._next_frame_at = time.perf_counter() + self.frame_interval
+        ret, frame = self.cam.read()
+        if not ret and self.loop:
+            self.cam.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cam.read()
+        return ret, frame
+
+    def release(self):
+        self.cam.release()
+
+
+class SyntheticSource:
+    """Generated frames so the pipeline can run on a headless machine.
+
+    ``make_frame(index)`` returns a BGR image; the default draws a bright
+    dot sweeping across a grey background. ``frames`` limits the clip length
+    and ``fps`` paces delivery like a real camera (0 means as fast as possible).
+    """
+
+    def __init__(self, width=640, height=480, fps=30, frames=None, make_frame=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = frames
+        self.make_frame = make_frame or self._moving_dot
+        self.index = 0
+        self._next_frame_at = None
+
+    def _moving_dot(self, index):
+        frame = np.full((self.height, self.width, 3), 96, dtype=np.uint8)
+        x = int((index * 7) % self.width)
+        y = self.height // 2
+        cv2.circle(frame, (x, y), 12, (255, 255, 255), -1)
+        return frame
+
+    def read(self):
+        if self.frames is not None and self.index >= self.frames:
+            return False, None
+        if self.fps:
+            _wait_until(self._next_frame_at)
+            self._next_frame_at = time.perf_counter() + 1.0 / self.fps
+        frame = self.make_frame(self.index)
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def _wait_until(deadline):
+    if deadline is not None:
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def open_frame_source(spec):
+    """Build a frame source from a config value: camera index, 'synthetic' or a video path.
+
+    'synthetic:<name>' is a synthetic camera too, so several fake cameras can be told apart.
+    """
+    if isinstance(spec, int) or str(spec).isdigit():
+        return CameraSource(int(spec))
+    if spec == 'synthetic' or str(spec).startswith('synthetic:'):
+        return SyntheticSource()
+    return VideoFileSource(spec, realtime=True)
+
+
+class TrackingMetrics:
+    """Counters and a rolling latency window for the head-tracking pipeline"""
+
+    def __init__(self, window=300):
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.cursor_updates = 0
+        self.moves_suppressed = 0
+        self.moves_coalesced = 0
+        self.roi_inferences = 0
+        self.full_frame_inferences = 0
+        self.track_losses = 0
+        self.blinks = 0
+        # AdaptiveFrameRate attaches itself here so its state shows up in snapshots
+        self.frame_rate = None
+        self._latencies = deque(maxlen=window)
+        self._started = time.perf_counter()
+
+    def record_latency(self, seconds):
+        self._latencies.append(seconds)
+
+    def snapshot(self):
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        latencies = sorted(self._latencies)
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_processed': self.frames_processed,
+            'frames_dropped': self.frames_dropped,
+            'cursor_updates': self.cursor_updates,
+            'moves_suppressed': self.moves_suppressed,
+            'moves_coalesced': self.moves_coalesced,
+            'roi_inferences': self.roi_inferences,
+            'full_frame_inferences': self.full_frame_inferences,
+            'track_losses': self.track_losses,
+            'blinks': self.blinks,
+            'capture_fps': round(self.frames_captured / elapsed, 2),
+            'processing_fps': round(self.frames_processed / elapsed, 2),
+            'frame_rate': self.frame_rate.stats() if self.frame_rate is not None else None,
+            'latency_ms': {
+                'avg': _ms(sum(latencies) / len(latencies)) if latencies else None,
+                'p50': _ms(_percentile(latencies, 50)),
+                'p95': _ms(_percentile(latencies, 95)),
+                'max': _ms(latencies[-1]) if latencies else None
+            }
+        }
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class StageTimer:
+    """Per-stage durations for benchmarking; stages timed several times in one frame are summed"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._current = defaultdict(float)
+
+    def add(self, stage, seconds):
+        self._current[stage] += seconds
+
+    def end_frame(self):
+        for stage, seconds in self._current.items():
+            self.samples[stage].append(seconds)
+        self._current.clear()
+
+    def summary(self):
+        summary = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            summary[stage] = {
+                'count': len(ordered),
+                'mean_ms': _ms(sum(ordered) / len(ordered)),
+                'p50_ms': _ms(_percentile(ordered, 50)),
+                'p95_ms': _ms(_percentile(ordered, 95)),
+                'p99_ms': _ms(_percentile(ordered, 99))
+            }
+        return summary
+
+
+class LatestFrameBuffer:
+    """Single-slot buffer: a new frame replaces any frame nobody has read yet"""
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.closed = False
+        self._cond = threading.Condition()
+        self._item = None
+        self._written = 0
+        self._read = 0
+
+    def put(self, frame, captured_at):
+        with self._cond:
+            if self._written != self._read and self.metrics:
+                self.metrics.frames_dropped += 1
+            self._item = (frame, captured_at)
+            self._written += 1
+            self._cond.notify()
+
+    def get(self, timeout=1.0):
+        """Wait for a frame newer than the last one returned; None on timeout or close"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._written != self._read or self.closed, timeout):
+                return None
+            if self._written == self._read:
+                return None
+            self._read = self._written
+            return self._item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class AdaptiveFrameRate:
+    """Chooses how often to grab a frame from what the tracker last saw.
+
+    ACTIVE runs at ``active_fps`` (0 means as fast as the camera delivers).
+    After ``idle_after`` seconds in which the cursor landmark stayed within
+    ``motion_threshold`` (normalized frame units) of where it settled, it drops
+    to ``idle_fps``; with no face for ``no_face_after`` seconds, to
+    ``no_face_fps``. Movement, eyes starting to close or a face coming back
+    switch straight back to ACTIVE and wake the capture thread, so a blink seen
+    at the idle rate is still timed at the full rate. The idle rate has to stay
+    high enough to catch the start of a blink (10 fps sees any closure over 100 ms).
+
+    The capture thread calls wait() before each read, and HeadTracker reports
+    every processed frame through observe().
+    """
+
+    ACTIVE = 'active'
+    IDLE = 'idle'
+    NO_FACE = 'no_face'
+
+    def __init__(self, active_fps=30, idle_fps=10, no_face_fps=2, idle_after=3.0, no_face_after=1.0,
+                 motion_threshold=0.005, adaptive=True, metrics=None, window=2.0):
+        self.fps = {self.ACTIVE: active_fps, self.IDLE: idle_fps, self.NO_FACE: no_face_fps}
+        self.idle_after = idle_after
+        self.no_face_after = no_face_after
+        self.motion_threshold = motion_threshold
+        self.adaptive = adaptive
+        self.window = window
+        self.mode = self.ACTIVE
+        self.mode_changes = 0
+        self._anchor = None
+        self._last_motion = None
+        self._last_face = None
+        self._last_read = None
+        self._processed = deque()
+        self._mode_seconds = {mode: 0.0 for mode in self.fps}
+        self._mode_since = time.perf_counter()
+        self._cond = threading.Condition()
+        if metrics is not None:
+            metrics.frame_rate = self
+
+    @property
+    def target_fps(self):
+        return self.fps[self.mode]
+
+    def _set_mode(self, mode):
+        if mode != self.mode:
+            now = time.perf_counter()
+            self._mode_seconds[self.mode] += now - self._mode_since
+            self._mode_since = now
+            self.mode = mode
+            self.mode_changes += 1
+            self._cond.notify_all()
+
+    def observe(self, point, now, eyes_closing=False):
+        """One processed frame: ``point`` is the normalized (x, y) being tracked, or None without a face"""
+        with self._cond:
+            self._processed.append(time.perf_counter())
+            if not self.adaptive:
+                return
+            if point is None:
+                if self._last_face is None or now - self._last_face >= self.no_face_after:
+                    self._set_mode(self.NO_FACE)
+                return
+            self._last_face = now
+            moved = (self._anchor is None
+                     or abs(point[0] - self._anchor[0]) > self.motion_threshold
+                     or abs(point[1] - self._anchor[1]) > self.motion_threshold)
+            if moved or self.mode == self.NO_FACE:
+                # Measure the next stretch of stillness from here
+                self._anchor = point
+                self._last_motion = now
+                self._set_mode(self.ACTIVE)
+            elif eyes_closing:
+                # Time the blink at full rate, then drop back to idle if the head hasn't moved
+                self._set_mode(self.ACTIVE)
+            elif now - self._last_motion >= self.idle_after:
+                self._set_mode(self.IDLE)
+
+    def wait(self, stopped=None, poll=0.25):
+        """Block until the next frame is due at the current rate; False if ``stopped`` got set"""
+        with self._cond:
+            while True:
+                if stopped is not None and stopped.is_set():
+                    return False
+                fps = self.target_fps
+                if not fps or self._last_read is None:
+                    break
+                delay = self._last_read + 1.0 / fps - time.perf_counter()
+                if delay <= 0:
+                    break
+                # A mode change notifies, so snapping back to ACTIVE doesn't wait out the idle interval
+                self._cond.wait(min(delay, poll))
+            self._last_read = time.perf_counter()
+            return True
+
+    def achieved_fps(self):
+        with self._cond:
+            cutoff = time.perf_counter() - self.window
+            while self._processed and self._processed[0] < cutoff:
+                self._processed.popleft()
+            if len(self._processed) < 2:
+                return 0.0
+            span = self._processed[-1] - self._processed[0]
+            return (len(self._processed) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        achieved = self.achieved_fps()
+        with self._cond:
+            seconds = dict(self._mode_seconds)
+            seconds[self.mode] += time.perf_counter() - self._mode_since
+            return {
+                'mode': self.mode,
+                'adaptive': self.adaptive,
+                'target_fps': self.target_fps,
+                'achieved_fps': round(achieved, 2),
+                'mode_changes': self.mode_changes,
+                'seconds_in_mode': {mode: round(value, 1) for mode, value in seconds.items()}
+            }
+
+
+class CaptureThread(threading.Thread):
+    """Reads frames from a source as fast as it delivers them, or as a frame-rate governor allows"""
+
+    def __init__(self, source, buffer, metrics=None, frame_rate=None):
+        super().__init__(daemon=True)
+        self.source = source
+        self.buffer = buffer
+        self.metrics = metrics
+        self.frame_rate = frame_rate
+        self.failed = False
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                if self.frame_rate is not None and not self.frame_rate.wait(self._stopped):
+                    break
+                ret, frame = self.source.read()
+                if not ret:
+                    self.failed = True
+                    break
+                self.buffer.put(frame, time.perf_counter())
+                if self.metrics:
+                    self.metrics.frames_captured += 1
+        finally:
+            self.buffer.close()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class FaceMeshStage:
+    """Runs FaceMesh on a crop around the last known face instead of the whole frame.
+
+    The crop is the bounding box of the previous frame's landmarks, grown by
+    ``roi_padding`` on every side. If no face is found in the crop the stage
+    falls back to a full-frame pass. ``downscale`` (0 < scale <= 1) shrinks
+    the image handed to FaceMesh; landmarks are normalized, so the caller
+    never sees the difference.
+    """
+
+    def __init__(self, face_mesh, roi_tracking=True, roi_padding=0.25, downscale=1.0,
+                 min_roi_size=96, metrics=None, timer=None):
+        self.face_mesh = face_mesh
+        self.roi_tracking = roi_tracking
+        self.roi_padding = roi_padding
+        self.downscale = downscale
+        self.min_roi_size = min_roi_size
+        self.metrics = metrics
+        self.timer = timer
+        self._roi = None
+
+    def process(self, frame):
+        """Return the first face's landmarks as an (N, 2) array of full-frame x/y, or None"""
+        frame_h, frame_w = frame.shape[:2]
+        if self._roi is not None:
+            landmarks = self._run(frame, self._roi)
+            if landmarks is not None:
+                self._count('roi_inferences')
+                return landmarks
+            # Lost the face inside the crop, search the whole frame again
+            self._count('track_losses')
+            self._roi = None
+        self._count('full_frame_inferences')
+        return self._run(frame, (0, 0, frame_w, frame_h))
+
+    def reset(self):
+        self._roi = None
+
+    def _count(self, name):
+        if self.metrics:
+            setattr(self.metrics, name, getattr(self.metrics, name) + 1)
+
+    def _run(self, frame, roi):
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0, x1, y1 = roi
+        started = time.perf_counter()
+        image = frame[y0:y1, x0:x1]
+        if self.downscale < 1.0:
+            image = cv2.resize(image, None, fx=self.downscale, fy=self.downscale,
+                               interpolation=cv2.INTER_AREA)
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        converted = time.perf_counter()
+        output = self.face_mesh.process(image)
+        if self.timer:
+            self.timer.add('color', converted - started)
+            self.timer.add('inference', time.perf_counter() - converted)
+        if not output.multi_face_landmarks:
+            return None
+
+        # One pass over the protobuf landmarks, everything after that is NumPy
+        raw = output.multi_face_landmarks[0].landmark
+        landmarks = np.fromiter(
+            (value for lm in raw for value in (lm.x, lm.y)),
+            dtype=np.float32,
+            count=2 * len(raw)
+        ).reshape(-1, 2)
+        if (x0, y0, x1, y1) != (0, 0, frame_w, frame_h):
+            landmarks *= ((x1 - x0) / frame_w, (y1 - y0) / frame_h)
+            landmarks += (x0 / frame_w, y0 / frame_h)
+        if self.roi_tracking:
+            self._roi = self._face_box(landmarks, frame_w, frame_h)
+        return landmarks
+
+    def _face_box(self, landmarks, frame_w, frame_h):
+        """Padded pixel bounding box around the landmarks, clamped to the frame"""
+        left, top = landmarks.min(axis=0) * (frame_w, frame_h)
+        right, bottom = landmarks.max(axis=0) * (frame_w, frame_h)
+        pad_x = max((right - left) * self.roi_padding, (self.min_roi_size - (right - left)) / 2)
+        pad_y = max((bottom - top) * self.roi_padding, (self.min_roi_size - (bottom - top)) / 2)
+        x0 = max(0, int(left - pad_x))
+        y0 = max(0, int(top - pad_y))
+        x1 = min(frame_w, int(right + pad_x) + 1)
+        y1 = min(frame_h, int(bottom + pad_y) + 1)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+
+# FaceMesh indices of the six eye-aspect-ratio points for each eye:
+# outer corner, two upper lid points, inner corner, two lower lid points
+EYE_LANDMARKS = [
+    [33, 160, 158, 133, 153, 144],
+    [362, 385, 387, 263, 373, 380]
+]
+
+
+def eye_aspect_ratios(landmarks, frame_w, frame_h):
+    """Eye aspect ratio of both eyes, computed in pixel space so the frame shape doesn't skew it"""
+    eyes = landmarks[np.asarray(EYE_LANDMARKS)] * (frame_w, frame_h)
+    vertical = (np.linalg.norm(eyes[:, 1] - eyes[:, 5], axis=1)
+                + np.linalg.norm(eyes[:, 2] - eyes[:, 4], axis=1))
+    horizontal = np.linalg.norm(eyes[:, 0] - eyes[:, 3], axis=1)
+    return vertical / (2.0 * np.maximum(horizontal, 1e-6))
+
+
+class BlinkDetector:
+    """Turns a stream of eye-aspect-ratio readings into blink events.
+
+    The open-eye EAR is learned per user as a running average, and the eyes
+    count as closed below ``close_ratio`` of it (and open again above
+    ``reopen_ratio`` of it, so noise around the threshold doesn't flicker).
+    A blink fires when the eyes reopen after being closed between
+    ``min_closed`` and ``max_closed`` seconds, and at least ``refractory``
+    seconds after the previous blink. Longer closures (resting, dozing off)
+    are ignored.
+    """
+
+    OPEN = 'open'
+    CLOSED = 'closed'
+
+    def __init__(self, close_ratio=0.7, reopen_ratio=0.85, min_closed=0.05, max_closed=0.6,
+                 refractory=0.4, baseline_alpha=0.05, warmup_frames=15):
+        self.close_ratio = close_ratio
+        self.reopen_ratio = reopen_ratio
+        self.min_closed = min_closed
+        self.max_closed = max_closed
+        self.refractory = refractory
+        self.baseline_alpha = baseline_alpha
+        self.warmup_frames = warmup_frames
+        self.baseline = 0.0
+        self.state = self.OPEN
+        self._samples = 0
+        self._closed_at = 0.0
+        self._last_blink = float('-inf')
+
+    @property
+    def threshold(self):
+        return self.baseline * self.close_ratio
+
+    def update(self, ear, now):
+        """Feed one reading (mean EAR of both eyes); returns True when a blink completes"""
+        self._samples += 1
+        if self._samples <= self.warmup_frames:
+            # Still learning what this user's open eyes look like
+            self.baseline += (ear - self.baseline) / self._samples
+            return False
+
+        if self.state == self.OPEN:
+            if ear < self.baseline * self.close_ratio:
+                self.state = self.CLOSED
+                self._closed_at = now
+            else:
+                self.baseline += self.baseline_alpha * (ear - self.baseline)
+            return False
+
+        if ear > self.baseline * self.reopen_ratio:
+            self.state = self.OPEN
+            closed_for = now - self._closed_at
+            if (self.min_closed <= closed_for <= self.max_closed
+                    and now - self._last_blink >= self.refractory):
+                self._last_blink = now
+                return True
+        return False
+
+    def reset(self):
+        self.state = self.OPEN
+
+
+class HeadTracker:
+    """Per-frame head-tracking work: iris position moves the cursor, a blink clicks.
+
+    ``timestamp`` passed to process() is the frame's capture time; blink
+    timing and cursor smoothing run on it, so recorded clips replay the same
+    way no matter how fast they are fed through.
+    """
+
+    def __init__(self, mesh, cursor, blinks=None, metrics=None, timer=None,
+                 cursor_landmark=475, preview=False, frame_rate=None):
+        self.mesh = mesh
+        self.cursor = cursor
+        self.blinks = blinks or BlinkDetector()
+        self.metrics = metrics
+        self.timer = timer
+        self.frame_rate = frame_rate
+        self.cursor_landmark = cursor_landmark
+        self.preview = preview
+        self.screen_w, self.screen_h = cursor.size()
+
+    def process(self, frame, timestamp):
+        """Handle one camera frame; returns (cursor_moved, clicked)"""
+        timer = self.timer
+        started = time.perf_counter()
+        frame = cv2.flip(frame, 1)
+        if timer:
+            timer.add('color', time.perf_counter() - started)
+        landmarks = self.mesh.process(frame)
+        frame_h, frame_w = frame.shape[:2]
+
+        if self.preview:
+            if landmarks is not None:
+                for x, y in (landmarks[474:478] * (frame_w, frame_h)).astype(int):
+                    cv2.circle(frame, (x, y), 3, (0, 255, 0))
+                for x, y in (landmarks[[145, 159]] * (frame_w, frame_h)).astype(int):
+                    cv2.circle(frame, (x, y), 3, (0, 255, 255))
+            cv2.imshow('Head tracking', frame)
+            cv2.waitKey(1)
+        return self.handle_landmarks(landmarks, frame_w, frame_h, timestamp)
+
+    def handle_landmarks(self, landmarks, frame_w, frame_h, timestamp):
+        """Everything after FaceMesh, for landmarks found elsewhere (see tracking_service.py)"""
+        timer = self.timer
+        moved = clicked = False
+        if landmarks is not None:
+            started = time.perf_counter()
+            screen_x = self.screen_w * landmarks[self.cursor_landmark, 0]
+            screen_y = self.screen_h * landmarks[self.cursor_landmark, 1]
+            ear = eye_aspect_ratios(landmarks, frame_w, frame_h).mean()
+            blinked = self.blinks.update(ear, timestamp)
+            if self.frame_rate is not None:
+                eyes_closing = (self.blinks.state == BlinkDetector.CLOSED
+                                or ear < self.blinks.baseline * self.blinks.reopen_ratio)
+                self.frame_rate.observe(
+                    (landmarks[self.cursor_landmark, 0], landmarks[self.cursor_landmark, 1]),
+                    timestamp, eyes_closing
+                )
+            post_done = time.perf_counter()
+
+            moved = self.cursor.move(screen_x, screen_y, timestamp)
+            if blinked:
+                self.cursor.click()
+                clicked = True
+                if self.metrics:
+                    self.metrics.blinks += 1
+            if timer:
+                timer.add('post', post_done - started)
+                timer.add('output', time.perf_counter() - post_done)
+        else:
+            self.blinks.reset()
+            self.cursor.reset()
+            if self.frame_rate is not None:
+                self.frame_rate.observe(None, timestamp)
+
+        if self.metrics:
+            self.metrics.frames_processed += 1
+        if timer:
+            timer.end_frame()
+        return moved, clicked
@@ -0,0 +1,415 @@
+"""Head tracking for several bedside cameras, one worker process per camera.
+
+FaceMesh holds the GIL for the whole inference, so a second camera tracked on
+a thread only slows the first one down. TrackingService runs each camera's
+FaceMesh in a worker process of its own, up to ``max_workers`` (one per core
+by default).
+
+Capture stays in the server process. Frames go into a SharedFrameRing, three
+frame slots in shared memory, and only a sequence number crosses the process
+boundary. A frame is never pickled. The worker sends back the landmarks (a few
+KB per frame). Blink detection, the adaptive frame rate and cursor output then
+run in the server on a result thread, using the same HeadTracker as the
+single-camera loop in app.py.
+
+A worker that dies is restarted on the same frame ring, up to
+``max_restarts`` times. stats() reports each worker's health and frame rates.
+Workers are spawned, not forked, so each one imports the server's main module
+again without running its ``__main__`` block.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+from cursor import CursorOutput, PyAutoGuiBackend
+from lazy import LazyModule
+from tracking import (
+    AdaptiveFrameRate, CaptureThread, FaceMeshStage, HeadTracker, TrackingMetrics, open_frame_source
+)
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+
+def create_face_mesh():
+    """Default worker model, built inside the worker process"""
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+class SharedFrameRing:
+    """Latest-frame hand-off between processes, triple-buffered in shared memory.
+
+    The writer always fills a slot that is neither the newest frame nor the
+    one the reader holds, so neither side waits for the other and a frame is
+    never overwritten while it is being read. Unread frames are replaced, as
+    in LatestFrameBuffer, and put()/close() let CaptureThread write into it.
+    """
+
+    SLOTS = 3
+    # Indexes into the shared state array
+    LATEST, READING, WRITTEN, CLOSED = range(4)
+
+    def __init__(self, shape, context=multiprocessing):
+        self.shape = tuple(shape)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)) * self.SLOTS)
+        self._state = context.Array('q', [-1, -1, 0, 0])
+        self._captured_at = context.Array('d', self.SLOTS, lock=False)
+        # A semaphore, not an Event: Event.set() waits for every sleeper to wake,
+        # so a worker killed while waiting would hang the capture thread for good
+        self._ready = context.Semaphore(0)
+        self._owner = True
+        self._last_read = 0
+        self._map()
+
+    def _map(self):
+        self.frames = np.ndarray((self.SLOTS,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['frames']
+        state['_owner'] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._map()
+
+    @property
+    def written(self):
+        return self._state[self.WRITTEN]
+
+    @property
+    def closed(self):
+        return bool(self._state[self.CLOSED])
+
+    def put(self, frame, captured_at):
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+        state = self._state
+        with state.get_lock():
+            slot = next(i for i in range(self.SLOTS) if i != state[self.LATEST] and i != state[self.READING])
+        self.frames[slot] = frame
+        with state.get_lock():
+            state[self.LATEST] = slot
+            state[self.WRITTEN] += 1
+            self._captured_at[slot] = captured_at
+        self._ready.release()
+
+    def get(self, timeout=1.0):
+        """(frame, sequence number, capture time) of the newest unread frame, or None.
+
+        The frame is a view into shared memory: call release() as soon as it
+        has been copied or used.
+        """
+        if not self._ready.acquire(timeout=timeout):
+            return None
+        # One wake-up is enough however many frames arrived meanwhile
+        while self._ready.acquire(False):
+            pass
+        state = self._state
+        with state.get_lock():
+            if state[self.WRITTEN] == self._last_read or state[self.LATEST] < 0:
+                return None
+            slot = state[self.LATEST]
+            state[self.READING] = slot
+            self._last_read = state[self.WRITTEN]
+            captured_at = self._captured_at[slot]
+        return self.frames[slot], self._last_read, captured_at
+
+    def release(self):
+        with self._state.get_lock():
+            self._state[self.READING] = -1
+
+    def close(self):
+        self._state[self.CLOSED] = 1
+        self._ready.release()
+
+    def destroy(self):
+        """Free the shared memory (owner only, after the worker has exited)"""
+        self.frames = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def _worker_main(ring, results, stop, heartbeat, mesh_factory, roi_tracking, downscale):
+    """Worker process: FaceMesh on every new frame in the ring, landmarks back over ``results``"""
+    try:
+        stage = FaceMeshStage(mesh_factory(), roi_tracking=roi_tracking, downscale=downscale)
+        while not stop.is_set():
+            heartbeat.value = time.time()
+            item = ring.get(timeout=0.5)
+            if item is None:
+                if ring.closed:
+                    break
+                continue
+            frame, sequence, captured_at = item
+            started = time.perf_counter()
+            try:
+                # The flip copies the frame, so the slot can go back to the writer straight away
+                frame = cv2.flip(frame, 1)
+            finally:
+                ring.release()
+            landmarks = stage.process(frame)
+            results.put(('frame', sequence, captured_at, landmarks, time.perf_counter() - started))
+    except Exception as e:
+        results.put(('error', repr(e)))
+        raise
+
+
+class CameraWorker:
+    """One camera: capture and post-processing in this process, FaceMesh in a worker process"""
+
+    def __init__(self, service, label, camera, backend):
+        self.service = service
+        self.label = label
+        self.camera = camera
+        self.backend = backend
+        self.restarts = 0
+        self.error = None
+        self.started_at = time.time()
+        self.inference_seconds = 0.0
+        self.results_handled = 0
+        self.process = None
+        self.ready = False
+        self._stopping = False
+
+    def start(self):
+        service = self.service
+        self.source = service.source_factory(self.camera)
+        ret, frame = self.source.read()
+        if not ret:
+            self.source.release()
+            raise RuntimeError(f"camera {self.camera} gave no frames")
+        self.ring = SharedFrameRing(frame.shape, service.context)
+        self.ring.put(frame, time.perf_counter())
+
+        self.metrics = TrackingMetrics()
+        self.frame_rate = AdaptiveFrameRate(metrics=self.metrics, **service.frame_rate_options)
+        cursor = CursorOutput(self.backend, metrics=self.metrics, **service.cursor_options)
+        # FaceMesh runs in the worker, so the tracker only gets handle_landmarks() calls
+        self.tracker = HeadTracker(
+            None, cursor, metrics=self.metrics, cursor_landmark=service.cursor_landmark,
+            frame_rate=self.frame_rate
+        )
+        self._spawn()
+        self.capture = CaptureThread(self.source, self.ring, self.metrics, frame_rate=self.frame_rate)
+        self.capture.start()
+        self.result_thread = threading.Thread(target=self._handle_results, daemon=True)
+        self.result_thread.start()
+        self.ready = True
+        if self._stopping:
+            # Stopped (logout) while the camera was still opening
+            self._shutdown()
+
+    def _spawn(self):
+        context = self.service.context
+        self.results = context.Queue()
+        self.stop_event = context.Event()
+        self.heartbeat = context.Value('d', time.time())
+        self.process = context.Process(
+            target=_worker_main,
+            args=(self.ring, self.results, self.stop_event, self.heartbeat, self.service.mesh_factory,
+                  self.service.roi_tracking, self.service.downscale),
+            name=f"tracking-{self.label}",
+            daemon=True
+        )
+        self.process.start()
+
+    def _handle_results(self):
+        frame_h, frame_w = self.ring.shape[:2]
+        while not self._stopping:
+            try:
+                message = self.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                # The worker died mid-message; check() restarts it with a fresh queue
+                time.sleep(0.1)
+                continue
+            if message[0] == 'error':
+                self.error = message[1]
+                print(f"❌ Tracking worker {self.label} failed: {self.error}")
+                continue
+            _, sequence, captured_at, landmarks, inference = message
+            moved, clicked = self.tracker.handle_landmarks(landmarks, frame_w, frame_h, captured_at)
+            if moved:
+                self.metrics.record_latency(time.perf_counter() - captured_at)
+            if clicked:
+                print(f"👁️ Blink detected ({self.label}) - Click!")
+            self.inference_seconds += inference
+            self.results_handled += 1
+
+    def check(self):
+        """Restart a dead worker process; returns False once the worker should be removed"""
+        if self._stopping:
+            return False
+        if self.capture.failed:
+            self.error = 'camera feed lost'
+            return False
+        if self.process.is_alive():
+            return True
+        if self.restarts >= self.service.max_restarts:
+            self.error = self.error or f"worker exited with code {self.process.exitcode}"
+            return False
+        self.restarts += 1
+        print(f"🔁 Restarting tracking worker {self.label} (exit code {self.process.exitcode})")
+        self._spawn()
+        return True
+
+    def stop(self):
+        self._stopping = True
+        if self.ready:
+            self._shutdown()
+
+    def _shutdown(self):
+        self.capture.stop()
+        self.stop_event.set()
+        self.ring.close()
+        self.capture.join(timeout=1.0)
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1.0)
+        self.result_thread.join(timeout=1.0)
+        self.source.release()
+        self.ring.destroy()
+
+    def health(self):
+        tracking = self.metrics.snapshot()
+        handled = self.results_handled
+        return {
+            'patient': self.label,
+            'camera': str(self.camera),
+            'pid': self.process.pid if self.process else None,
+            'alive': bool(self.process and self.process.is_alive()),
+            'exitcode': self.process.exitcode if self.process else None,
+            'restarts': self.restarts,
+            'error': self.error,
+            'heartbeat_age_s': round(time.time() - self.heartbeat.value, 2),
+            'frame_shape': list(self.ring.shape),
+            'frames_written': self.ring.written,
+            'frames_skipped': max(0, self.ring.written - handled),
+            'inference_ms_avg': round(self.inference_seconds / handled * 1000, 2) if handled else None,
+            'target_fps': tracking['frame_rate']['target_fps'],
+            'achieved_fps': tracking['frame_rate']['achieved_fps'],
+            'tracking': tracking
+        }
+
+
+class TrackingService:
+    """Starts, stops and watches CameraWorkers, one per patient session"""
+
+    def __init__(self, max_workers=None, mesh_factory=create_face_mesh, source_factory=open_frame_source,
+                 backend_factory=PyAutoGuiBackend, roi_tracking=True, downscale=1.0, frame_rate_options=None,
+                 cursor_options=None, cursor_landmark=475, max_restarts=3, check_interval=2.0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.mesh_factory = mesh_factory
+        self.source_factory = source_factory
+        self.backend_factory = backend_factory
+        self.roi_tracking = roi_tracking
+        self.downscale = downscale
+        self.frame_rate_options = frame_rate_options or {}
+        self.cursor_options = cursor_options or {}
+        self.cursor_landmark = cursor_landmark
+        self.max_restarts = max_restarts
+        self.check_interval = check_interval
+        # Forking a multi-threaded server can copy locks other threads are holding
+        self.context = multiprocessing.get_context('spawn')
+        self.started = 0
+        self.rejected = 0
+        self.failed = []
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._monitor = None
+
+    def start(self, key, camera, label=None):
+        """Start tracking ``camera`` for ``key`` (a session id); returns (ok, message)"""
+        with self._lock:
+            if key in self._workers:
+                return False, 'Head tracking is already running for this session'
+            if len(self._workers) >= self.max_workers:
+                self.rejected += 1
+                return False, f'All {self.max_workers} tracking workers are busy'
+            if any(str(worker.camera) == str(camera) for worker in self._workers.values()):
+                self.rejected += 1
+                return False, f'Camera {camera} is already in use'
+            worker = CameraWorker(self, label or key, camera, None)
+            # Hold the slot while the camera opens, so concurrent starts can't overbook
+            self._workers[key] = worker
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._watch, daemon=True)
+                self._monitor.start()
+        try:
+            worker.backend = self.backend_factory()
+            worker.start()
+        except Exception as e:
+            with self._lock:
+                self._workers.pop(key, None)
+            print(f"❌ Could not start head tracking on camera {camera}: {e}")
+            return False, f'Could not start head tracking: {e}'
+        self.started += 1
+        print(f"👀 Head tracking worker started for {worker.label} on camera {camera} (pid {worker.process.pid})")
+        return True, 'Head tracking started'
+
+    def stop(self, key):
+        with self._lock:
+            worker = self._workers.pop(key, None)
+        if worker is None:
+            return False
+        worker.stop()
+        print(f"🔴 Head tracking worker stopped for {worker.label}")
+        return True
+
+    def is_running(self, key):
+        with self._lock:
+            return key in self._workers
+
+    def status(self, key):
+        with self._lock:
+            worker = self._workers.get(key)
+        return worker.health() if worker is not None and worker.ready else None
+
+    def shutdown(self):
+        with self._lock:
+            keys = list(self._workers)
+        for key in keys:
+            self.stop(key)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_interval)
+            with self._lock:
+                workers = [(key, worker) for key, worker in self._workers.items() if worker.ready]
+            for key, worker in workers:
+                if not worker.check() and self.stop(key):
+                    self.failed.append({'patient': worker.label, 'error': worker.error, 'at': time.time()})
+                    del self.failed[:-20]
+
+    def health(self):
+        """CameraWorker.health() of every running worker"""
+        with self._lock:
+            workers = [worker for worker in self._workers.values() if worker.ready]
+        return [worker.health() for worker in workers]
+
+    def stats(self):
+        health = self.health()
+        return {
+            'max_workers': self.max_workers,
+            'active_workers': len(health),
+            'started': self.started,
+            'rejected': self.rejected,
+            'restarts': sum(worker['restarts'] for worker in health),
+            'total_fps': round(sum(worker['achieved_fps'] for worker in health), 2),
+            'workers': health,
+            'recent_failures': list(self.failed)
+        }
@@ -0,0 +1,100 @@
+"""Cache of translated voice commands.
+
+Patients repeat the same handful of phrases all day, so translating every
+utterance over the network is mostly wasted. TranslationCache keeps a bounded
+LRU of (source language, utterance) -> English with an expiry time, and
+saves it to disk so the cache is warm again after a restart.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TranslationCache:
+    def __init__(self, path=None, max_entries=2000, ttl=30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.native_matches = 0
+        self.translate_seconds = 0.0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._load()
+
+    @staticmethod
+    def _key(language, text):
+        return f"{language}\t{' '.join(text.lower().split())}"
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"❌ Ignoring unreadable translation cache: {e}")
+            return
+        now = time.time()
+        for key, (english, stored_at) in saved.items():
+            if now - stored_at < self.ttl:
+                self._entries[key] = (english, stored_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        if not self.path:
+            return
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def translate(self, text, language, translate_fn):
+        """Return the English for ``text``, calling ``translate_fn(text, language)`` on a miss"""
+        key = self._key(language, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        started = time.perf_counter()
+        english = translate_fn(text, language)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.misses += 1
+            self.translate_seconds += elapsed
+            self._entries[key] = (english, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            try:
+                self._save()
+            except OSError as e:
+                print(f"❌ Could not save translation cache: {e}")
+        return english
+
+    def record_native_match(self):
+        """Count an utterance that matched a native phrase table and skipped translation"""
+        with self._lock:
+            self.native_matches += 1
+
+    def stats(self):
+        with self._lock:
+            avg_translate = self.translate_seconds / self.misses if self.misses else 0.0
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'native_matches': self.native_matches,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'avg_translate_ms': round(avg_translate * 1000, 1),
+                'estimated_saved_s': round(avg_translate * (self.hits + self.native_matches), 2)
+            }
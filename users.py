@@ -0,0 +1,72 @@
+"""Account directory built over users_data.json.
+
+The file keeps its role -> username -> record layout. UserDirectory indexes
+it once when it is loaded, so login and signup find a username in constant
+time instead of scanning every role. Patient IDs come from a counter saved
+in the file under "_meta". The counter only ever grows, so an ID is never
+reused after a deletion, and two signups at the same moment can't get the
+same one.
+"""
+import json
+import re
+import threading
+
+USER_ROLES = ['patients', 'doctors', 'nurses']
+META_KEY = '_meta'
+
+_PATIENT_NUMBER = re.compile(r'^P(\d+)$')
+
+
+def format_patient_id(number):
+    return f"P{number:03d}"
+
+
+class UserDirectory:
+    def __init__(self, data):
+        self.data = data
+        self._lock = threading.Lock()
+        self._index = {}
+        highest = 0
+        for role in USER_ROLES:
+            for username, record in data.setdefault(role, {}).items():
+                self._index[username] = (role, record)
+                match = _PATIENT_NUMBER.match(str(record.get('patient_id', '')))
+                if match:
+                    highest = max(highest, int(match.group(1)))
+        meta = data.setdefault(META_KEY, {})
+        # Files written before the counter existed (or edited by hand) start past the highest ID
+        meta['next_patient_number'] = max(meta.get('next_patient_number', 1), highest + 1)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, username):
+        return username in self._index
+
+    def lookup(self, username):
+        """Return (role, record) for ``username``, or (None, None)"""
+        return self._index.get(username, (None, None))
+
+    def _allocate_patient_id(self):
+        meta = self.data[META_KEY]
+        number = meta['next_patient_number']
+        meta['next_patient_number'] = number + 1
+        return format_patient_id(number)
+
+    def add(self, username, role, record):
+        """Add an account; patients get the next patient ID. Returns False if the username is taken"""
+        if role not in USER_ROLES:
+            raise ValueError(f"Unknown role '{role}'")
+        with self._lock:
+            if username in self._index:
+                return False
+            if role == 'patients':
+                record['patient_id'] = self._allocate_patient_id()
+            self.data[role][username] = record
+            self._index[username] = (role, record)
+        return True
+
+    def dumps(self, **options):
+        """JSON for the whole file, taken under the lock so a concurrent signup can't interleave"""
+        with self._lock:
+            return json.dumps(self.data, **options)
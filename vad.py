@@ -0,0 +1,134 @@
+"""Voice-activity detection in front of the speech recognizer.
+
+The background listener hands over anything loud enough to cross its energy
+threshold: coughs, monitors beeping, trolleys. Each of those used to cost a
+recognition call that ended in UnknownValueError. VoiceActivityDetector
+checks every chunk with NumPy first:
+
+- a frame is speech-like when its energy is well above the noise floor,
+  most of that energy sits in the voice band (80-4000 Hz, which leaves out
+  mains hum) and its spectrum is peaky rather than flat like fan hiss, but
+  not a single pure tone: a sine beep puts nearly all of its energy within
+  a couple of bins of one peak, a voice spreads it over its harmonics
+- a chunk needs ``min_speech_ms`` of speech-like frames to be passed on
+- a chunk whose speech-like frames keep one strong peak at the same pitch
+  throughout is a steady tone (a square-wave alarm, a sustained beep) and
+  is dropped; speech moves its pitch and formants from frame to frame
+- leading and trailing silence is trimmed (keeping ``padding_ms``)
+- the noise floor is re-estimated from the non-speech, non-tone frames of
+  every chunk, so it follows the ward as it gets louder or quieter but not
+  up to the level of a monitor that keeps beeping
+"""
+import threading
+
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+sr = LazyModule('speech_recognition')
+
+
+class VoiceActivityDetector:
+    def __init__(self, frame_ms=30, energy_ratio=3.0, band=(80, 4000), band_ratio=0.6, max_flatness=0.4,
+                 max_peak_share=0.9, tone_peak_share=0.75, tone_steadiness=0.9,
+                 min_speech_ms=150, padding_ms=200, noise_alpha=0.1):
+        self.frame_ms = frame_ms
+        self.energy_ratio = energy_ratio
+        self.band = band
+        self.band_ratio = band_ratio
+        self.max_flatness = max_flatness
+        self.max_peak_share = max_peak_share
+        self.tone_peak_share = tone_peak_share
+        self.tone_steadiness = tone_steadiness
+        self.min_speech_ms = min_speech_ms
+        self.padding_ms = padding_ms
+        self.noise_alpha = noise_alpha
+        self.noise_energy = None
+        self.checked = 0
+        self.rejected = 0
+        self.tones = 0
+        self.trimmed_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def speech_frames(self, samples, sample_rate):
+        """Boolean mask of speech-like frames for int16 ``samples``, with each frame's
+        strongest in-band bin and the share of in-band energy around it"""
+        frame_len = max(1, int(sample_rate * self.frame_ms / 1000))
+        n_frames = len(samples) // frame_len
+        if n_frames == 0:
+            return np.zeros(0, dtype=bool), frame_len, np.zeros(0, dtype=int), np.zeros(0)
+        frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len)
+
+        spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_len), axis=1)) ** 2
+        freqs = np.fft.rfftfreq(frame_len, 1.0 / sample_rate)
+        in_band = (freqs >= self.band[0]) & (freqs <= self.band[1])
+        # Energy is measured inside the voice band only, so hum never looks like speech
+        energy = spectrum[:, in_band].sum(axis=1) / frame_len
+        band_share = energy * frame_len / np.maximum(spectrum.sum(axis=1), 1e-9)
+        # Spectral flatness: geometric over arithmetic mean, near 1 for white noise
+        power = spectrum[:, in_band] + 1e-9
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        # Share of in-band energy within two bins of the strongest one, near 1 for a sine
+        peaks = np.argmax(power, axis=1)
+        around = np.clip(peaks[:, None] + np.arange(-2, 3), 0, power.shape[1] - 1)
+        peak_share = np.take_along_axis(power, around, axis=1).sum(axis=1) / power.sum(axis=1)
+
+        with self._lock:
+            if self.noise_energy is None:
+                # First chunk: assume the quietest fifth of it is background
+                self.noise_energy = float(np.percentile(energy, 20)) or 1.0
+            tonal = peak_share >= self.max_peak_share
+            is_speech = ((energy > self.noise_energy * self.energy_ratio)
+                         & (band_share > self.band_ratio) & (flatness < self.max_flatness) & ~tonal)
+            # A beeping monitor is not the room getting louder, so tones stay out of the floor
+            background = ~is_speech & ~tonal
+            if background.any():
+                quiet = float(np.median(energy[background]))
+                # Follow a quieter room at once, a louder one only gradually
+                alpha = 0.5 if quiet < self.noise_energy else self.noise_alpha
+                self.noise_energy += alpha * (quiet - self.noise_energy)
+                self.noise_energy = max(self.noise_energy, 1.0)
+        return is_speech, frame_len, peaks, peak_share
+
+    def is_steady_tone(self, peaks, peak_share):
+        """True if the speech-like frames of a chunk hold one strong peak at the same pitch"""
+        if np.median(peak_share) < self.tone_peak_share:
+            return False
+        steady = np.abs(peaks - np.median(peaks)) <= 1
+        return steady.mean() >= self.tone_steadiness
+
+    def filter(self, audio):
+        """Return ``audio`` trimmed to its speech, or None if there is no speech in it"""
+        raw = audio.get_raw_data(convert_width=2)
+        samples = np.frombuffer(raw, dtype='<i2')
+        is_speech, frame_len, peaks, peak_share = self.speech_frames(samples, audio.sample_rate)
+
+        with self._lock:
+            self.checked += 1
+        min_frames = max(1, self.min_speech_ms // self.frame_ms)
+        if is_speech.sum() < min_frames:
+            with self._lock:
+                self.rejected += 1
+            return None
+        if self.is_steady_tone(peaks[is_speech], peak_share[is_speech]):
+            with self._lock:
+                self.rejected += 1
+                self.tones += 1
+            return None
+
+        speech = np.flatnonzero(is_speech)
+        padding = int(audio.sample_rate * self.padding_ms / 1000)
+        start = max(0, speech[0] * frame_len - padding)
+        end = min(len(samples), (speech[-1] + 1) * frame_len + padding)
+        with self._lock:
+            self.trimmed_seconds += float(len(samples) - (end - start)) / audio.sample_rate
+        return sr.AudioData(samples[start:end].tobytes(), audio.sample_rate, 2)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'recognition_calls_avoided': self.rejected,
+                'steady_tones_rejected': self.tones,
+                'trimmed_seconds': round(self.trimmed_seconds, 2),
+                'noise_energy': round(self.noise_energy, 1) if self.noise_energy else None
+            }
@@ -0,0 +1,234 @@
+"""Vital-sign time series.
+
+Nurses enter vitals as free text ("120/80", "72", "36.8"), and every record
+is stored as JSON with a "YYYY-MM-DD HH:MM" date. parse_vital_signs() turns a
+record into numbers once, when it is saved; MedicalStore keeps the result in
+a typed ``vitals`` table. VitalsIndex loads each patient's readings into
+column arrays (timestamps plus one float32 array per measurement) and keeps
+them up to date incrementally. Trend charts then get a range of readings, or
+min/max/avg per time bucket, without parsing every record on each request.
+"""
+import calendar
+from datetime import datetime, timedelta
+import math
+import re
+import threading
+import time
+
+from lazy import LazyModule
+
+np = LazyModule('numpy')
+
+VITAL_FIELDS = ('systolic', 'diastolic', 'heart_rate', 'temperature')
+DATE_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+# The format every record is saved in, parsed without strptime on the bulk import path
+_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?: (\d{2}):(\d{2}))?$')
+_EPOCH = datetime(1970, 1, 1)
+_NUMBER = re.compile(r'[-+]?\d+(?:[.,]\d+)?')
+
+
+def parse_timestamp(text):
+    """'YYYY-MM-DD[ HH:MM[:SS]]' -> seconds, or None. Dates are wall-clock times, kept as naive UTC"""
+    match = _DATE.match(text.strip()) if isinstance(text, str) else None
+    if match:
+        year, month, day, hour, minute = match.groups()
+        try:
+            # datetime() rejects the same out-of-range fields strptime does
+            moment = datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0))
+            return (moment - _EPOCH) // timedelta(seconds=1)
+        except ValueError:
+            return None
+    for date_format in DATE_FORMATS:
+        try:
+            return calendar.timegm(time.strptime(text.strip(), date_format))
+        except (ValueError, AttributeError):
+            continue
+    return None
+
+
+def format_timestamp(ts):
+    return time.strftime('%Y-%m-%d %H:%M', time.gmtime(ts))
+
+
+def _numbers(value):
+    return [float(n.replace(',', '.')) for n in _NUMBER.findall(str(value or ''))]
+
+
+def parse_vital_signs(record):
+    """(timestamp, systolic, diastolic, heart_rate, temperature) for a vital_signs record.
+
+    Unreadable measurements become NaN; returns None if the date can't be parsed.
+    Temperatures above 50 are taken to be Fahrenheit and converted to Celsius.
+    """
+    ts = parse_timestamp(record.get('date', ''))
+    if ts is None:
+        return None
+    pressure = _numbers(record.get('blood_pressure'))
+    systolic = pressure[0] if pressure else math.nan
+    diastolic = pressure[1] if len(pressure) > 1 else math.nan
+    heart_rate = (_numbers(record.get('heart_rate')) or [math.nan])[0]
+    temperature = (_numbers(record.get('temperature')) or [math.nan])[0]
+    if temperature > 50:
+        temperature = (temperature - 32) * 5 / 9
+    return ts, systolic, diastolic, heart_rate, temperature
+
+
+class VitalsSeries:
+    """One patient's readings in time order, as growable column arrays.
+
+    extend() only ever writes past ``size`` or into newly allocated arrays, so
+    the readings a snapshot() covers never change under it.
+    """
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.last_record_id = 0
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._values = np.empty((len(VITAL_FIELDS), capacity), dtype=np.float32)
+
+    def _grow(self, needed):
+        capacity = len(self._ts)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        ts = np.empty(capacity, dtype=np.int64)
+        ts[:self.size] = self._ts[:self.size]
+        values = np.empty((len(VITAL_FIELDS), capacity), dtype=np.float32)
+        values[:, :self.size] = self._values[:, :self.size]
+        self._ts, self._values = ts, values
+
+    def extend(self, rows):
+        """Add (record_id, timestamp, systolic, diastolic, heart_rate, temperature) rows"""
+        if not rows:
+            return
+        self._grow(self.size + len(rows))
+        new = np.array([row[1:] for row in rows], dtype=np.float64)
+        start, end = self.size, self.size + len(rows)
+        self._ts[start:end] = new[:, 0]
+        self._values[:, start:end] = new[:, 1:].T
+        self.size = end
+        if np.any(np.diff(self._ts[max(0, start - 1):end]) < 0):
+            # Back-dated entries: re-sort, keeping equal timestamps in arrival order. The
+            # sorted readings go into new arrays so snapshots still hold the old order
+            order = np.argsort(self._ts[:end], kind='stable')
+            ts = np.empty_like(self._ts)
+            values = np.empty_like(self._values)
+            ts[:end] = self._ts[:end][order]
+            values[:, :end] = self._values[:, :end][:, order]
+            self._ts, self._values = ts, values
+        self.last_record_id = max(self.last_record_id, max(row[0] for row in rows))
+
+    def snapshot(self):
+        """Read-only view of the readings so far, safe to use while extend() runs"""
+        snapshot = VitalsSeries.__new__(VitalsSeries)
+        snapshot.size = self.size
+        snapshot.last_record_id = self.last_record_id
+        snapshot._ts = self._ts[:self.size]
+        snapshot._values = self._values[:, :self.size]
+        snapshot._ts.flags.writeable = False
+        snapshot._values.flags.writeable = False
+        return snapshot
+
+    @property
+    def timestamps(self):
+        return self._ts[:self.size]
+
+    def column(self, field):
+        return self._values[VITAL_FIELDS.index(field), :self.size]
+
+    def span(self, start=None, end=None):
+        """Index range [lo, hi) of readings with start <= ts <= end"""
+        ts = self.timestamps
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+        hi = self.size if end is None else int(np.searchsorted(ts, end, side='right'))
+        return lo, hi
+
+    def readings(self, start=None, end=None, fields=VITAL_FIELDS):
+        """Raw readings in range, as columns"""
+        lo, hi = self.span(start, end)
+        return {
+            'time': [format_timestamp(ts) for ts in self.timestamps[lo:hi].tolist()],
+            **{field: _json_floats(self.column(field)[lo:hi]) for field in fields}
+        }
+
+    def downsample(self, start, end, buckets, fields=VITAL_FIELDS):
+        """min/max/avg of each field per time bucket; empty buckets are left out"""
+        width = max(60, math.ceil((end - start + 1) / max(1, buckets)))
+        lo, hi = self.span(start, end)
+        result = {'bucket_seconds': width, 'time': [], 'count': []}
+        for field in fields:
+            result[field] = {'min': [], 'max': [], 'avg': []}
+        if hi <= lo:
+            return result
+
+        bucket = (self.timestamps[lo:hi] - start) // width
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        result['time'] = [format_timestamp(start + b * width) for b in bucket[starts].tolist()]
+        result['count'] = np.diff(np.r_[starts, hi - lo]).tolist()
+        for field in fields:
+            values = self.column(field)[lo:hi].astype(np.float64)
+            valid = ~np.isnan(values)
+            counts = np.add.reduceat(valid, starts)
+            sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                averages = sums / counts
+            result[field] = {
+                'min': _json_floats(np.fmin.reduceat(values, starts)),
+                'max': _json_floats(np.fmax.reduceat(values, starts)),
+                'avg': _json_floats(averages)
+            }
+        return result
+
+
+def _json_floats(values):
+    """Floats rounded for the wire, with NaN (missing) as None"""
+    return [None if math.isnan(v) else round(v, 1) for v in values.tolist()]
+
+
+class VitalsIndex:
+    """Per-patient VitalsSeries over a MedicalStore, refreshed incrementally.
+
+    New readings are fetched by record id, so after the first load of a
+    patient a refresh only reads what was added since. A rewrite of the whole
+    store (a new generation) drops everything. series() hands out snapshots,
+    so a request can read its series while another one refreshes it.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.loads = 0
+        self.refreshes = 0
+        self._series = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def series(self, patient_id):
+        generation, last_id = self.store.version()
+        with self._lock:
+            if generation != self._generation:
+                self._series = {}
+                self._generation = generation
+            series = self._series.get(patient_id)
+            if series is None:
+                series = VitalsSeries()
+                series.extend(self.store.vitals_rows(patient_id))
+                self._series[patient_id] = series
+                self.loads += 1
+            elif last_id > series.last_record_id:
+                rows = self.store.vitals_rows(patient_id, after_record_id=series.last_record_id)
+                series.extend(rows)
+                # Remember how far we've looked even if none of the new records were vitals
+                series.last_record_id = max(series.last_record_id, last_id)
+                self.refreshes += 1
+            return series.snapshot()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'patients_loaded': len(self._series),
+                'readings': sum(series.size for series in self._series.values()),
+                'loads': self.loads,
+                'refreshes': self.refreshes
+            }